@@ -1,51 +1,94 @@
 
 #push changed files
+import asyncio
+import contextlib
 import os
+import sys
 import time
 # import datetime
 # import traceback
 # from operator import truediv
 
-from playwright.sync_api import sync_playwright, TimeoutError
-from reusables import get_credentials, ts
+from playwright.async_api import async_playwright, TimeoutError
+import ablage
+import belege
+import drossel
+import har
+import metrics
+import readiness
+import selektoren
+import traces
+import recycling
+from api_download import RechnungsApi
+from belege import Auswertung
+from einstellungen import (BATCH_PARALLEL, DOWNLOAD_DIR, LISTEN_MODUS, ROUTING_PROFIL, SERVICE_NAME,
+                           WORKER_ANZAHL)
+from metrics import gemessen, messe
+from manifest import SyncManifest, auftragsnummer_aus_url, manifest_pfad
+import retry
+from retry import RetryPlaner, TripFehler
+from recycling import SeitenWaechter
+from reiseliste import ReiselistenMitschnitt
+from reisefilter import ReiseFilter, info_aus_karte
+from reusables import get_credentials, get_env_credentials, get_last_email, get_saved_password, ts
+from routing import RoutingProfil
+from session import lade_session, session_gueltig, speichere_session
 
 # --- 1. KONFIGURATION ---
-SERVICE_NAME = "db_bahn_portal"
-DOWNLOAD_DIR = "rechnungen"
+# SERVICE_NAME, DOWNLOAD_DIR, WORKER_ANZAHL, ROUTING_PROFIL, LISTEN_MODUS, BATCH_PARALLEL: einstellungen.py
 BASE_URL = "https://www.bahn.de/buchung/reiseuebersicht/vergangene"
+REISE_LINK_SELEKTOR = "a[href*='auftragsnummer=']"
+LFD_STELLEN = 4  # Feste Breite der lfd. Nummer, die Gesamtzahl ist beim Streaming noch unbekannt
+QUEUE_GROESSE = 50  # Max. wartende Reisen zwischen Liste und Download-Workern
+ERSTELLUNG_PROBE_MS = 3000  # Kurz auf die erzeugte Rechnung schauen, danach übernimmt der RetryPlaner
+KLICKS_OHNE_NEUE = 3  # So viele Klicks in Folge ohne neue Reisen: Liste gilt als hängen geblieben
 
 
-# --- 2. HILFSFUNKTIONEN ---
+class Lauf:
+    """Zustand eines Abgleichs, den Liste, Worker und Downloads gemeinsam brauchen.
+    grenze ist die gemeinsame Obergrenze gleichzeitiger Reisen im Batch-Modus,
+    auswertung bekommt jede fertige Rechnung sofort für den Prozess-Pool."""
 
-def handle_cookies(page):
-    """Versucht Cookie-Popup zu schließen - mehrere Varianten"""
-    closed = False
+    def __init__(self, manifest: SyncManifest, download_dir: str = DOWNLOAD_DIR, api: RechnungsApi = None,
+                 grenze: asyncio.Semaphore | None = None, auswertung: Auswertung = None):
+        self.manifest = manifest
+        self.download_dir = download_dir
+        self.api = api
+        self.grenze = grenze
+        self.auswertung = auswertung
+        self.stats = {"neu": 0, "vorhanden": 0, "fehler": 0}
+        self.planer = RetryPlaner(max_offen=QUEUE_GROESSE)
 
-    # Variante 1: Englischer Button (kommt auf dem Screenshot vor!)
-    try:
-        cookie_btn = page.get_by_role("button", name="Allow all cookies")
-        if cookie_btn.is_visible(timeout=1000):
-            cookie_btn.click(force=True)
-            page.wait_for_timeout(500)
-            print(f"{ts()} ✅ Cookie-Popup geschlossen (EN)")
-            return True
-    except:
-        pass
 
-    # Variante 2: Deutscher Button
+# --- 2. HILFSFUNKTIONEN ---
+
+async def handle_cookies(page):
+    """Schließt das Cookie-Popup. Gelernter Selektor zuerst (selektoren.py); ist die
+    Zustimmung bekannt und im Context vorbelegt, wird je Context nur einmal nachgesehen."""
+    register = selektoren.register()
+    if register.consent_erledigt(page.context):
+        return False
+    if register.consent_bekannt:
+        register.context_erledigt(page.context)
+
+    # Variante 1/2: Button über das Register (EN/DE, gelernte Variante zuerst)
     try:
-        cookie_btn = page.get_by_role("button", name="Alle Cookies zulassen")
-        if cookie_btn.is_visible(timeout=1000):
-            cookie_btn.click(force=True)
-            page.wait_for_timeout(500)
-            print(f"{ts()} ✅ Cookie-Popup geschlossen (DE)")
+        cookie_btn = await register.finde(page, "cookie_zustimmen")
+        if cookie_btn is not None:
+            vorher = await register.schnappschuss(page)
+            await cookie_btn.click(force=True)
+            await readiness.warte_auf_locator(cookie_btn, "hidden", 2000)
+            await readiness.pause(page, 500)
+            await register.consent_lernen(page, vorher)
+            register.context_erledigt(page.context)
+            print(f"{ts()} ✅ Cookie-Popup geschlossen ({register.gelernt.get('cookie_zustimmen')})")
             return True
     except:
         pass
 
     # Variante 3: JavaScript Fallback
     try:
-        js_result = page.evaluate("""
+        js_result = await page.evaluate("""
             () => {
                 const buttons = Array.from(document.querySelectorAll('button'));
                 const cookieBtn = buttons.find(b => {
@@ -61,7 +104,7 @@ def handle_cookies(page):
             }
         """)
         if js_result:
-            page.wait_for_timeout(500)
+            await readiness.pause(page, 500)
             print(f"{ts()} ✅ Cookie-Popup geschlossen (JS)")
             return True
     except:
@@ -70,76 +113,186 @@ def handle_cookies(page):
     return False  # Kein Popup gefunden - aber auch kein Error ausgeben
 
 
-def load_all_reisen(page):
+@gemessen("load_all_reisen")
+async def load_all_reisen(page, klick_limit: int | None = 25, stop=None, nach_klick=None):
+    """Klickt "Weitere Reisen laden" bis kein Button mehr kommt, klick_limit erreicht ist
+    (None = unbegrenzt) oder stop() True liefert. nach_klick() wird nach jeder neuen
+    Charge aufgerufen, damit die Downloads schon während des Ladens starten.
+    Gibt True zurück, wenn die Liste vollständig ist (kein Button mehr oder stop()),
+    False bei klick_limit oder wenn KLICKS_OHNE_NEUE Klicks nichts nachgeladen haben."""
     print(f"{ts()} ▶ Starte Nachladen der Liste...")
-    klick_limit = 25
     klicks = 0
+    ohne_neue = 0
 
-    # Selektoren in Prioritätsreihenfolge
-    SELEKTOREN = [
-        "button:has(.test-button-label:text('Weitere Reisen laden'))",
-        "button:has(span:text('Weitere Reisen laden'))",
-        ".test-button-label:text('Weitere Reisen laden')",
-        "span.test-button-label >> text=Weitere Reisen laden",
-    ]
+    # Selektoren-Kandidaten und der zuletzt erfolgreiche stehen im Register (selektoren.py)
+    register = selektoren.register()
 
-    def finde_button():
-        for sel in SELEKTOREN:
-            try:
-                el = page.locator(sel).first
-                if el.count() > 0 and el.is_visible(timeout=500):
-                    return el
-            except Exception:
-                continue
-        return None
+    # Alle Varianten in einem Locator, um auf das Erscheinen irgendeiner zu warten
+    irgendein_button = register.locator(page, "weitere_reisen")
 
-    while klicks < klick_limit:
-        handle_cookies(page)
-        page.keyboard.press("End")
-        page.wait_for_timeout(1500)
+    async def finde_button():
+        return await register.finde(page, "weitere_reisen")
 
-        btn = finde_button()
+    while klick_limit is None or klicks < klick_limit:
+        if stop is not None and stop():
+            print(f"{ts()} ⏹️  Bereits exportierte Reise oder Ende des Zeitfensters erreicht, Liste vollständig.")
+            return True
+        await handle_cookies(page)
+        await page.keyboard.press("End")
+        await readiness.pause(page, 1500)
+        await readiness.warte_auf_locator(irgendein_button.first, "visible", 3000)
+
+        btn = await finde_button()
         if btn:
             print(f"{ts()}   ↓ Klick {klicks + 1}: Lade mehr...")
-            btn.scroll_into_view_if_needed()
-            btn.click(force=True)
-            page.wait_for_timeout(1500)
+            anzahl_vorher = await page.locator(REISE_LINK_SELEKTOR).count()
+            await btn.scroll_into_view_if_needed()
+            async with drossel.takt("liste") as takt:
+                await btn.click(force=True)
+                await readiness.pause(page, 1500)
+                # Neue Reisen sind da, sobald mehr Detail-Links im DOM hängen
+                nachgeladen = await readiness.warte_auf_mehr_elemente(
+                    page, REISE_LINK_SELEKTOR, anzahl_vorher, drossel.timeout(15000, "liste"))
+                takt.timeout = not nachgeladen
             klicks += 1
+            ohne_neue = 0 if nachgeladen else ohne_neue + 1
+            if nach_klick is not None:
+                await nach_klick()
+            if ohne_neue >= KLICKS_OHNE_NEUE:
+                print(f"{ts()} ⚠️ {ohne_neue} Klicks ohne neue Reisen, Liste unvollständig.")
+                return False
         else:
-            page.keyboard.press("End")
-            page.wait_for_timeout(1000)
-            btn2 = finde_button()
+            await page.keyboard.press("End")
+            await readiness.pause(page, 1000)
+            await readiness.warte_auf_netzwerkruhe(page, 2000)
+            btn2 = await finde_button()
             if btn2 is None:
                 print(f"{ts()} ✓ Keine weiteren 'Laden'-Buttons gefunden.")
-                page.evaluate("() => window.scrollTo(0, 0)")
-                page.wait_for_timeout(1000)
-                break
+                await page.evaluate("() => window.scrollTo(0, 0)")
+                await readiness.pause(page, 1000)
+                return True
             klicks += 1
 
-    return
-def collect_all_trips(page):
+    print(f"{ts()} ⚠️ Klick-Limit {klick_limit} erreicht, Liste evtl. unvollständig.")
+    return False
+async def collect_trips_from_network(page, stop_bei=None, bei_neuen=None, reisefilter: ReiseFilter = None):
+    """Reiseliste aus den JSON-Antworten der Übersicht: erste Seite mitlesen,
+    Folgeseiten direkt abfragen. Gibt (detailpages, vollständig) zurück; None = nicht
+    möglich, DOM-Weg nehmen (eine leere Liste heißt dagegen: der Filter hat alles
+    aussortiert)."""
+    mitschnitt = ReiselistenMitschnitt(page, bei_neuen, reisefilter, ueber_seite=har.aktiv()).starten()
+    try:
+        # Neu laden, damit die erste Listen-Antwort beim Mitschnitt ankommt
+        await page.goto(BASE_URL, wait_until="domcontentloaded", timeout=20000)
+        await handle_cookies(page)
+        await page.wait_for_selector(REISE_LINK_SELEKTOR, timeout=15000)
+        if not mitschnitt.eintraege:
+            await readiness.warte_auf_netzwerkruhe(page, 5000)
+        if not mitschnitt.eintraege:
+            print(f"{ts()} ⚠️ Keine Reiseliste im Netzwerk gefunden.")
+            return None
+        print(f"{ts()} 📡 Reiseliste aus Netzwerk: {len(mitschnitt.eintraege)} Reisen auf Seite 1")
+        if not await mitschnitt.lerne_url_muster():
+            print(f"{ts()} ⚠️ Kein Detail-Link als Vorlage gefunden.")
+            return None
+
+        vollstaendig = await mitschnitt.alle_seiten_laden(stop_bei)
+        if not vollstaendig:
+            # Paging-Parameter unbekannt oder Folgeseite gescheitert: weiter klicken,
+            # die Antworten liest der Mitschnitt mit
+            def genug():
+                if stop_bei is not None and any(stop_bei(nr) for nr in mitschnitt.eintraege):
+                    return True
+                return mitschnitt.fenster_verlassen()
+            vollstaendig = await load_all_reisen(page, klick_limit=None, stop=genug)
+            await readiness.warte_auf_netzwerkruhe(page, 5000)
+
+        detailpages = mitschnitt.detail_urls()
+        print(f"{ts()} ✅ {len(detailpages)} Reise-Links aus {mitschnitt.seiten} Listen-Antworten")
+        return detailpages, vollstaendig
+
+    except Exception as e:
+        print(f"{ts()} ⚠️ Netzwerk-Liste fehlgeschlagen: {e}")
+        return None
+    finally:
+        mitschnitt.beenden()
+
+
+@gemessen("collect_all_trips")
+async def collect_all_trips(page, listen_modus: str = LISTEN_MODUS, stop_bei=None, bei_neuen=None,
+                            reisefilter: ReiseFilter = None):
+    """Sammelt alle Detail-URLs. Mit bei_neuen(urls) wird jede neue Charge sofort
+    weitergereicht (Produzent der Download-Pipeline). reisefilter sortiert anhand der
+    Listendaten aus und beendet das Nachladen, sobald das Zeitfenster verlassen ist.
+    Gibt (detailpages, vollständig) zurück."""
+    if listen_modus == "netz":
+        ergebnis = await collect_trips_from_network(page, stop_bei, bei_neuen, reisefilter)
+        if ergebnis is not None:
+            return ergebnis
+        print(f"{ts()} ↩️  Fallback auf DOM-Extraktion")
+
     detailpages = []
+    vollstaendig = False
+    gefunden = {}  # href -> ausgewählt (Filter)
+    letzte_charge = []
+    selector = REISE_LINK_SELEKTOR
+
+    async def neue_links_melden():
+        # Zu jedem Link die .test-* Felder seiner Reisekarte (Datum, Kunde) für den Filter
+        karten = await page.evaluate("""
+            sel => [...document.querySelectorAll(sel)].map(a => {
+                const karte = a.closest('li, article, [class*="card"], [class*="reise"]') || a.parentElement;
+                const felder = {};
+                if (karte) {
+                    karte.querySelectorAll('[class*="test-"]').forEach(el => {
+                        for (const c of el.classList) {
+                            if (c.startsWith('test-') && !(c in felder)) felder[c] = el.innerText.trim();
+                        }
+                    });
+                }
+                return {href: a.href, felder};
+            })
+        """, selector)
+        neu = []
+        letzte_charge.clear()
+        for karte in karten:
+            href = karte["href"]
+            if href in gefunden:
+                continue
+            ausgewaehlt = True
+            if reisefilter is not None:
+                info = info_aus_karte(auftragsnummer_aus_url(href) or href, karte["felder"])
+                letzte_charge.append(info)
+                ausgewaehlt = reisefilter.passt(info)
+            gefunden[href] = ausgewaehlt
+            if ausgewaehlt:
+                neu.append(href)
+        if neu and bei_neuen is not None:
+            await bei_neuen(neu)
+
+    def bekannt_erreicht():
+        if stop_bei is not None and any(stop_bei(auftragsnummer_aus_url(h)) for h in gefunden):
+            return True
+        return reisefilter is not None and reisefilter.ueber_fenster(letzte_charge)
+
     print(f"{ts()} ▶ Starte Extraktion...")
     try:
-        page.wait_for_timeout(2000)
-        load_all_reisen(page)
+        await readiness.pause(page, 2000)
+        await page.wait_for_selector(selector, timeout=12000)
+        await neue_links_melden()
+        vollstaendig = await load_all_reisen(page, stop=bekannt_erreicht, nach_klick=neue_links_melden)
 
-        page.wait_for_timeout(2000)
+        await readiness.pause(page, 2000)
 
-        selector = "a[href*='auftragsnummer=']"
-        page.wait_for_selector(selector, timeout=12000)
-
-        hrefs = page.evaluate("""
-            () => [...document.querySelectorAll("a[href*='auftragsnummer=']")]
-                  .map(a => a.href)
-        """)
+        await page.wait_for_selector(selector, timeout=12000)
+        await neue_links_melden()
 
-        detailpages = list(dict.fromkeys(hrefs))
+        detailpages = [h for h, ausgewaehlt in gefunden.items() if ausgewaehlt]
 
         count = len(detailpages)
         if count == 0:
             print(f"{ts()} ⚠️ Keine Links gefunden.")
-            page.screenshot(path="debug_keine_auftragsnummer.png")
+            await page.screenshot(path="debug_keine_auftragsnummer.png")
         else:
             print(f"{ts()} ✅ {count} Reise-Links gefunden:")
             for i, url in enumerate(detailpages):
@@ -147,9 +300,10 @@ def collect_all_trips(page):
 
     except Exception as e:
         print(f"{ts()} ❌ Fehler bei der Extraktion: {e}")
-        page.screenshot(path="debug_exception.png")
+        await page.screenshot(path="debug_exception.png")
+        vollstaendig = False
 
-    return detailpages
+    return detailpages, vollstaendig
 def get_download_filename(datum_text, auftrag_text,kundenname):
     monate = {
         "Jan": "01", "Feb": "02", "Mär": "03", "Mrz": "03",
@@ -196,30 +350,31 @@ def get_download_filename(datum_text, auftrag_text,kundenname):
         return f"RG_FEHLER_{zeitstempel}.pdf"
 
 
-def login_to_bahn(page, email, password):
+@gemessen("login_to_bahn")
+async def login_to_bahn(page, email, password):
     print(f"{ts()} ? Öffne {BASE_URL}...")
-    page.goto(BASE_URL)
-    handle_cookies(page)
+    await page.goto(BASE_URL)
+    await handle_cookies(page)
     try:
         # Robuster Selektor über name-Attribut (nicht die dynamische ID)
-        page.wait_for_selector('input[name="username"]', timeout=15000)
-        page.locator('input[name="username"]').fill(email)
-        page.keyboard.press("Enter")
-        page.wait_for_timeout(500)
-        handle_cookies(page)
+        await page.wait_for_selector('input[name="username"]', timeout=15000)
+        await page.locator('input[name="username"]').fill(email)
+        await page.keyboard.press("Enter")
+        await readiness.pause(page, 500)
+        await handle_cookies(page)
 
         # Auch Passwort-Feld über name-Attribut ansprechen
-        page.wait_for_selector('input[name="password"]', timeout=10000)
-        page.locator('input[name="password"]').fill(password)
-        page.keyboard.press("Enter")
-        page.wait_for_timeout(500)
-        handle_cookies(page)
+        await page.wait_for_selector('input[name="password"]', timeout=10000)
+        await page.locator('input[name="password"]').fill(password)
+        await page.keyboard.press("Enter")
+        await readiness.pause(page, 500)
+        await handle_cookies(page)
 
-        if page.locator("text=Es ist ein Fehler aufgetreten").first.is_visible(timeout=2000):
-            page.goto(BASE_URL)
-            handle_cookies(page)
+        if await page.locator("text=Es ist ein Fehler aufgetreten").first.is_visible(timeout=2000):
+            await page.goto(BASE_URL)
+            await handle_cookies(page)
 
-        page.wait_for_url("**/vergangene**", timeout=20000)
+        await page.wait_for_url("**/vergangene**", timeout=20000)
         print(f"{ts()} ? Login erfolgreich.")
         return True
 
@@ -228,50 +383,94 @@ def login_to_bahn(page, email, password):
         return False
 
 
-def process_single_trip(page, url, index, total, stellen, stats):
+@gemessen("process_single_trip", schluessel=lambda page, url, *a, **kw: auftragsnummer_aus_url(url) or url)
+async def process_single_trip(page, url, index: int, lauf: Lauf):
+    stats, manifest, api = lauf.stats, lauf.manifest, lauf.api
+    beobachtung = None
     try:
-        print(f"{ts()} 📍 {index + 1}/{total}: Details")
+        print(f"{ts()} 📍 {index + 1}: Details")
 
         # 1. Schnelleres Laden: "domcontentloaded" reicht meistens aus
-        try:
-            # Wir warten nicht mehr auf 'networkidle', das dauert bei der Bahn zu lange
-            page.goto(url, wait_until="domcontentloaded", timeout=20000)
-        except Exception:
-            print(f"{ts()}    ⚠️ Timeout beim Laden, versuche direkten Zugriff...")
-            page.goto(url, wait_until="commit", timeout=30000)
+        # Takt und Timeouts kommen von der Drossel (passt sich an Latenz und Fehler an)
+        with messe("trip.goto"):
+            try:
+                # Wir warten nicht mehr auf 'networkidle', das dauert bei der Bahn zu lange
+                async with drossel.takt("goto"):
+                    await page.goto(url, wait_until="domcontentloaded", timeout=drossel.timeout(20000))
+            except Exception:
+                print(f"{ts()}    ⚠️ Timeout beim Laden, versuche direkten Zugriff...")
+                try:
+                    async with drossel.takt("goto"):
+                        await page.goto(url, wait_until="commit", timeout=drossel.timeout(30000))
+                except Exception as e:
+                    raise TripFehler(retry.NAVIGATION_TIMEOUT, str(e)) from e
 
         # 2. Warten auf Kerndaten
         auftrag_locator = page.locator(".test-auftragsnummer")
-        auftrag_locator.wait_for(state="attached", timeout=90000)
-
-        # Schneller Check ob Text da ist, sonst Mini-Pause
-        if not auftrag_locator.inner_text().strip():
-            page.wait_for_timeout(1000)
-
-        auftrag = auftrag_locator.inner_text().strip()
-        datum_raw = page.locator(".test-anlagedatum").inner_text().strip()
-        kundenname = page.locator(".test-kundenname").inner_text().strip()
-
-        # Dateiname und Existenz-Check
-        lfd_nummer = str(index + 1).zfill(stellen)
+        with messe("trip.warten_auftragsnummer"):
+            if not await readiness.warte_auf_locator(auftrag_locator, "attached", drossel.timeout(90000)):
+                raise TripFehler(retry.ELEMENT_FEHLT, "'.test-auftragsnummer' nicht gefunden")
+
+        # Schneller Check ob Text da ist, sonst auf den Text warten
+        if not (await auftrag_locator.inner_text()).strip():
+            await readiness.pause(page, 1000)
+            await readiness.warte_auf_text(page, ".test-auftragsnummer", 5000)
+
+        auftrag = (await auftrag_locator.inner_text()).strip()
+        datum_raw = (await page.locator(".test-anlagedatum").inner_text()).strip()
+        kundenname = (await page.locator(".test-kundenname").inner_text()).strip()
+
+        # Dateiname und Existenz-Check über das Manifest (der Dateiname bekommt
+        # erst in download_save die Rechnungsnummer, ein os.path.exists greift hier nicht)
+        lfd_nummer = str(index + 1).zfill(LFD_STELLEN)
         filename = get_download_filename(datum_raw, auftrag, kundenname).replace("RG", f"RG_{lfd_nummer}", 1)
-        filepath = os.path.join(DOWNLOAD_DIR, filename)
+        filepath = os.path.join(lauf.download_dir, filename)
+        auftragsnummer = auftragsnummer_aus_url(url) or auftrag.replace("Auftragsnummer", "").strip()
 
-        if os.path.exists(filepath):
-            print(f"{ts()} ⏭️  {index + 1}/{total}: Bereits vorhanden: {filename}")
+        if manifest.ist_exportiert(auftragsnummer):
+            print(f"{ts()} ⏭️  {index + 1}: Bereits vorhanden: {filename}")
             stats["vorhanden"] += 1
             return True
 
-        print(f"{ts()} 📍 {index + 1}/{total}: Download {filename} vorbereiten...")
+        print(f"{ts()} 📍 {index + 1}: Download {filename} vorbereiten...")
+
+        # API-Modus: gelernte Backend-Aufrufe direkt über die Session des Contexts
+        if api is not None and api.gelernt:
+            try:
+                with messe("trip.api_abruf"):
+                    async with drossel.takt("download"):
+                        ergebnis = await api.lade_pdf(page.context.request, auftragsnummer)
+            except Exception as e:
+                # Nur Timeouts kommen hier an: die Drossel hat sie gezählt, die Reise kommt später wieder
+                raise TripFehler(retry.NAVIGATION_TIMEOUT, f"API-Abruf: {e}") from e
+            if ergebnis is not None:
+                inhalt, original_name = ergebnis
+                filepath, rechnungsnr = pfad_mit_rechnungsnr(filepath, original_name)
+                # APIResponse liefert den Body nur komplett im Speicher; geschrieben wird
+                # im Thread, damit die anderen Worker nicht auf die Platte warten
+                await asyncio.to_thread(ablage.schreiben, ablage.temp_pfad(filepath), inhalt)
+                if not registriere_download(filepath, rechnungsnr, lauf, auftragsnummer):
+                    raise TripFehler(retry.DOWNLOAD_FEHLER, "Datei konnte nicht gespeichert werden")
+                return True
+        if api is not None:
+            api.zaehler["ui"] += 1
 
         # 3. Download-Logik mit priorisiertem JS-Klick
         # Wir definieren eine Funktion für den Klick, um Code-Duplikate zu vermeiden
-        def trigger_download():
-            # 1. Ans Ende der Seite scrollen, damit der Button geladen wird
-            page.keyboard.press("End")
-            page.wait_for_timeout(1500)  # Zeit für die Bahn-Seite zu reagieren
+        register = selektoren.register()
 
-            page.evaluate("""() => {
+        async def trigger_download(aktion="rechnung_pdf"):
+            # 1. Ans Ende der Seite scrollen, damit der Button geladen wird
+            await page.keyboard.press("End")
+            await readiness.pause(page, 1500)  # Zeit für die Bahn-Seite zu reagieren
+            await readiness.warte_auf_locator(page.locator("button", has_text="Rechnung").first, "attached", 5000)
+
+            # 2. Gelernter Selektor aus dem Register, sonst alle Buttons per JS durchsuchen
+            btn = await register.finde(page, aktion)
+            if btn is not None:
+                await btn.click(force=True)
+                return True
+            return await page.evaluate("""() => {
                 // Wir nutzen Array.find, um den Button am Text zu erkennen
                 const buttons = Array.from(document.querySelectorAll('button'));
                 const btn = buttons.find(b => 
@@ -285,47 +484,69 @@ def process_single_trip(page, url, index, total, stellen, stats):
                 return false;
             }""")
 
+        # Beim UI-Weg mitschneiden, welche Backend-Aufrufe das Portal macht
+        if api is not None:
+            beobachtung = api.beobachte(page, auftragsnummer)
+
         # 4. Falls Button "Rechnung erstellen" da ist
-        create_btn = page.locator("button.rechnung-abruf__create-rechnung-button")
-        if create_btn.is_visible(timeout=2000):
+        download_btn = register.locator(page, "rechnung_pdf").first
+        if await register.finde(page, "rechnung_erstellen") is not None:
             print(f"{ts()}    ⚙️  Rechnung wird angefordert...")
-            trigger_download()
-            page.wait_for_timeout(3000)  # Zeit für Generierung
+            with messe("trip.rechnung_erstellen"):
+                await trigger_download("rechnung_erstellen")
+                # Generierung ist fertig, sobald der PDF-Button erscheint. Dauert es länger,
+                # kommt die Reise nach dem Backoff des RetryPlaners nochmal dran - der
+                # Worker nimmt solange die nächste Reise statt hier zu warten.
+                if not await readiness.warte_auf_locator(download_btn, "visible", ERSTELLUNG_PROBE_MS):
+                    raise TripFehler(retry.RECHNUNG_IN_ERSTELLUNG, "PDF-Button nach 'Rechnung erstellen' fehlt")
 
         # 5. Der eigentliche Download-Klick
         try:
-            with page.expect_download(timeout=20000) as download_info:
-                # Wir versuchen erst den "sauberen" Klick, falls das Element bereit ist
-                download_btn = page.get_by_role("button", name="Rechnung als PDF herunterladen")
-                if download_btn.is_visible():
-                    download_btn.click(force=True, timeout=500)
-                else:
-                    # Sofortiger JS-Backup-Klick
-                    trigger_download()
-
-            download_save(download_info, filepath, stats)
-            return True
+            with messe("trip.download_event"):
+                async with drossel.takt("download"), \
+                        page.expect_download(timeout=drossel.timeout(20000, "download")) as download_info:
+                    # Wir versuchen erst den "sauberen" Klick, falls das Element bereit ist
+                    if (btn := await register.finde(page, "rechnung_pdf")) is not None:
+                        await btn.click(force=True, timeout=500)
+                    else:
+                        # Sofortiger JS-Backup-Klick
+                        await trigger_download()
+
+            gespeichert = await download_save(download_info, filepath, lauf, auftragsnummer)
 
         except Exception as e:
             # Letzter Rettungsversuch: Nochmal JS-Klick falls Timeout
             print(f"{ts()}    ⚠️ Timeout beim Download-Event, starte JS-Retry...")
-            with page.expect_download(timeout=10000) as download_info:
-                trigger_download()
-            download_save(download_info, filepath, stats)
-            return True
+            try:
+                with messe("trip.download_event", retry=True):
+                    async with drossel.takt("download"), \
+                            page.expect_download(timeout=drossel.timeout(10000, "download")) as download_info:
+                        await trigger_download()
+            except Exception as e:
+                raise TripFehler(retry.DOWNLOAD_FEHLER, str(e)) from e
+            gespeichert = await download_save(download_info, filepath, lauf, auftragsnummer)
+
+        if not gespeichert:
+            raise TripFehler(retry.DOWNLOAD_FEHLER, "Datei konnte nicht gespeichert werden")
+
+        if beobachtung is not None:
+            api.lerne(beobachtung)
+        return True
 
     except Exception as e:
         print(f"{ts()}    ✗ Fehler bei Reise {index + 1}: {e}")
         stats["fehler"] += 1
-        return False
+        if isinstance(e, TripFehler):
+            raise
+        raise TripFehler(retry.klassifiziere(e), str(e)) from e
 
+    finally:
+        if beobachtung is not None:
+            beobachtung.beenden()
 
-def download_save(download_info, filepath: str, stats):
-    download = download_info.value
-
-    # Originaldateiname von der Bahn, z.B. "DB_Rechnung_607227512704.pdf"
-    original_name = download.suggested_filename
 
+def pfad_mit_rechnungsnr(filepath: str, original_name: str) -> tuple[str, str]:
+    """Hängt die Rechnungsnummer aus dem Originalnamen der Bahn an den Dateinamen."""
     # Rechnungsnummer extrahieren: "607227512704"
     # aus "DB_Rechnung_607227512704.pdf"
     rechnungsnr = ""
@@ -341,76 +562,383 @@ def download_save(download_info, filepath: str, stats):
     if rechnungsnr:
         base, ext = os.path.splitext(filepath)
         filepath = f"{base}_{rechnungsnr}{ext}"
+    return filepath, rechnungsnr
+
+
+def registriere_download(filepath: str, rechnungsnr: str, lauf: Lauf, auftragsnummer: str = None) -> bool:
+    """Übernimmt die fertige .part-Datei geprüft ins Objektlager und verlinkt filepath darauf."""
+    try:
+        sha256 = ablage.ablegen(ablage.temp_pfad(filepath), filepath)
+    except (OSError, ablage.AblageFehler) as e:
+        print(f"{ts()}    ✗ Fehler: Datei konnte nicht gespeichert werden ({e}).")
+        return False
+    print(f"{ts()}    ✓ Erfolg: '{os.path.basename(filepath)}'")
+    lauf.stats["neu"] += 1
+    if auftragsnummer:
+        lauf.manifest.eintragen(auftragsnummer, filepath, rechnungsnr, sha256)
+    return True
 
-    download.save_as(filepath)
-
-    if os.path.exists(filepath) and os.path.getsize(filepath) > 0:
-        print(f"{ts()}    ✓ Erfolg: '{os.path.basename(filepath)}'")
-        stats["neu"] += 1
-    else:
-        print(f"{ts()}    ✗ Fehler: Datei konnte nicht gespeichert werden.")
-
-def run_download():
-    email, password = get_credentials(SERVICE_NAME)
-    stats = {"neu": 0, "vorhanden": 0, "fehler": 0}
-
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False, slow_mo=500)
-        #context = browser.new_context(user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0.0.0")
-        context = browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0.0.0",
-            locale="de-DE",  # Browser-Locale auf Deutsch
-            extra_http_headers={
-                "Accept-Language": "de-DE,de;q=0.9"  # HTTP-Header erzwingt deutsche Seite
-            }
-        )
 
-        page = context.new_page()
+@gemessen("download_save")
+async def download_save(download_info, filepath: str, lauf: Lauf, auftragsnummer: str = None):
+    download = await download_info.value
+
+    # Originaldateiname von der Bahn, z.B. "DB_Rechnung_607227512704.pdf"
+    filepath, rechnungsnr = pfad_mit_rechnungsnr(filepath, download.suggested_filename)
+
+    await download.save_as(ablage.temp_pfad(filepath))
+    return registriere_download(filepath, rechnungsnr, lauf, auftragsnummer)
+
+async def run_download(workers: int = WORKER_ANZAHL, session_nutzen: bool = True,
+                       routing_profil: str = ROUTING_PROFIL, api_modus: bool = False,
+                       listen_modus: str = LISTEN_MODUS, nur_neue: bool = False,
+                       metrik_datei: str | None = None, zugangsdaten: tuple[str, str] | None = None,
+                       headless: bool = False, auswerten: bool = False, reisefilter: ReiseFilter = None,
+                       har_aufnahme: str | None = None, har_wiedergabe: str | None = None):
+    """Kompletter Export. zugangsdaten=(email, passwort) ersetzt die interaktive Abfrage.
+    har_aufnahme/har_wiedergabe: Lauf als HAR mitschneiden bzw. offline aus einer HAR
+    abspielen (siehe har.py). Gibt die stats zurück, None wenn der Login scheitert."""
+    metrics.starten(metrik_datei)
+    if har_aufnahme or har_wiedergabe:
+        # Login gehört zur Aufnahme, die Wiedergabe meldet sich mit den Platzhaltern an
+        session_nutzen = False
+        if api_modus:
+            print(f"{ts()} ⚠️ API-Modus läuft über context.request und damit an der HAR vorbei - aus.")
+            api_modus = False
+    if har_wiedergabe:
+        zugangsdaten = (har.REPLAY_EMAIL, har.REPLAY_PASSWORT)
+    drossel.starten(workers)
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=headless, slow_mo=readiness.slow_mo())
+        stats = await export_konto(browser, zugangsdaten, DOWNLOAD_DIR, workers=workers,
+                                   session_nutzen=session_nutzen, routing_profil=routing_profil,
+                                   api_modus=api_modus, listen_modus=listen_modus, nur_neue=nur_neue,
+                                   auswerten=auswerten, reisefilter=reisefilter,
+                                   har_aufnahme=har_aufnahme, har_wiedergabe=har_wiedergabe)
+        belege.pool_beenden()
+        metrics.drucke_zusammenfassung()
+        metrics.aktiv().close()
+        await browser.close()
+    return stats
+
+
+async def run_batch(emails: list[str], max_parallel: int = BATCH_PARALLEL, workers: int = WORKER_ANZAHL,
+                    session_nutzen: bool = True, routing_profil: str = ROUTING_PROFIL,
+                    api_modus: bool = False, listen_modus: str = LISTEN_MODUS, nur_neue: bool = False,
+                    metrik_datei: str | None = None, headless: bool = False,
+                    auswerten: bool = False, reisefilter: ReiseFilter = None) -> dict[str, dict]:
+    """Export für mehrere Konten in einem Browser-Prozess, ein isolierter Context je Konto.
+    Passwörter kommen aus dem Keyring (SERVICE_NAME), PDFs nach DOWNLOAD_DIR/<konto>.
+    max_parallel begrenzt die gleichzeitig bearbeiteten Reisen über alle Konten."""
+    metrics.starten(metrik_datei)
+    grenze = asyncio.Semaphore(max(1, max_parallel))
+    drossel.starten(max_parallel)
+    ergebnisse = {}
+    abgebrochen = {}  # email -> Grund
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=headless, slow_mo=readiness.slow_mo())
+        print(f"{ts()} 👥 Batch: {len(emails)} Konten, max. {max_parallel} Reisen gleichzeitig")
+
+        async def konto(email):
+            try:
+                password = get_saved_password(SERVICE_NAME, email)
+                if not password:
+                    print(f"{ts()} ⚠️ [{email}] Kein Passwort im Keyring ({SERVICE_NAME}), übersprungen.")
+                    return
+                stats = await export_konto(
+                    browser, (email, password), konto_ordner(email), workers=workers,
+                    session_nutzen=session_nutzen, routing_profil=routing_profil, api_modus=api_modus,
+                    listen_modus=listen_modus, nur_neue=nur_neue, grenze=grenze, auswerten=auswerten,
+                    reisefilter=reisefilter)
+            except Exception as e:
+                # Ein kaputtes Konto soll die anderen nicht mitreißen; aufgeräumt hat export_konto
+                print(f"{ts()} ✗ [{email}] Export abgebrochen: {e}")
+                abgebrochen[email] = f"abgebrochen: {type(e).__name__}: {e}"
+                return
+            if stats is None:
+                print(f"{ts()} ✗ [{email}] Login fehlgeschlagen, übersprungen.")
+                abgebrochen[email] = "Login fehlgeschlagen"
+            else:
+                ergebnisse[email] = stats
 
-        if not login_to_bahn(page, email, password):
-            browser.close()
-            return
+        try:
+            await asyncio.gather(*(konto(email) for email in emails))
+        finally:
+            belege.pool_beenden()
+            await browser.close()
+
+    print(f"{ts()}\n--- BATCH-BERICHT ---")
+    for email in emails:
+        stats = ergebnisse.get(email)
+        if stats is None:
+            print(f"    {email:<40} nicht exportiert ({abgebrochen.get(email, 'kein Passwort')})")
+        else:
+            print(f"    {email:<40} Neu: {stats['neu']:>4} | Vorhanden: {stats['vorhanden']:>4} | "
+                  f"Fehler: {stats['fehler']:>4} | Nicht erledigt: {stats['unerledigt']:>4}")
+    metrics.drucke_zusammenfassung()
+    metrics.aktiv().close()
+    return ergebnisse
+
+
+def konto_ordner(email: str) -> str:
+    """Unterordner von DOWNLOAD_DIR für ein Konto im Batch-Modus."""
+    name = "".join(c if c.isalnum() or c in "._-@" else "_" for c in email.lower())
+    return os.path.join(DOWNLOAD_DIR, name)
+
+
+async def export_konto(browser, zugangsdaten: tuple[str, str] | None, download_dir: str = DOWNLOAD_DIR,
+                       workers: int = WORKER_ANZAHL, session_nutzen: bool = True,
+                       routing_profil: str = ROUTING_PROFIL, api_modus: bool = False,
+                       listen_modus: str = LISTEN_MODUS, nur_neue: bool = False,
+                       grenze: asyncio.Semaphore | None = None, auswerten: bool = False,
+                       reisefilter: ReiseFilter = None, har_aufnahme: str | None = None,
+                       har_wiedergabe: str | None = None):
+    """Export eines Kontos in einem eigenen Browser-Context (Cookies, Session, Routing
+    und Manifest sind je Konto getrennt). Gibt die stats des Kontos zurück, None wenn
+    der Login scheitert."""
+    # Gespeicherte Session der zuletzt verwendeten E-Mail, Login nur falls abgelaufen
+    email = zugangsdaten[0] if zugangsdaten else get_last_email(SERVICE_NAME)
+    storage_state = lade_session(SERVICE_NAME, email) if session_nutzen else None
+
+    context, routing, api = await konto_context(browser, storage_state, routing_profil, api_modus,
+                                                har_aufnahme, har_wiedergabe)
+    # Ab hier in try/finally: auch bei einem Fehler wird der Context geschlossen und
+    # die HAR-Aufnahme geschwärzt - sonst bliebe sie mit Cookies und Tokens liegen.
+    # Im Batch-Modus bleiben so auch keine Contexts und SQLite-Verbindungen übrig.
+    manifest = None
+    try:
+        page = await context.new_page()
+        angemeldet = await anmelden(context, page, email, zugangsdaten, storage_state, session_nutzen)
+        if angemeldet is None:
+            return None
+        email = angemeldet
 
         # Hauptlogik
         # # page again?
         # print(f"{ts()} Reload {BASE_URL}")
         # page.goto(BASE_URL)
-        detail_urls = collect_all_trips(page)
-        count = len(detail_urls)
-        print(f"{ts()} 📊 {count} Reisen gefunden.")
-
-        os.makedirs(DOWNLOAD_DIR, exist_ok=True)
-
-        stellen = len(str(count))  # Gibt 2 bei 52 Reisen, 3 bei 100+
-        toDoUrls = detail_urls
-        trys = 0.
-        maxtrys = 5.
-        indices = list(range(len(toDoUrls)))  # einmalig am Anfang
-
-        while len(toDoUrls) > 0 and trys < maxtrys:
-            toDoUrls, indices = process_urls(count, toDoUrls, page, stats, stellen, indices)
-            trys += 1
-        print(f"{ts()}\n--- BERICHT: Neu: {stats['neu']} | Vorhanden: {stats['vorhanden']} | Fehler: {stats['fehler']} ---")
-        browser.close()
-
-
-def process_urls(count: int, detail_urls: list, page, stats: dict[str, int], stellen: int,
-                 start_indices: list[int] = None):
-    unprocessed_urls = []
-    unprocessed_indices = []
-
-    if start_indices is None:
-        start_indices = list(range(len(detail_urls)))
+        manifest = oeffne_manifest(download_dir)
+        auswertung = None
+        if auswerten:
+            if belege.verfuegbar():
+                auswertung = Auswertung(manifest)
+            else:
+                print(f"{ts()} ⚠️ pypdf nicht installiert, Auswertung der PDFs übersprungen.")
+        lauf = Lauf(manifest, download_dir, api=api, grenze=grenze, auswertung=auswertung)
+
+        pages = [await context.new_page() for _ in range(max(1, workers))]
+        print(f"{ts()} 🧵 {len(pages)} parallele Seite(n) für {email}")
+        if reisefilter is not None:
+            reisefilter = reisefilter.kopie()
+        await synchronisieren(page, pages, lauf, listen_modus=listen_modus, nur_neue=nur_neue,
+                              reisefilter=reisefilter)
+        stats, planer = lauf.stats, lauf.planer
+        if auswertung is not None:
+            await auswertung.abschliessen(download_dir)
+        if "erste_reise_s" in stats:
+            print(f"{ts()} ⏱️  Erste Rechnung nach {stats['erste_reise_s']:.1f} s")
+        print(f"{ts()}\n--- BERICHT {email}: Neu: {stats['neu']} | Vorhanden: {stats['vorhanden']} | "
+              f"Fehler: {stats['fehler']} | Nicht erledigt: {stats['unerledigt']} ---")
+        if stats["liste_unvollstaendig"]:
+            print(f"{ts()} ⚠️ Reiseliste nicht vollständig geladen, Export unvollständig.")
+        if reisefilter is not None:
+            print(f"{ts()} 🔎 {reisefilter.bericht()}")
+        print(f"{ts()} 🔁 {planer.bericht()}")
+        print(f"{ts()} 🚦 {routing.bericht()}")
+        print(f"{ts()} 🐢 {drossel.bericht()}")
+        print(f"{ts()} ♻️  {recycling.bericht()}")
+        if traces.aktiv():
+            print(f"{ts()} 🎞️  {traces.bericht()}")
+        if api is not None:
+            print(f"{ts()} 🔌 {api.bericht()}")
+        if auswertung is not None:
+            print(f"{ts()} 📒 {auswertung.bericht()}")
+        if stats.get("trips_gemessen"):
+            schnitt = stats["trip_sekunden"] / stats["trips_gemessen"]
+            print(f"{ts()} ⏱️  Ø {schnitt:.1f} s pro Reise ({stats['trips_gemessen']} gemessen, Wartemodus: {readiness.modus_name()})")
+        if session_nutzen:
+            speichere_session(SERVICE_NAME, email, await context.storage_state())
+        return stats
+    finally:
+        if manifest is not None:
+            manifest.close()
+        try:
+            await traces.beenden(context)
+            await context.close()  # schreibt auch die HAR-Aufnahme
+        finally:
+            if har_aufnahme:
+                har.abschliessen(har_aufnahme, email, _har_passwort(zugangsdaten, email))
 
-    print(f"{ts()} Download {len(detail_urls)} Reisen")
-    for i, (url, orig_i) in enumerate(zip(detail_urls, start_indices)):
-        success = process_single_trip(page, url, orig_i, count, stellen, stats)
-        if not success:
-            unprocessed_urls.append(url)
-            unprocessed_indices.append(orig_i)  # orig_i merken, nicht i
-            print(f"{ts()}   ??  Verarbeite später: {url}...")
 
-    return unprocessed_urls, unprocessed_indices
+def _har_passwort(zugangsdaten: tuple[str, str] | None, email: str | None) -> str | None:
+    """Passwort, das in der HAR-Aufnahme ersetzt werden muss (Keyring, falls nicht übergeben)."""
+    if zugangsdaten:
+        return zugangsdaten[1]
+    try:
+        return get_saved_password(SERVICE_NAME, email) if email else None
+    except Exception:
+        return None  # Formularfelder schwärzt har.schwaerzen trotzdem
+
+
+async def konto_context(browser, storage_state: dict | None = None, routing_profil: str = ROUTING_PROFIL,
+                        api_modus: bool = False, har_aufnahme: str | None = None,
+                        har_wiedergabe: str | None = None):
+    """Neuer Browser-Context mit Routing-Profil und (optional) API-Mitschnitt und HAR."""
+    #context = browser.new_context(user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0.0.0")
+    context = await browser.new_context(
+        user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0.0.0",
+        locale="de-DE",  # Browser-Locale auf Deutsch
+        extra_http_headers={
+            "Accept-Language": "de-DE,de;q=0.9"  # HTTP-Header erzwingt deutsche Seite
+        },
+        storage_state=storage_state,
+        **har.context_optionen(har_aufnahme),
+    )
+    routing = RoutingProfil(routing_profil, BASE_URL)
+    await routing.installieren(context)
+    drossel.beobachten(context, BASE_URL)
+    # Bekannte Cookie-Zustimmung vorbelegen, handle_cookies hat dann nichts mehr zu tun
+    await selektoren.register().vorbelegen(context)
+    if har_wiedergabe:
+        # Nach dem Routing registriert, damit die HAR zuerst gefragt wird
+        await har.wiedergabe_installieren(context, har_wiedergabe)
+    await traces.starten(context)
+    api = None
+    if api_modus:
+        api = RechnungsApi()
+        api.verbinden(context)
+    return context, routing, api
+
+
+async def anmelden(context, page, email: str | None, zugangsdaten: tuple[str, str] | None,
+                   storage_state: dict | None, session_nutzen: bool = True) -> str | None:
+    """Gespeicherte Session prüfen, sonst einloggen. Gibt die E-Mail des Kontos zurück,
+    None wenn der Login scheitert."""
+    if storage_state and await session_gueltig(page, BASE_URL):
+        print(f"{ts()} 🔑 Gespeicherte Session für {email} gültig, Login übersprungen.")
+        return email
+    if storage_state:
+        print(f"{ts()} 🔑 Session abgelaufen, neuer Login...")
+        await context.clear_cookies()
+    email, password = zugangsdaten or get_env_credentials(SERVICE_NAME) or get_credentials(SERVICE_NAME)
+    if not await login_to_bahn(page, email, password):
+        return None
+    if session_nutzen:
+        speichere_session(SERVICE_NAME, email, await context.storage_state())
+    return email
+
+
+def oeffne_manifest(download_dir: str) -> SyncManifest:
+    os.makedirs(download_dir, exist_ok=True)
+    # Nur alte Reste im eigenen Ordner: im Batch-Modus laden andere Konten daneben
+    ablage.aufraeumen(download_dir)
+    manifest = SyncManifest(manifest_pfad(download_dir))
+    if len(manifest) == 0:
+        manifest.importiere_bestand(download_dir)
+    return manifest
+
+
+async def synchronisieren(page, pages: list, lauf: Lauf, listen_modus: str = LISTEN_MODUS,
+                          nur_neue: bool = False, reisefilter: ReiseFilter = None) -> Lauf:
+    """Ein Abgleich: Reiseliste auf page laden und neue Rechnungen auf pages herunterladen.
+    Ergebnis steht in lauf.stats und lauf.planer."""
+    stats, planer, manifest = lauf.stats, lauf.planer, lauf.manifest
+    # Pipeline: die Listen-Seite produziert Detail-URLs, die Worker-Seiten laden
+    # parallel dazu herunter. Worker-Seiten teilen sich Context und Login-Session.
+    planer.produzent_starten()
+
+    # Bei --nur-neue endet die Liste an der ersten bereits exportierten Reise
+    stop_bei = manifest.ist_exportiert if nur_neue else None
+    gemeldet = {}
+
+    async def bei_neuen(urls):
+        # Index = Position in der Liste (Reihenfolge der Entdeckung), damit bleibt
+        # lfd_nummer stabil. Bekannte Reisen werden vor jeder Detailseite aussortiert.
+        for url in urls:
+            nummer = auftragsnummer_aus_url(url) or url
+            if nummer in gemeldet:
+                continue
+            gemeldet[nummer] = len(gemeldet)
+            if manifest.ist_exportiert(nummer):
+                stats["vorhanden"] += 1
+            else:
+                await planer.einreihen(gemeldet[nummer], url)
+
+    async def produzent():
+        stats["liste_unvollstaendig"] = True  # bis die Liste das Gegenteil meldet
+        try:
+            _, vollstaendig = await collect_all_trips(page, listen_modus, stop_bei, bei_neuen, reisefilter)
+            stats["liste_unvollstaendig"] = not vollstaendig
+        finally:
+            planer.produzent_fertig()
+            print(f"{ts()} 📊 {len(gemeldet)} Reisen gefunden, {stats['vorhanden']} bereits exportiert.")
+
+    await asyncio.gather(produzent(), process_urls(pages, lauf))
+    # "fehler" zählt jeden Fehlversuch, auch wenn der Retry später klappt. Für das
+    # Ergebnis zählt, was aufgegeben wurde oder wegen Abbruch liegen blieb.
+    stats["unerledigt"] = len(planer.unerledigt())
+    stats["abgebrochen"] = planer.abgebrochen
+    return lauf
+
+
+def erfolgreich(stats: dict | None) -> bool:
+    """Lauf vollständig: eingeloggt, Reiseliste ganz geladen, keine Reise aufgegeben
+    oder liegen geblieben."""
+    return (stats is not None and not stats["unerledigt"] and not stats["abgebrochen"]
+            and not stats["liste_unvollstaendig"])
+
+
+def reise_name(url: str, index: int) -> str:
+    """Auftragsnummer aus dem Link, sonst die Position in der Liste (für Dateinamen)."""
+    return auftragsnummer_aus_url(url) or f"reise{index + 1:0{LFD_STELLEN}d}"
+
+
+async def process_urls(pages: list, lauf: Lauf):
+    """Verteilt die Reisen aus lauf.planer auf die Worker-Seiten, bis die Liste fertig
+    und die Warteschlange leer ist. Fehlgeschlagene Reisen plant der RetryPlaner je
+    nach Fehlerklasse mit Backoff neu ein."""
+    stats, planer = lauf.stats, lauf.planer
+    pipeline_start = time.perf_counter()
+
+    async def worker(nr):
+        waechter = SeitenWaechter(pages[nr])
+        while (naechste := await planer.naechster()) is not None:
+            orig_i, url = naechste
+            fehler = None
+            try:
+                async with lauf.grenze or contextlib.nullcontext():
+                    start = time.perf_counter()
+                    await process_single_trip(waechter.page, url, orig_i, lauf)
+            except TripFehler as e:
+                fehler = e.klasse
+                planer.fehlschlag(orig_i, url, e.klasse)
+            else:
+                planer.erfolg(orig_i)
+                if lauf.auswertung is not None:
+                    lauf.auswertung.einreichen(auftragsnummer_aus_url(url))
+                stats.setdefault("erste_reise_s", time.perf_counter() - pipeline_start)
+                stats["trip_sekunden"] = stats.get("trip_sekunden", 0) + time.perf_counter() - start
+                stats["trips_gemessen"] = stats.get("trips_gemessen", 0) + 1
+
+            dauer = time.perf_counter() - start
+            # Fehler und Ausreißer: Trace-Ring der letzten Reisen sichern
+            await traces.nach_reise(waechter.page.context, reise_name(url, orig_i), dauer, fehler)
+            # Renderer-Speicher und Latenz prüfen, Seite ggf. im selben Context erneuern
+            grund = await waechter.pruefen(dauer)
+            if grund:
+                pages[nr] = await waechter.recyceln(grund)
+
+    print(f"{ts()} Download startet mit {len(pages)} Worker(n)")
+    await asyncio.gather(*(worker(nr) for nr in range(len(pages))))
+
+    for orig_i, url in planer.unerledigt():
+        print(f"{ts()}   ??  Nicht verarbeitet: {url}")
 
 if __name__ == "__main__":
-    run_download()
\ No newline at end of file
+    # Eine Kommandozeile für alles: die Optionen leben in cli.py. Direkt gestartet wie
+    # früher mit sichtbarem Browser und Rückfrage, wenn keine Zugangsdaten hinterlegt sind.
+    import cli
+
+    sys.exit(cli.main(["sync", "--interaktiv", "--sichtbar", *sys.argv[1:]]))
@@ -0,0 +1,224 @@
+"""Inhaltsadressierte Ablage der Rechnungs-PDFs.
+
+Jede Rechnung liegt genau einmal unter rechnungen/.objekte/<sha256[:2]>/<sha256>.pdf,
+die lesbaren RG_...pdf Namen sind Hardlinks darauf (Fallback: Symlink, notfalls Kopie).
+Downloads landen erst in einer .part-Datei, werden geprüft, gehasht und atomar
+umbenannt - abgebrochene oder HTML-Fehlerseiten kommen so nie unter einen RG_-Namen.
+
+    python ablage.py rechnungen               # Archiv prüfen
+    python ablage.py rechnungen --reparieren  # defekte Objekte aussortieren, Altbestand übernehmen
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from reusables import ts
+
+OBJEKT_DIR = ".objekte"
+DEFEKT_DIR = ".defekt"
+TEMP_ENDUNGEN = (".part", ".tmp")
+# Jüngere Arbeitsdateien gehören womöglich zu einem laufenden Sync (watch, anderes Konto)
+TEMP_MIN_ALTER_S = 15 * 60
+MIN_GROESSE = 64  # Kleinere "PDFs" sind immer Fehlerseiten
+PRUEF_THREADS = min(32, (os.cpu_count() or 2) * 4)  # hashlib gibt das GIL frei
+
+
+class AblageFehler(ValueError):
+    """Datei ist kein vollständiges PDF."""
+
+
+def pdf_fehler(pfad: str) -> str | None:
+    """Grund, warum die Datei kein vollständiges PDF ist, oder None."""
+    groesse = os.path.getsize(pfad)
+    if groesse < MIN_GROESSE:
+        return f"zu klein ({groesse} Bytes)"
+    with open(pfad, "rb") as f:
+        kopf = f.read(1024)
+        f.seek(max(0, groesse - 2048))
+        ende = f.read()
+    if b"%PDF-" not in kopf:
+        return "kein PDF-Header" + (" (HTML-Seite)" if b"<html" in kopf.lower() else "")
+    if b"%%EOF" not in ende:
+        return "abgeschnitten (kein %%EOF)"
+    return None
+
+
+def sha256_datei(pfad: str) -> str:
+    h = hashlib.sha256()
+    with open(pfad, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def objekt_pfad(download_dir: str, sha256: str) -> str:
+    return os.path.join(download_dir, OBJEKT_DIR, sha256[:2], sha256 + ".pdf")
+
+
+def temp_pfad(ziel: str) -> str:
+    """Arbeitsdatei für einen Download nach ziel."""
+    return ziel + ".part"
+
+
+def schreiben(pfad: str, inhalt: bytes):
+    """Schreibt einen bereits geladenen Download (blockierend, für asyncio.to_thread)."""
+    with open(pfad, "wb") as f:
+        f.write(inhalt)
+
+
+def verlinken(objekt: str, ziel: str) -> str:
+    """Legt ziel als Hardlink auf objekt an (atomar ersetzt). Gibt die Art zurück."""
+    zwischen = ziel + ".tmp"
+    if os.path.lexists(zwischen):
+        os.remove(zwischen)
+    try:
+        os.link(objekt, zwischen)
+        art = "hardlink"
+    except OSError:
+        try:
+            os.symlink(os.path.relpath(objekt, os.path.dirname(ziel) or "."), zwischen)
+            art = "symlink"
+        except OSError:
+            shutil.copy2(objekt, zwischen)
+            art = "kopie"
+    os.replace(zwischen, ziel)
+    return art
+
+
+def ablegen(quelle: str, ziel: str) -> str:
+    """Prüft quelle (.part), verschiebt sie ins Objektlager und verlinkt ziel darauf.
+    Gleicher Inhalt wird nur einmal gespeichert. Gibt den sha256 zurück."""
+    fehler = pdf_fehler(quelle)
+    if fehler:
+        os.remove(quelle)
+        raise AblageFehler(fehler)
+    sha256 = sha256_datei(quelle)
+    objekt = objekt_pfad(os.path.dirname(ziel) or ".", sha256)
+    if os.path.exists(objekt):
+        os.remove(quelle)  # Duplikat, z.B. dieselbe Rechnung unter anderer lfd. Nummer
+    else:
+        os.makedirs(os.path.dirname(objekt), exist_ok=True)
+        os.replace(quelle, objekt)
+    verlinken(objekt, ziel)
+    return sha256
+
+
+def aufraeumen(download_dir: str, min_alter_s: float = TEMP_MIN_ALTER_S) -> int:
+    """Entfernt Arbeitsdateien eines abgebrochenen Laufs, die älter als min_alter_s sind.
+    Nur im Ordner selbst und seinem Objektlager - Unterordner anderer Konten (Batch-Modus)
+    bleiben unberührt."""
+    grenze = time.time() - min_alter_s
+    anzahl = 0
+    lager = os.path.join(download_dir, OBJEKT_DIR)
+    ordner = [download_dir] + [w for w, _, _ in os.walk(lager)]
+    for wurzel in ordner:
+        if not os.path.isdir(wurzel):
+            continue
+        for eintrag in os.scandir(wurzel):
+            if not eintrag.name.endswith(TEMP_ENDUNGEN) or not eintrag.is_file(follow_symlinks=False):
+                continue
+            try:
+                if eintrag.stat(follow_symlinks=False).st_mtime > grenze:
+                    continue
+                os.remove(eintrag.path)
+            except FileNotFoundError:
+                continue  # gerade vom laufenden Sync umbenannt
+            anzahl += 1
+    if anzahl:
+        print(f"{ts()} 🧹 {anzahl} unvollständige Arbeitsdateien entfernt.")
+    return anzahl
+
+
+def _pruefe_objekt(pfad: str) -> str | None:
+    sha256 = os.path.splitext(os.path.basename(pfad))[0]
+    if sha256_datei(pfad) != sha256:
+        return "hash"
+    return "pdf" if pdf_fehler(pfad) else None
+
+
+def _pruefe_name(pfad: str) -> tuple[str, str | None]:
+    """Status eines RG_-Namens: 'ok', 'altbestand' (eigenständige Datei), 'kaputt'."""
+    if os.path.islink(pfad):
+        return ("ok", None) if os.path.exists(pfad) else ("kaputt", None)
+    if os.stat(pfad).st_nlink > 1:
+        return "ok", None
+    if pdf_fehler(pfad):
+        return "kaputt", None
+    return "altbestand", sha256_datei(pfad)
+
+
+def pruefen(download_dir: str, reparieren: bool = False, threads: int = PRUEF_THREADS) -> Counter:
+    """Prüft Objektlager und RG_-Namen parallel. Ohne reparieren wird nichts verändert.
+    Mit reparieren werden alte Arbeitsdateien entfernt, defekte Objekte nach .defekt
+    verschoben, eigenständige Altdateien ins Lager übernommen und verwaiste Objekte
+    gelöscht."""
+    ergebnis = Counter()
+    if reparieren:
+        ergebnis["temp_entfernt"] = aufraeumen(download_dir)
+    lager = os.path.join(download_dir, OBJEKT_DIR)
+    objekte = [os.path.join(w, n) for w, _, ns in os.walk(lager) for n in ns if n.endswith(".pdf")]
+    namen = [os.path.join(download_dir, n) for n in sorted(os.listdir(download_dir))
+             if n.lower().endswith(".pdf")] if os.path.isdir(download_dir) else []
+
+    with ThreadPoolExecutor(max(1, threads)) as pool:
+        objekt_status = dict(zip(objekte, pool.map(_pruefe_objekt, objekte)))
+        namen_status = dict(zip(namen, pool.map(_pruefe_name, namen)))
+
+    ergebnis["objekte"] = len(objekte)
+    for objekt, fehler in objekt_status.items():
+        if fehler is None:
+            continue
+        ergebnis["objekte_defekt"] += 1
+        print(f"{ts()} ✗ Defektes Objekt ({fehler}): {objekt}")
+        if reparieren:
+            os.makedirs(os.path.join(download_dir, DEFEKT_DIR), exist_ok=True)
+            os.replace(objekt, os.path.join(download_dir, DEFEKT_DIR, os.path.basename(objekt)))
+
+    belegt = set()
+    for name, (status, sha256) in namen_status.items():
+        ergebnis["namen_" + status] += 1
+        if status == "kaputt":
+            print(f"{ts()} ✗ Kaputte Rechnung: {name}")
+        elif status == "altbestand" and reparieren:
+            objekt = objekt_pfad(download_dir, sha256)
+            if not os.path.exists(objekt):
+                os.makedirs(os.path.dirname(objekt), exist_ok=True)
+                try:
+                    os.link(name, objekt)  # Datei wird selbst zum Objekt, nichts kopiert
+                except OSError:
+                    shutil.copy2(name, objekt + ".tmp")
+                    os.replace(objekt + ".tmp", objekt)
+            if not os.path.samefile(objekt, name):
+                verlinken(objekt, name)
+            ergebnis["uebernommen"] += 1
+        if os.path.islink(name):
+            belegt.add(os.path.realpath(name))
+
+    # Verwaist: kein Hardlink und kein Symlink zeigt mehr auf das Objekt
+    for objekt, fehler in objekt_status.items():
+        if fehler is None and os.path.exists(objekt) and os.stat(objekt).st_nlink == 1 \
+                and os.path.realpath(objekt) not in belegt:
+            ergebnis["verwaist"] += 1
+            if reparieren:
+                os.remove(objekt)
+    return ergebnis
+
+
+def bericht(ergebnis: Counter) -> str:
+    return (f"Ablage: {ergebnis['objekte']} Objekte ({ergebnis['objekte_defekt']} defekt, "
+            f"{ergebnis['verwaist']} verwaist) | Namen: {ergebnis['namen_ok']} ok, "
+            f"{ergebnis['namen_altbestand']} Altbestand, {ergebnis['namen_kaputt']} kaputt | "
+            f"übernommen: {ergebnis['uebernommen']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rechnungsarchiv prüfen und reparieren")
+    parser.add_argument("ordner", nargs="?", default="rechnungen")
+    parser.add_argument("--reparieren", action="store_true")
+    parser.add_argument("--threads", type=int, default=PRUEF_THREADS)
+    args = parser.parse_args()
+    print(f"{ts()} 🔎 {bericht(pruefen(args.ordner, args.reparieren, args.threads))}")
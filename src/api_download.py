@@ -0,0 +1,164 @@
+import json
+import os
+import re
+
+from drossel import ist_timeout
+from reusables import ts
+
+# Gelernte Backend-Aufrufe für "Rechnung erstellen" und "PDF holen"
+API_VORLAGEN_DATEI = "rechnung_api.json"
+PLATZHALTER = "{auftragsnummer}"
+
+# Diese Header werden nie gespeichert, sondern zur Laufzeit aus dem Context übernommen
+FLUECHTIGE_HEADER = {"cookie", "authorization", "host", "content-length", "x-xsrf-token"}
+AUTH_HEADER = {"authorization", "x-xsrf-token"}
+# So viele API-Abrufe in Folge gescheitert (ohne Timeouts): Vorlage veraltet, neu lernen
+API_MAX_FEHLER = 3
+
+
+def dateiname_aus_header(content_disposition: str) -> str:
+    """'attachment; filename="DB_Rechnung_607227512704.pdf"' -> 'DB_Rechnung_607227512704.pdf'"""
+    treffer = re.search(r'filename\*?=(?:UTF-8\'\')?"?([^";]+)"?', content_disposition or "")
+    return treffer.group(1) if treffer else ""
+
+
+class Beobachtung:
+    """Zeichnet während eines UI-Downloads die Backend-Requests einer Reise auf."""
+
+    def __init__(self, page, auftragsnummer: str):
+        self.page = page
+        self.auftragsnummer = auftragsnummer
+        self.schritte = []
+        self.pdf_schritt = None
+
+    def _on_request(self, request):
+        if request.resource_type not in ("fetch", "xhr", "document"):
+            return
+        daten = request.post_data or ""
+        if request.method != "GET" and (self.auftragsnummer in request.url or self.auftragsnummer in daten):
+            self.schritte.append(self._vorlage(request))
+
+    async def _on_response(self, response):
+        typ = (await response.all_headers()).get("content-type", "")
+        if "application/pdf" in typ and self.pdf_schritt is None:
+            self.pdf_schritt = self._vorlage(response.request)
+
+    def _vorlage(self, request) -> dict:
+        return {
+            "methode": request.method,
+            "url": request.url.replace(self.auftragsnummer, PLATZHALTER),
+            "daten": (request.post_data or "").replace(self.auftragsnummer, PLATZHALTER) or None,
+            "header": {k: v for k, v in request.headers.items() if k.lower() not in FLUECHTIGE_HEADER},
+        }
+
+    def starten(self):
+        self.page.on("request", self._on_request)
+        self.page.on("response", self._on_response)
+        return self
+
+    def beenden(self):
+        self.page.remove_listener("request", self._on_request)
+        self.page.remove_listener("response", self._on_response)
+
+    def ergebnis(self) -> list[dict] | None:
+        """Schrittfolge, falls der PDF-Abruf über die Auftragsnummer adressierbar ist."""
+        if self.pdf_schritt is None or PLATZHALTER not in self.pdf_schritt["url"]:
+            return None
+        return self.schritte + [self.pdf_schritt]
+
+
+class RechnungsApi:
+    """API-Modus: lernt die Backend-Aufrufe aus einem UI-Download und ruft sie danach
+    direkt über context.request auf. Schlägt etwas fehl, bleibt der UI-Weg als Fallback.
+    Nach API_MAX_FEHLER Fehlschlägen in Folge wird die Vorlage verworfen und beim
+    nächsten UI-Download neu gelernt."""
+
+    def __init__(self, pfad: str = API_VORLAGEN_DATEI):
+        self.pfad = pfad
+        self.schritte = None
+        self.auth_header = {}
+        self.zaehler = {"api": 0, "ui": 0, "api_fehler": 0, "neu_gelernt": 0}
+        self.fehlerserie = 0
+        if os.path.exists(pfad):
+            with open(pfad, encoding="utf-8") as f:
+                self.schritte = json.load(f)
+
+    @property
+    def gelernt(self) -> bool:
+        return bool(self.schritte)
+
+    def verbinden(self, context):
+        """Merkt sich laufend die aktuellen Auth-Header der Seite (z.B. Bearer-Token)."""
+        def on_request(request):
+            for name, wert in request.headers.items():
+                if name.lower() in AUTH_HEADER:
+                    self.auth_header[name] = wert
+        context.on("request", on_request)
+
+    def beobachte(self, page, auftragsnummer: str) -> Beobachtung:
+        return Beobachtung(page, auftragsnummer).starten()
+
+    def lerne(self, beobachtung: Beobachtung):
+        schritte = beobachtung.ergebnis()
+        if schritte is None:
+            return
+        # Eine Folge mit "Rechnung erstellen"-Schritt ist vollständiger als eine ohne.
+        # Scheitert die Vorlage gerade, gewinnt der UI-Download, der eben funktioniert hat.
+        if self.gelernt and len(schritte) <= len(self.schritte) and not self.fehlerserie:
+            return
+        if self.gelernt:
+            self.zaehler["neu_gelernt"] += 1
+        self.schritte = schritte
+        self.fehlerserie = 0
+        with open(self.pfad, "w", encoding="utf-8") as f:
+            json.dump(schritte, f, indent=2)
+        print(f"{ts()} 🎓 API-Aufrufe gelernt ({len(schritte)} Schritte), ab jetzt direkter Abruf.")
+
+    def vergessen(self):
+        self.schritte = None
+        self.fehlerserie = 0
+        if os.path.exists(self.pfad):
+            os.remove(self.pfad)
+
+    async def lade_pdf(self, request_context, auftragsnummer: str) -> tuple[bytes, str] | None:
+        """Führt die gelernten Schritte aus. Gibt (PDF-Inhalt, Originaldateiname) zurück
+        oder None, wenn der UI-Weg genommen werden soll. Timeouts werden weitergereicht:
+        Sie sagen nichts über die Vorlage, aber viel über die Last (drossel.takt).
+        Playwrights APIResponse kennt kein Streaming - der Inhalt liegt komplett im
+        Speicher (Rechnungen sind klein), der Aufrufer schreibt ihn im Thread weg."""
+        try:
+            response = None
+            for schritt in self.schritte:
+                daten = schritt["daten"].replace(PLATZHALTER, auftragsnummer) if schritt["daten"] else None
+                response = await request_context.fetch(
+                    schritt["url"].replace(PLATZHALTER, auftragsnummer),
+                    method=schritt["methode"],
+                    headers={**schritt["header"], **self.auth_header},
+                    data=daten,
+                )
+                if not response.ok:
+                    raise RuntimeError(f"HTTP {response.status} bei {schritt['methode']} {response.url}")
+
+            body = await response.body()
+            if not body.startswith(b"%PDF"):
+                raise RuntimeError("Antwort ist kein PDF")
+
+            self.zaehler["api"] += 1
+            self.fehlerserie = 0
+            return body, dateiname_aus_header(response.headers.get("content-disposition", ""))
+
+        except Exception as e:
+            self.zaehler["api_fehler"] += 1
+            if ist_timeout(e):
+                raise
+            print(f"{ts()}    ⚠️ API-Abruf fehlgeschlagen, nutze UI: {e}")
+            self.fehlerserie += 1
+            if self.fehlerserie >= API_MAX_FEHLER and self.gelernt:
+                print(f"{ts()} 🎓 {self.fehlerserie} API-Fehler in Folge, Vorlage verworfen - "
+                      f"wird beim nächsten UI-Download neu gelernt.")
+                self.vergessen()
+            return None
+
+    def bericht(self) -> str:
+        return (f"API-Modus: {self.zaehler['api']} direkt | {self.zaehler['ui']} per UI | "
+                f"{self.zaehler['api_fehler']} API-Fehler | {self.zaehler['neu_gelernt']}x neu gelernt")
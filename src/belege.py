@@ -0,0 +1,223 @@
+"""Liest die heruntergeladenen Rechnungs-PDFs aus und schreibt ein gemeinsames Journal
+(CSV + JSON) für die Buchhaltung. Läuft während des Exports in einem Prozess-Pool,
+Ergebnisse werden je Datei-Hash im Manifest zwischengespeichert.
+
+    python belege.py rechnungen      # Journal für einen vorhandenen Ordner erzeugen
+"""
+import argparse
+import asyncio
+import csv
+import importlib.util
+import json
+import multiprocessing
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from reusables import ts
+
+PROZESSE = max(1, (os.cpu_count() or 2) // 2)
+
+BETRAG = r"(-?\d{1,3}(?:\.\d{3})*,\d{2}|-?\d+,\d{2})\s*(?:€|EUR)?"
+MUSTER = {
+    "rechnungsnummer": re.compile(r"Rechnungs-?\s*(?:nummer|nr\.?)\s*:?\s*(\d{6,})", re.I),
+    "auftragsnummer": re.compile(r"Auftrags-?\s*(?:nummer|nr\.?)\s*:?\s*(\d{6,})", re.I),
+    "brutto": re.compile(r"(?:Gesamtbetrag(?:\s*brutto)?|Summe\s*brutto|Bruttobetrag|Gesamtpreis)\s*:?\s*" + BETRAG, re.I),
+    "netto": re.compile(r"(?:Summe\s*netto|Nettobetrag|Netto)\s*:?\s*" + BETRAG, re.I),
+}
+# "MwSt 19%: 1,23 EUR" und "19 % MwSt 1,23 €"
+MWST_MUSTER = [
+    re.compile(r"(?:MwSt|USt|Mehrwertsteuer|Umsatzsteuer)\.?\s*(\d{1,2}(?:,\d+)?)\s*%\s*:?\s*" + BETRAG, re.I),
+    re.compile(r"(\d{1,2}(?:,\d+)?)\s*%\s*(?:MwSt|USt)\.?\s*:?\s*" + BETRAG, re.I),
+]
+# Rechnungsdatum vor einem allgemeinen "Datum" - "Reisedatum"/"Buchungsdatum" zählen nicht
+DATUM_MUSTER = [
+    re.compile(r"Rechnungs-?\s*datum\s*:?\s*(\d{1,2}\.\d{1,2}\.\d{4})", re.I),
+    re.compile(r"\bDatum\b\s*:?\s*(\d{1,2}\.\d{1,2}\.\d{4})", re.I),
+]
+VERBINDUNG_MUSTER = re.compile(r"(?:Verbindung|Hinfahrt|Strecke)\s*:?\s*(.+?)\s+(?:→|->|–|-)\s+(.+)", re.I)
+
+SPALTEN = ["datei", "rechnungsnummer", "auftragsnummer", "rechnungsdatum",
+           "brutto", "netto", "mwst_saetze", "mwst", "von", "nach"]
+
+
+def betrag(text: str) -> float:
+    return round(float(text.replace(".", "").replace(",", ".")), 2)
+
+
+def rechnungsdatum(text: str) -> str:
+    """Erstes gültiges Datum nach DATUM_MUSTER als ISO-Datum, sonst leer. Ein unmögliches
+    Datum (31.02.) wird übersprungen statt die ganze Datei zu verwerfen."""
+    for muster in DATUM_MUSTER:
+        for treffer in muster.finditer(text):
+            try:
+                return datetime.strptime(treffer.group(1), "%d.%m.%Y").date().isoformat()
+            except ValueError:
+                continue
+    return ""
+
+
+def parse_text(text: str) -> dict:
+    """Rechnungsfelder aus dem Text eines PDFs. Fehlende Felder bleiben leer."""
+    daten = {feld: "" for feld in SPALTEN if feld != "datei"}
+    for feld, muster in MUSTER.items():
+        treffer = muster.search(text)
+        if treffer:
+            daten[feld] = treffer.group(1)
+    daten["rechnungsdatum"] = rechnungsdatum(text)
+    for feld in ("brutto", "netto"):
+        if daten[feld]:
+            daten[feld] = betrag(daten[feld])
+
+    mwst = {}
+    for muster in MWST_MUSTER:
+        for satz, wert in muster.findall(text):
+            mwst.setdefault(satz.replace(",", ".") + "%", betrag(wert))
+    daten["mwst"] = mwst
+    daten["mwst_saetze"] = "/".join(mwst)
+    if daten["netto"] == "" and daten["brutto"] != "" and mwst:
+        daten["netto"] = round(daten["brutto"] - sum(mwst.values()), 2)
+
+    for zeile in text.splitlines():
+        treffer = VERBINDUNG_MUSTER.search(zeile)
+        if treffer:
+            daten["von"], daten["nach"] = treffer.group(1).strip(), treffer.group(2).strip()
+            break
+    return daten
+
+
+def extrahiere_datei(pfad: str) -> dict:
+    """Läuft im Prozess-Pool: PDF öffnen, Text aller Seiten parsen."""
+    from pypdf import PdfReader  # optional, nur für die Auswertung nötig
+
+    text = "\n".join(seite.extract_text() or "" for seite in PdfReader(pfad).pages)
+    return parse_text(text)
+
+
+def verfuegbar() -> bool:
+    return importlib.util.find_spec("pypdf") is not None
+
+
+def journal_pfad(download_dir: str) -> str:
+    """Journal liegt wie das Manifest neben dem Ordner: rechnungen -> rechnungen_belege.csv/.json"""
+    return os.path.normpath(download_dir) + "_belege"
+
+
+# Ein Pool für alle Konten eines Laufs, wird erst bei der ersten Datei gestartet
+_pool = None
+
+
+def _prozess_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn statt fork: der Export-Prozess hat Playwright-Threads offen
+        _pool = ProcessPoolExecutor(PROZESSE, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def pool_beenden():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+class Auswertung:
+    """Schickt neu exportierte Rechnungen in den Prozess-Pool und schreibt am Ende das Journal."""
+
+    def __init__(self, manifest):
+        self.manifest = manifest
+        self.laufend = {}  # sha256 -> Task
+        self.zaehler = Counter()
+
+    def einreichen(self, auftragsnummer: str | None):
+        eintrag = self.manifest.eintrag(auftragsnummer) if auftragsnummer else None
+        if eintrag is None or not eintrag["sha256"] or eintrag["sha256"] in self.laufend:
+            return
+        sha256 = eintrag["sha256"]
+        if self.manifest.beleg(sha256) is not None:
+            self.laufend[sha256] = None
+            self.zaehler["cache"] += 1
+            return
+        future = asyncio.get_running_loop().run_in_executor(_prozess_pool(), extrahiere_datei, eintrag["dateipfad"])
+        self.laufend[sha256] = asyncio.ensure_future(self._abholen(sha256, future, eintrag["dateipfad"]))
+
+    async def _abholen(self, sha256: str, future, pfad: str):
+        try:
+            daten = await future
+        except Exception as e:
+            print(f"{ts()}    ⚠️ Auswertung von '{os.path.basename(pfad)}' fehlgeschlagen: {e}")
+            self.zaehler["fehler"] += 1
+            return
+        self.manifest.beleg_speichern(sha256, daten)
+        self.zaehler["geparst"] += 1
+
+    async def abschliessen(self, download_dir: str) -> list[dict]:
+        """Holt den Bestand früherer Läufe nach, wartet auf den Pool und schreibt das Journal."""
+        for eintrag in self.manifest.eintraege():
+            self.einreichen(eintrag["auftragsnummer"])
+        await asyncio.gather(*(t for t in self.laufend.values() if t is not None))
+
+        zeilen = []
+        for eintrag in self.manifest.eintraege():
+            daten = self.manifest.beleg(eintrag["sha256"]) if eintrag["sha256"] else None
+            if daten is None:
+                continue
+            zeile = {"datei": os.path.basename(eintrag["dateipfad"]), **daten}
+            zeile["auftragsnummer"] = zeile["auftragsnummer"] or eintrag["auftragsnummer"]
+            zeile["rechnungsnummer"] = zeile["rechnungsnummer"] or eintrag["rechnungsnr"] or ""
+            zeilen.append(zeile)
+        schreibe_journal(zeilen, journal_pfad(download_dir))
+        return zeilen
+
+    def bericht(self) -> str:
+        return (f"Auswertung: {self.zaehler['geparst']} geparst, {self.zaehler['cache']} aus dem Cache, "
+                f"{self.zaehler['fehler']} Fehler")
+
+
+def schreibe_journal(zeilen: list[dict], basis: str):
+    """CSV im deutschen Excel-Format (Semikolon, Dezimalkomma) und JSON mit Zahlen."""
+    with open(basis + ".json", "w", encoding="utf-8") as f:
+        json.dump(zeilen, f, ensure_ascii=False, indent=2)
+
+    def zelle(wert):
+        if isinstance(wert, float):
+            return f"{wert:.2f}".replace(".", ",")
+        if isinstance(wert, dict):
+            return " | ".join(f"{satz}: {zelle(b)}" for satz, b in wert.items())
+        return wert
+
+    with open(basis + ".csv", "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, SPALTEN, delimiter=";", extrasaction="ignore")
+        writer.writeheader()
+        for zeile in zeilen:
+            writer.writerow({k: zelle(v) for k, v in zeile.items()})
+    print(f"{ts()} 📒 Journal mit {len(zeilen)} Rechnungen: {basis}.csv / .json")
+
+
+async def auswerten(download_dir: str) -> list[dict]:
+    """Journal für einen vorhandenen Download-Ordner, ohne Browser."""
+    from manifest import SyncManifest, manifest_pfad
+
+    manifest = SyncManifest(manifest_pfad(download_dir))
+    try:
+        if len(manifest) == 0:
+            manifest.importiere_bestand(download_dir)
+        auswertung = Auswertung(manifest)
+        zeilen = await auswertung.abschliessen(download_dir)
+        print(f"{ts()} 📒 {auswertung.bericht()}")
+        return zeilen
+    finally:
+        pool_beenden()
+        manifest.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rechnungs-PDFs auslesen und Journal schreiben")
+    parser.add_argument("ordner", nargs="?", default="rechnungen")
+    args = parser.parse_args()
+    if not verfuegbar():
+        raise SystemExit("pypdf fehlt: pip install pypdf")
+    asyncio.run(auswerten(args.ordner))
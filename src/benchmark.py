@@ -0,0 +1,95 @@
+"""End-to-End-Benchmark von run_download gegen das lokale Test-Portal (mock_bahn).
+
+    python benchmark.py --reisen 100 --latenz 150 --workers 1 2 4 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import DBahnRechnungsexport as export
+import readiness
+from mock_bahn import MockPortal, basis_url, starte_server
+from reusables import ts
+
+ZUGANGSDATEN = ("benchmark@example.org", "geheim")
+
+
+async def benchmark_lauf(workers: int, portal_optionen: dict, behalten: bool = False, **export_optionen) -> dict:
+    """Ein kompletter Export in einem frischen Arbeitsordner gegen ein frisches Test-Portal."""
+    portal = MockPortal(**portal_optionen)
+    server = starte_server(portal)
+    arbeitsordner = tempfile.mkdtemp(prefix="dbahn_benchmark_")
+    alter_ordner = os.getcwd()
+    alte_base_url = export.BASE_URL
+    try:
+        os.chdir(arbeitsordner)
+        export.BASE_URL = basis_url(server)
+        start = time.perf_counter()
+        stats = await export.run_download(
+            workers=workers, session_nutzen=False, zugangsdaten=ZUGANGSDATEN, headless=True,
+            metrik_datei=os.path.join(arbeitsordner, "metrics.jsonl"), **export_optionen,
+        )
+        dauer = time.perf_counter() - start
+        if stats is None:
+            raise RuntimeError("Login am Test-Portal fehlgeschlagen")
+    finally:
+        export.BASE_URL = alte_base_url
+        os.chdir(alter_ordner)
+        server.shutdown()
+        if not behalten:
+            shutil.rmtree(arbeitsordner, ignore_errors=True)
+
+    return {
+        "workers": workers,
+        "neu": stats["neu"],
+        "fehler": stats["fehler"],
+        "sekunden": round(dauer, 1),
+        "reisen_pro_minute": round(stats["neu"] / dauer * 60, 1) if dauer else 0.0,
+        "erste_rechnung_s": round(stats.get("erste_reise_s", 0.0), 1),
+        "portal_requests": portal.zaehler["requests"],
+        "arbeitsordner": arbeitsordner if behalten else None,
+    }
+
+
+async def benchmark(worker_liste: list[int], portal_optionen: dict, behalten: bool = False, **export_optionen):
+    ergebnisse = []
+    for workers in worker_liste:
+        print(f"{ts()} 🏁 Benchmark mit {workers} Worker(n)...")
+        ergebnisse.append(await benchmark_lauf(workers, portal_optionen, behalten, **export_optionen))
+
+    print(f"\n{'Worker':>7}{'Neu':>6}{'Fehler':>8}{'Sekunden':>10}{'Reisen/min':>12}{'1. PDF (s)':>12}{'Requests':>10}")
+    for e in ergebnisse:
+        print(f"{e['workers']:>7}{e['neu']:>6}{e['fehler']:>8}{e['sekunden']:>10}"
+              f"{e['reisen_pro_minute']:>12}{e['erste_rechnung_s']:>12}{e['portal_requests']:>10}")
+    return ergebnisse
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline-Benchmark des DB Rechnungsexports")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--reisen", type=int, default=40)
+    parser.add_argument("--latenz", type=int, default=100, help="Mittlere API-Latenz in ms")
+    parser.add_argument("--fehlerquote", type=float, default=0.0)
+    parser.add_argument("--generierung", type=int, default=500, help="Dauer 'Rechnung erstellen' in ms")
+    parser.add_argument("--api", action="store_true", help="API-Modus des Exports benutzen")
+    parser.add_argument("--liste", choices=["netz", "dom"], default=export.LISTEN_MODUS)
+    parser.add_argument("--routing", default=export.ROUTING_PROFIL)
+    parser.add_argument("--feste-wartezeiten", action="store_true")
+    parser.add_argument("--behalten", action="store_true", help="Arbeitsordner (PDFs, Metriken) nicht löschen")
+    parser.add_argument("--json", metavar="DATEI", help="Ergebnisse zusätzlich als JSON speichern")
+    args = parser.parse_args()
+
+    readiness.setze_feste_wartezeiten(args.feste_wartezeiten)
+    portal_optionen = {"reisen": args.reisen, "latenz_ms": args.latenz,
+                       "fehlerquote": args.fehlerquote, "generierung_ms": args.generierung}
+    ergebnisse = asyncio.run(benchmark(
+        args.workers, portal_optionen, args.behalten,
+        api_modus=args.api, listen_modus=args.liste, routing_profil=args.routing,
+    ))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"portal": portal_optionen, "ergebnisse": ergebnisse}, f, indent=2)
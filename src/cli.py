@@ -0,0 +1,314 @@
+"""Kommandozeile für Cron und Skripte - ohne Rückfragen, mit Unterbefehlen.
+
+    python cli.py sync --nur-neue          # Rechnungen abgleichen (Browser)
+    python cli.py sync --konten a@x b@y    # mehrere Konten, Passwörter aus dem Keyring
+    python cli.py watch --intervall 10     # Dauerbetrieb (watch.py)
+    python cli.py list [--json]            # Archiv auflisten
+    python cli.py verify [--reparieren]    # Archiv prüfen (ablage.py)
+    python cli.py stats                    # Kennzahlen aus dem Manifest
+
+Zugangsdaten kommen aus DBAHN_EMAIL/DBAHN_PASSWORD oder dem Keyring (zuletzt
+verwendetes Konto). Playwright und keyring werden erst von den Befehlen geladen, die
+sie brauchen - list/verify/stats starten ohne Browser-Bibliotheken.
+Exit-Codes: 0 ok, 1 Login gescheitert, Reiseliste unvollständig, Reisen aufgegeben/liegen
+geblieben oder Fehler im Archiv, 2 keine Zugangsdaten, kein Archiv oder unpassende Optionen. Fehlversuche, die
+ein Retry behebt, zählen nicht.
+"""
+import time
+
+_START = time.perf_counter()
+
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+
+from einstellungen import (BATCH_PARALLEL, DOWNLOAD_DIR, LISTEN_MODUS, ROUTING_PROFIL, SERVICE_NAME,
+                           WATCH_INTERVALL_MIN, WATCH_WORKER, WORKER_ANZAHL)
+from reusables import ENV_EMAIL, ENV_PASSWORT, ts
+
+
+def zugangsdaten_ohne_rueckfrage() -> tuple[str, str] | None:
+    """Umgebung zuerst, dann das zuletzt verwendete Konto aus dem Keyring. Ohne
+    Keyring-Backend (typisch unter cron) bleibt nur die Umgebung."""
+    from reusables import get_env_credentials, get_last_email, get_saved_password
+
+    try:
+        zugangsdaten = get_env_credentials(SERVICE_NAME)
+        if zugangsdaten is None and not os.environ.get(ENV_EMAIL):
+            email = get_last_email(SERVICE_NAME)
+            password = get_saved_password(SERVICE_NAME, email) if email else None
+            zugangsdaten = (email, password) if password else None
+    except Exception as e:
+        print(f"{ts()} ⚠️ Keyring nicht verfügbar: {e}", file=sys.stderr)
+        return None
+    return zugangsdaten
+
+
+def _oeffne_manifest(ordner: str):
+    """Vorhandenes Manifest zum Ordner oder None - list/stats legen nichts an."""
+    from manifest import SyncManifest, manifest_pfad
+
+    pfad = manifest_pfad(ordner)
+    if not os.path.exists(pfad):
+        print(f"{ts()} ⚠️ Kein Archiv unter {ordner} (Manifest {pfad} fehlt).", file=sys.stderr)
+        return None
+    return SyncManifest(pfad)
+
+
+def _reisefilter(args):
+    from reisefilter import ReiseFilter
+
+    reisefilter = ReiseFilter(args.gebucht_von, args.gebucht_bis, args.reise_von, args.reise_bis,
+                              args.kunde, args.auftrag)
+    return reisefilter if reisefilter.aktiv else None
+
+
+def befehl_sync(args) -> int:
+    if args.konten and (args.har_aufnahme or args.har_wiedergabe):
+        print(f"{ts()} ✗ HAR-Aufnahme/-Wiedergabe gibt es nur für ein Konto, nicht mit --konten.",
+              file=sys.stderr)
+        return 2
+    zugangsdaten = None
+    if not args.konten:
+        zugangsdaten = zugangsdaten_ohne_rueckfrage()
+        if zugangsdaten is None and not args.interaktiv:
+            print(f"{ts()} ✗ Keine Zugangsdaten: {ENV_EMAIL}/{ENV_PASSWORT} setzen, einmal "
+                  f"interaktiv anmelden oder --interaktiv angeben.", file=sys.stderr)
+            return 2
+
+    import asyncio
+
+    import DBahnRechnungsexport as export  # lädt Playwright
+    import drossel
+    import readiness
+    import recycling
+    import traces
+
+    export.DOWNLOAD_DIR = args.ordner
+    readiness.setze_feste_wartezeiten(args.feste_wartezeiten)
+    recycling.konfigurieren(nach_reisen=args.recyceln_nach, heap_mb=args.max_heap, knoten=args.max_knoten)
+    traces.konfigurieren(reisen=args.trace_ring, budget_s=args.trace_budget)
+    drossel.konfigurieren(aktiv=not (args.ohne_drossel or args.feste_wartezeiten))
+    optionen = dict(workers=args.workers, session_nutzen=not args.neu_anmelden, routing_profil=args.routing,
+                    api_modus=args.api, listen_modus=args.liste, nur_neue=args.nur_neue,
+                    metrik_datei=args.metriken, headless=not args.sichtbar, auswerten=args.auswerten,
+                    reisefilter=_reisefilter(args))
+    if args.konten:
+        ergebnisse = asyncio.run(export.run_batch(args.konten, max_parallel=args.parallel, **optionen))
+        # Konten ohne Passwort, mit gescheitertem Login oder Abbruch fehlen in ergebnisse
+        alle_ok = all(export.erfolgreich(ergebnisse.get(email)) for email in args.konten)
+        return 0 if alle_ok else 1
+    stats = asyncio.run(export.run_download(zugangsdaten=zugangsdaten, har_aufnahme=args.har_aufnahme,
+                                            har_wiedergabe=args.har_wiedergabe, **optionen))
+    return 0 if export.erfolgreich(stats) else 1
+
+
+def befehl_watch(args) -> int:
+    zugangsdaten = zugangsdaten_ohne_rueckfrage()
+    if zugangsdaten is None:
+        print(f"{ts()} ✗ Keine Zugangsdaten: {ENV_EMAIL}/{ENV_PASSWORT} setzen oder einmal "
+              f"interaktiv anmelden.", file=sys.stderr)
+        return 2
+
+    import asyncio
+
+    import watch  # lädt Playwright
+
+    try:
+        angemeldet = asyncio.run(watch.run_watch(args.intervall, args.workers, zugangsdaten=zugangsdaten,
+                                                 download_dir=args.ordner, status_port=args.status_port,
+                                                 headless=not args.sichtbar, metrik_datei=args.metriken))
+    except KeyboardInterrupt:
+        print(f"{ts()} 👋 Dauerbetrieb beendet.")
+        return 0
+    return 0 if angemeldet else 1
+
+
+def befehl_list(args) -> int:
+    manifest = _oeffne_manifest(args.ordner)
+    if manifest is None:
+        return 2
+    try:
+        eintraege = manifest.eintraege()
+    finally:
+        manifest.close()
+    for eintrag in eintraege:
+        eintrag["vorhanden"] = os.path.exists(eintrag["dateipfad"])
+    if args.json:
+        json.dump(eintraege, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return 0
+    for e in eintraege:
+        markierung = " " if e["vorhanden"] else "✗"
+        print(f"{markierung} {e['auftragsnummer']:<14} {e['rechnungsnr'] or '-':<14} "
+              f"{e['exportiert_am'] or '-':<19}  {os.path.basename(e['dateipfad'])}")
+    fehlend = sum(not e["vorhanden"] for e in eintraege)
+    print(f"{ts()} 🗂️  {len(eintraege)} Rechnungen im Archiv" + (f", {fehlend} Dateien fehlen" if fehlend else ""))
+    return 0
+
+
+def befehl_verify(args) -> int:
+    import ablage
+
+    if not os.path.isdir(args.ordner):
+        print(f"{ts()} ⚠️ Kein Archiv unter {args.ordner}.", file=sys.stderr)
+        return 2
+    ergebnis = ablage.pruefen(args.ordner, args.reparieren, args.threads or ablage.PRUEF_THREADS)
+    manifest = _oeffne_manifest(args.ordner)
+    if manifest is not None:
+        try:
+            for eintrag in manifest.eintraege():
+                if not os.path.exists(eintrag["dateipfad"]):
+                    ergebnis["manifest_ohne_datei"] += 1
+                    print(f"{ts()} ✗ Im Manifest, Datei fehlt: {eintrag['dateipfad']}")
+        finally:
+            manifest.close()
+    print(f"{ts()} 🔎 {ablage.bericht(ergebnis)} | Manifest ohne Datei: {ergebnis['manifest_ohne_datei']}")
+    probleme = ergebnis["objekte_defekt"] + ergebnis["namen_kaputt"] + ergebnis["manifest_ohne_datei"]
+    return 1 if probleme else 0
+
+
+def befehl_stats(args) -> int:
+    manifest = _oeffne_manifest(args.ordner)
+    if manifest is None:
+        return 2
+    try:
+        eintraege = manifest.eintraege()
+        belege = [manifest.beleg(sha) for sha in {e["sha256"] for e in eintraege if e["sha256"]}]
+    finally:
+        manifest.close()
+    belege = [b for b in belege if b]
+    je_monat = Counter((e["exportiert_am"] or "")[:7] or "unbekannt" for e in eintraege)
+    brutto = sum(b["brutto"] for b in belege if isinstance(b.get("brutto"), (int, float)))
+    daten = {
+        "rechnungen": len(eintraege),
+        "dateien_fehlen": sum(not os.path.exists(e["dateipfad"]) for e in eintraege),
+        "eindeutige_pdfs": len({e["sha256"] for e in eintraege if e["sha256"]}),
+        "groesse_mb": round(sum(e["groesse"] or 0 for e in eintraege) / 1024 / 1024, 2),
+        "erster_export": min((e["exportiert_am"] for e in eintraege if e["exportiert_am"]), default=None),
+        "letzter_export": max((e["exportiert_am"] for e in eintraege if e["exportiert_am"]), default=None),
+        "ausgelesen": len(belege),
+        "brutto_summe": round(brutto, 2),
+        "exporte_je_monat": dict(sorted(je_monat.items())),
+    }
+    if args.json:
+        json.dump(daten, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return 0
+    print(f"{ts()} 📊 {daten['rechnungen']} Rechnungen ({daten['eindeutige_pdfs']} eindeutige PDFs, "
+          f"{daten['groesse_mb']:.1f} MB), {daten['dateien_fehlen']} Dateien fehlen")
+    print(f"{ts()}    Exportiert {daten['erster_export'] or '-'} bis {daten['letzter_export'] or '-'}")
+    if belege:
+        print(f"{ts()}    Ausgelesen: {len(belege)} Rechnungen, brutto {daten['brutto_summe']:.2f} EUR".replace(".", ","))
+    for monat, anzahl in daten["exporte_je_monat"].items():
+        print(f"       {monat}: {anzahl}")
+    return 0
+
+
+def parser_bauen() -> argparse.ArgumentParser:
+    import recycling
+    import traces
+    from reisefilter import iso_datum
+    from routing import PROFILE
+
+    parser = argparse.ArgumentParser(description="DB Rechnungsexport (nicht-interaktiv)")
+    parser.add_argument("--ordner", default=DOWNLOAD_DIR, help=f"Rechnungsarchiv (Standard: {DOWNLOAD_DIR})")
+    parser.add_argument("--startzeit", action="store_true",
+                        help="Zeit bis zum Start des Befehls und Gesamtdauer auf stderr ausgeben")
+    befehle = parser.add_subparsers(dest="befehl", required=True)
+
+    sync = befehle.add_parser("sync", help="Rechnungen aus dem Portal abgleichen")
+    sync.set_defaults(funktion=befehl_sync)
+    sync.add_argument("--workers", type=int, default=WORKER_ANZAHL,
+                      help=f"Anzahl paralleler Detailseiten (Standard: {WORKER_ANZAHL})")
+    sync.add_argument("--nur-neue", action="store_true",
+                      help="Liste nur bis zur ersten bereits exportierten Reise laden")
+    sync.add_argument("--neu-anmelden", action="store_true",
+                      help="Gespeicherte Session ignorieren und neu einloggen")
+    sync.add_argument("--interaktiv", action="store_true",
+                      help="Ohne Zugangsdaten in Umgebung/Keyring nachfragen statt abzubrechen")
+    sync.add_argument("--sichtbar", action="store_true", help="Browserfenster anzeigen")
+    sync.add_argument("--api", action="store_true",
+                      help="PDFs direkt über die gelernten Backend-Aufrufe laden (UI als Fallback)")
+    sync.add_argument("--liste", choices=["netz", "dom"], default=LISTEN_MODUS,
+                      help="Reiseliste aus JSON-Antworten (netz) oder per Klick aus dem DOM (dom)")
+    sync.add_argument("--routing", choices=sorted(PROFILE), default=ROUTING_PROFIL,
+                      help=f"Ressourcen-Blocking (Standard: {ROUTING_PROFIL})")
+    sync.add_argument("--auswerten", action="store_true",
+                      help="PDFs parallel auslesen und Journal (CSV/JSON) neben den Rechnungen schreiben")
+    sync.add_argument("--feste-wartezeiten", action="store_true",
+                      help="Kompatibilitätsmodus mit den alten festen Pausen und slow_mo")
+    sync.add_argument("--ohne-drossel", action="store_true", help="Feste Timeouts, keine adaptive Drossel")
+    sync.add_argument("--recyceln-nach", type=int, default=None, metavar="N",
+                      help=f"Worker-Seite nach N Reisen erneuern, 0 = nie (Standard: {recycling.NACH_REISEN})")
+    sync.add_argument("--max-heap", type=float, default=None, metavar="MB",
+                      help=f"Worker-Seite ab diesem JS-Heap erneuern, 0 = aus (Standard: {recycling.HEAP_MB}). "
+                           "Nur der V8-Heap, nicht der ganze Renderer-Prozess - den begrenzt --recyceln-nach")
+    sync.add_argument("--max-knoten", type=int, default=None, metavar="N",
+                      help="Worker-Seite ab N DOM-Knoten erneuern (abgelöste Bäume halten nativen Speicher), "
+                           f"0 = aus (Standard: {recycling.KNOTEN})")
+    sync.add_argument("--trace-ring", type=int, default=None, metavar="N",
+                      help="Playwright-Trace der letzten N Reisen mitlaufen lassen und bei Fehlern "
+                           f"oder langsamen Reisen nach {traces.ORDNER}/ sichern, 0 = aus")
+    sync.add_argument("--trace-budget", type=float, default=None, metavar="SEK",
+                      help=f"Reisen über dieser Dauer gelten als langsam (Standard: {traces.BUDGET_S:.0f})")
+    sync.add_argument("--metriken", metavar="DATEI", default=None,
+                      help="JSON-Lines-Datei für die Laufzeit-Spans (Standard: metrics_<Zeit>.jsonl)")
+    sync.add_argument("--konten", metavar="EMAIL", nargs="+",
+                      help="Batch-Modus: mehrere Konten (Passwörter aus dem Keyring) in einem Browser")
+    sync.add_argument("--parallel", type=int, default=BATCH_PARALLEL,
+                      help=f"Batch-Modus: max. gleichzeitige Reisen über alle Konten (Standard: {BATCH_PARALLEL})")
+    har_gruppe = sync.add_mutually_exclusive_group()
+    har_gruppe.add_argument("--har-aufnahme", metavar="DATEI.har",
+                            help="Lauf mitschneiden, Zugangsdaten/Cookies werden danach geschwärzt")
+    har_gruppe.add_argument("--har-wiedergabe", metavar="DATEI.har",
+                            help="Lauf offline aus einer Aufnahme abspielen")
+    filter_gruppe = sync.add_argument_group("Filter (werden auf der Reiseliste angewendet)")
+    filter_gruppe.add_argument("--gebucht-von", type=iso_datum, metavar="JJJJ-MM-TT")
+    filter_gruppe.add_argument("--gebucht-bis", type=iso_datum, metavar="JJJJ-MM-TT")
+    filter_gruppe.add_argument("--reise-von", type=iso_datum, metavar="JJJJ-MM-TT")
+    filter_gruppe.add_argument("--reise-bis", type=iso_datum, metavar="JJJJ-MM-TT")
+    filter_gruppe.add_argument("--kunde", help="Teil des Kundennamens (Groß-/Kleinschreibung egal)")
+    filter_gruppe.add_argument("--auftrag", metavar="NR", nargs="+", help="Nur diese Auftragsnummern")
+
+    watch = befehle.add_parser("watch", help="Dauerbetrieb mit warmem Browser")
+    watch.set_defaults(funktion=befehl_watch)
+    watch.add_argument("--intervall", type=float, default=WATCH_INTERVALL_MIN,
+                       help=f"Minuten zwischen zwei Abgleichen (Standard: {WATCH_INTERVALL_MIN})")
+    watch.add_argument("--workers", type=int, default=WATCH_WORKER)
+    watch.add_argument("--status-port", type=int, default=None)
+    watch.add_argument("--sichtbar", action="store_true")
+    watch.add_argument("--metriken", metavar="DATEI", default=None)
+
+    liste = befehle.add_parser("list", help="Rechnungen im Archiv auflisten")
+    liste.set_defaults(funktion=befehl_list)
+    liste.add_argument("--json", action="store_true")
+
+    verify = befehle.add_parser("verify", help="Archiv prüfen (PDFs, Objektlager, Manifest)")
+    verify.set_defaults(funktion=befehl_verify)
+    verify.add_argument("--reparieren", action="store_true")
+    verify.add_argument("--threads", type=int, default=None)
+
+    stats = befehle.add_parser("stats", help="Kennzahlen des Archivs")
+    stats.set_defaults(funktion=befehl_stats)
+    stats.add_argument("--json", action="store_true")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parser_bauen().parse_args(argv)
+    if args.startzeit:
+        print(f"{ts()} ⏱️  Start bis '{args.befehl}': {(time.perf_counter() - _START) * 1000:.0f} ms "
+              f"({len(sys.modules)} Module geladen)", file=sys.stderr)
+    try:
+        return args.funktion(args)
+    finally:
+        if args.startzeit:
+            print(f"{ts()} ⏱️  '{args.befehl}' fertig nach {(time.perf_counter() - _START) * 1000:.0f} ms",
+                  file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""Adaptive Drossel für die Zugriffe aufs Portal (AIMD).
+
+Navigationen, Downloads und das Nachladen der Reiseliste laufen durch takt(): dort
+wird die Zahl gleichzeitiger Zugriffe begrenzt und ein Mindestabstand zwischen zwei
+Starts eingehalten. Die Reiseliste (OHNE_PLATZ) belegt keinen der Plätze - das Limit
+entspricht der Zahl der Worker, sonst würden Liste und Downloads bei einem Worker
+(oder nach einer Senkung auf 1) nur noch abwechselnd laufen. Abstand, Retry-After
+und Messung gelten für sie trotzdem. Beides passt sich an, wie bei TCP:
+
+- jeder zügige Zugriff hebt das Limit additiv an (+1 pro "Runde") und ebenso die Rate
+  der Starts (kürzerer Abstand),
+- HTTP 429/5xx, Timeouts oder eine deutlich gestiegene Latenz halbieren das Limit und
+  verdoppeln den Abstand (höchstens einmal pro Kühlzeit, Retry-After wird eingehalten).
+  Bleibt die Latenz danach hoch, gilt sie als neues Normal und senkt nicht weiter.
+
+Die festen Timeouts werden mit timeout() an die gemessene Latenz angepasst: Ziel ist
+TIMEOUT_VIELFACHES der geglätteten Latenz, begrenzt auf MIN_FAKTOR..MAX_FAKTOR des
+bisherigen Werts. Ein schnelles Portal wartet so nicht 90 s auf ein fehlendes Element,
+ein langsames bekommt mehr Luft statt Timeout-Kaskaden.
+"""
+import asyncio
+import contextlib
+import time
+from collections import Counter
+from urllib.parse import urlparse
+
+from reusables import ts
+
+AKTIV = True
+ERHOEHUNG = 1.0           # Additive Erhöhung des Limits pro Runde
+SENKUNG = 0.5             # Multiplikative Senkung bei Überlast
+ABSTAND_STAU_S = 0.25     # Mindestabstand nach der ersten Senkung
+RATE_SCHRITT = 0.5        # Starts/s mehr je zügigem Zugriff
+MAX_RATE = 20.0           # darüber kein Abstand mehr
+MAX_ABSTAND_S = 2.0
+MAX_RETRY_AFTER_S = 120.0
+LATENZ_FAKTOR = 3.0       # Geglättete Latenz über dem Dreifachen der besten gilt als Stau
+GLAETTUNG = 0.2           # Gewicht einer neuen Probe im gleitenden Mittel
+MIN_PROBEN = 5            # Vorher weder Latenz-Signal noch Timeout-Anpassung
+TIMEOUT_VIELFACHES = 4.0
+MIN_FAKTOR = 0.5
+MAX_FAKTOR = 3.0
+OHNE_PLATZ = ("liste",)   # Zugriffsarten, die nicht gegen das Limit zählen
+
+
+def konfigurieren(aktiv: bool = None):
+    global AKTIV
+    if aktiv is not None:
+        AKTIV = aktiv
+
+
+def ist_timeout(e: BaseException) -> bool:
+    """asyncio- und Playwright-Timeouts (auch APIRequestContext: "Timeout ...ms exceeded")."""
+    if isinstance(e, asyncio.TimeoutError) or "Timeout" in type(e).__name__:
+        return True
+    text = str(e)
+    return ("Timeout" in text and "exceeded" in text) or "timed out" in text.lower()
+
+
+def retry_after_s(wert: str | None) -> float | None:
+    """Retry-After-Header in Sekunden (None ohne oder bei unlesbarem Wert)."""
+    try:
+        return float(wert) if wert else None
+    except ValueError:
+        return None  # HTTP-Datum, kommt beim Portal nicht vor
+
+
+def _domain(url: str) -> str:
+    """bahn.de für www.bahn.de, IP-Adressen und localhost unverändert."""
+    host = urlparse(url).hostname or ""
+    if host.replace(".", "").isdigit() or "." not in host:
+        return host
+    return ".".join(host.split(".")[-2:])
+
+
+class Messung:
+    """Wird von takt() geliefert. Für Wartefunktionen, die bei Timeout False liefern
+    statt zu werfen (readiness.warte_auf_*), setzt der Aufrufer timeout selbst."""
+
+    def __init__(self):
+        self.timeout = False
+
+
+class PortalDrossel:
+    def __init__(self, max_parallel: int):
+        self.max_parallel = max(1, max_parallel)
+        self.limit = float(self.max_parallel)
+        self.abstand_s = 0.0
+        self.laufend = 0
+        self.naechster_start = 0.0
+        self.gesperrt_bis = 0.0
+        self.letzte_senkung = 0.0
+        self.latenz = {}          # art -> geglättete Latenz in s
+        self.beste = {}           # art -> beste geglättete Latenz (Referenz)
+        self.proben = Counter()
+        self.zaehler = Counter()
+        self.min_limit = self.limit
+        self._bedingung = asyncio.Condition()
+
+    # --- Takt ---
+
+    @contextlib.asynccontextmanager
+    async def takt(self, art: str):
+        platz = art not in OHNE_PLATZ
+        await self._eintreten(platz)
+        messung = Messung()
+        start = time.monotonic()
+        try:
+            yield messung
+        except Exception as e:
+            if ist_timeout(e):
+                messung.timeout = True
+            raise
+        finally:
+            self._auswerten(art, time.monotonic() - start, messung.timeout)
+            if platz:
+                await self._austreten()
+
+    async def _eintreten(self, platz: bool = True):
+        if platz:
+            async with self._bedingung:
+                await self._bedingung.wait_for(lambda: self.laufend < int(self.limit))
+                self.laufend += 1
+        # Startzeitpunkte im Abstand reservieren, auch über eine Retry-After-Sperre hinweg
+        jetzt = time.monotonic()
+        start = max(jetzt, self.naechster_start, self.gesperrt_bis)
+        self.naechster_start = start + self.abstand_s
+        if start > jetzt:
+            self.zaehler["gewartet_ms"] += int((start - jetzt) * 1000)
+            await asyncio.sleep(start - jetzt)
+
+    async def _austreten(self):
+        async with self._bedingung:
+            self.laufend -= 1
+            self._bedingung.notify_all()
+
+    # --- AIMD ---
+
+    def _auswerten(self, art: str, dauer_s: float, timeout: bool):
+        self.zaehler[art] += 1
+        self.proben[art] += 1
+        alt = self.latenz.get(art)
+        self.latenz[art] = dauer_s if alt is None else (1 - GLAETTUNG) * alt + GLAETTUNG * dauer_s
+        if self.proben[art] >= MIN_PROBEN:
+            self.beste[art] = min(self.beste.get(art, self.latenz[art]), self.latenz[art])
+
+        if timeout:
+            self.zaehler["timeouts"] += 1
+            self.senken(f"Timeout {art}")
+        elif art in self.beste and self.latenz[art] > LATENZ_FAKTOR * self.beste[art]:
+            self.zaehler["latenz"] += 1
+            self.senken(f"Latenz {art} {self.latenz[art]:.1f} s")
+            self.beste[art] = self.latenz[art]
+        else:
+            self.limit = min(self.max_parallel, self.limit + ERHOEHUNG / self.limit)
+            if self.abstand_s:
+                rate = 1 / self.abstand_s + RATE_SCHRITT
+                self.abstand_s = 0.0 if rate >= MAX_RATE else 1 / rate
+
+    def senken(self, grund: str, retry_after_s: float | None = None):
+        jetzt = time.monotonic()
+        if retry_after_s:
+            self.gesperrt_bis = max(self.gesperrt_bis, jetzt + min(retry_after_s, MAX_RETRY_AFTER_S))
+        # Gleichzeitige Signale derselben Stauphase nur einmal zählen
+        kuehlzeit = max(1.0, max(self.latenz.values(), default=0.0))
+        if jetzt - self.letzte_senkung < kuehlzeit:
+            return
+        self.letzte_senkung = jetzt
+        self.limit = max(1.0, self.limit * SENKUNG)
+        self.abstand_s = min(MAX_ABSTAND_S, max(ABSTAND_STAU_S, self.abstand_s * 2))
+        self.min_limit = min(self.min_limit, self.limit)
+        self.zaehler["senkungen"] += 1
+        print(f"{ts()} 🐢 Drossel ({grund}): max. {int(self.limit)} gleichzeitig, "
+              f"{self.abstand_s:.2f} s Abstand")
+
+    def timeout(self, basis_ms: int, art: str = "goto") -> int:
+        """Fester Timeout, skaliert auf die gemessene Latenz der Zugriffsart."""
+        if self.proben[art] < MIN_PROBEN:
+            return basis_ms
+        return int(basis_ms * self.faktor(basis_ms, art))
+
+    def faktor(self, basis_ms: int, art: str) -> float:
+        ziel_ms = TIMEOUT_VIELFACHES * self.latenz[art] * 1000
+        return min(MAX_FAKTOR, max(MIN_FAKTOR, ziel_ms / basis_ms))
+
+    # --- HTTP-Signale ---
+
+    def beobachten(self, context, basis_url: str):
+        """429 und 5xx des Portals (gleiche Domain wie basis_url) als Überlast werten."""
+        domain = _domain(basis_url)
+
+        def antwort(response):
+            status = response.status
+            if status != 429 and status < 500:
+                return
+            host = urlparse(response.url).hostname or ""
+            if host != domain and not host.endswith("." + domain):
+                return
+            self.http_status(status, retry_after_s(response.headers.get("retry-after")))
+
+        context.on("response", antwort)
+
+    def http_status(self, status: int, retry_after: float | None = None):
+        """429/5xx als Überlast werten - auch für Antworten, die kein Context-Event
+        auslösen (context.request)."""
+        self.zaehler["http_429" if status == 429 else "http_5xx"] += 1
+        self.senken(f"HTTP {status}", retry_after)
+
+    def bericht(self) -> str:
+        latenz = ", ".join(f"{art} {s:.1f} s" for art, s in sorted(self.latenz.items())) or "-"
+        goto = f" | Timeouts ×{self.faktor(20000, 'goto'):.2f}" if self.proben["goto"] >= MIN_PROBEN else ""
+        return (f"Drossel: {int(self.limit)}/{self.max_parallel} gleichzeitig (min. {int(self.min_limit)}), "
+                f"{self.abstand_s:.2f} s Abstand{goto} | Latenz {latenz} | "
+                f"429: {self.zaehler['http_429']}, 5xx: {self.zaehler['http_5xx']}, "
+                f"Timeouts: {self.zaehler['timeouts']}, Senkungen: {self.zaehler['senkungen']}, "
+                f"gewartet {self.zaehler['gewartet_ms'] / 1000:.1f} s")
+
+
+_drossel = None
+
+
+def starten(max_parallel: int) -> PortalDrossel:
+    """Neue Drossel für einen Lauf (alle Konten teilen sich das Portal und damit die Drossel)."""
+    global _drossel
+    _drossel = PortalDrossel(max_parallel)
+    return _drossel
+
+
+def drossel() -> PortalDrossel:
+    global _drossel
+    if _drossel is None:
+        _drossel = PortalDrossel(8)
+    return _drossel
+
+
+def takt(art: str):
+    if not AKTIV:
+        return contextlib.nullcontext(Messung())
+    return drossel().takt(art)
+
+
+def timeout(basis_ms: int, art: str = "goto") -> int:
+    return drossel().timeout(basis_ms, art) if AKTIV else basis_ms
+
+
+def beobachten(context, basis_url: str):
+    if AKTIV:
+        drossel().beobachten(context, basis_url)
+
+
+def http_status(status: int, retry_after: float | None = None):
+    if AKTIV:
+        drossel().http_status(status, retry_after)
+
+
+def bericht() -> str:
+    return drossel().bericht() if AKTIV else "Drossel: aus"
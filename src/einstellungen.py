@@ -0,0 +1,11 @@
+"""Voreinstellungen, die DBahnRechnungsexport.py, watch.py und cli.py gemeinsam nutzen.
+Ohne weitere Importe, damit cli.py sie lesen kann, ohne Playwright zu laden."""
+
+SERVICE_NAME = "db_bahn_portal"
+DOWNLOAD_DIR = "rechnungen"
+WORKER_ANZAHL = 4  # Parallele Detailseiten im selben Browser
+ROUTING_PROFIL = "standard"  # siehe routing.PROFILE
+LISTEN_MODUS = "netz"  # "netz": Reiseliste aus den JSON-Antworten, "dom": per Klick und Links
+BATCH_PARALLEL = 8  # Batch-Modus: max. gleichzeitige Reisen über alle Konten
+WATCH_INTERVALL_MIN = 15  # Minuten zwischen zwei Abgleichen im Dauerbetrieb
+WATCH_WORKER = 2  # Dauerbetrieb: wenige neue Reisen je Abgleich, der Browser bleibt warm
@@ -0,0 +1,217 @@
+"""HAR-Aufnahme und -Wiedergabe für reproduzierbare Offline-Läufe.
+
+Aufnahme: der Browser-Context schreibt alle Requests des Laufs in eine .har-Datei
+(record_har_path), danach werden Zugangsdaten, Cookies und Auth-Header geschwärzt.
+E-Mail und Passwort werden dabei durch feste Platzhalter ersetzt - die Wiedergabe
+meldet sich mit genau diesen Platzhaltern an, so passen auch die Login-POSTs.
+Aus dem OAuth-Ablauf werden code/state/Tokens in URLs, Location-Headern, Formularen
+und JSON-Antworten geschwärzt; jeder gefundene Wert wird anschließend überall in der
+Datei ersetzt. Die Platzhalter sind überall gleich, Redirects passen beim Abspielen.
+
+Wiedergabe: context.route_from_har bedient alle Requests aus der Datei, unbekannte
+Requests werden abgebrochen. Kein Netzwerk, keine Portal-Latenz.
+"""
+import base64
+import json
+import os
+from urllib.parse import parse_qsl, quote, quote_plus, urlencode, urlsplit, urlunsplit
+
+from reusables import ts
+
+REPLAY_EMAIL = "replay@example.invalid"
+REPLAY_PASSWORT = "replay-passwort"
+GESCHWAERZT = "GESCHWAERZT"
+
+# Header, deren Wert nie in einer Aufnahme landen darf (Teilstrings, klein geschrieben)
+GEHEIME_HEADER = ("cookie", "authorization", "token", "csrf", "xsrf", "session", "api-key", "apikey")
+# Formular-/JSON-Felder eines Logins
+PASSWORT_FELDER = ("password", "passwort", "pwd")
+BENUTZER_FELDER = ("username", "email", "e-mail", "login", "benutzer")
+# OAuth/OIDC: Parameter und JSON-Felder, die einen Login wiederverwendbar machen
+GEHEIME_PARAMETER = ("code", "state", "session_state", "nonce")
+GEHEIME_TEILE = ("token", "secret", "verifier")  # Teilstrings, z.B. access_token, code_verifier
+MIN_LAENGE = 6  # Kürzere Werte nicht überall literal ersetzen (zu viele Zufallstreffer)
+
+
+# Gesetzt, sobald ein Context aufnimmt oder wiedergibt (für reiseliste.ueber_seite)
+_aktiv = False
+
+
+def aktiv() -> bool:
+    return _aktiv
+
+
+def context_optionen(aufnahme: str | None = None) -> dict:
+    """Zusätzliche Argumente für browser.new_context() bei einer Aufnahme."""
+    global _aktiv
+    if not aufnahme:
+        return {}
+    if not aufnahme.endswith(".har"):
+        raise ValueError("HAR-Aufnahme braucht eine .har-Datei (Inhalte werden eingebettet)")
+    _aktiv = True
+    return {"record_har_path": aufnahme, "record_har_content": "embed", "record_har_mode": "full"}
+
+
+async def wiedergabe_installieren(context, pfad: str):
+    global _aktiv
+    if not os.path.exists(pfad):
+        raise FileNotFoundError(pfad)
+    _aktiv = True
+    await context.route_from_har(pfad, not_found="abort")
+    print(f"{ts()} 📼 Wiedergabe aus {pfad} (offline)")
+
+
+def _header_schwaerzen(headers: list[dict]):
+    for h in headers:
+        if any(name in h["name"].lower() for name in GEHEIME_HEADER):
+            h["value"] = GESCHWAERZT
+
+
+def _ist_token(name: str) -> bool:
+    return any(t in name.lower() for t in GEHEIME_TEILE)
+
+
+def _ist_geheim(name: str) -> bool:
+    return name.lower() in GEHEIME_PARAMETER or _ist_token(name)
+
+
+def _geheim_wert(name: str, wert: str, gefunden: set) -> str:
+    if not _ist_geheim(name):
+        return wert
+    gefunden.add(wert)
+    return GESCHWAERZT
+
+
+def _token_wert(name: str, wert: str, gefunden: set) -> str:
+    # In Antwortdaten nur Token-Felder - "state" o.ä. ist dort meist ein fachlicher Status
+    return _geheim_wert(name, wert, gefunden) if _ist_token(name) else wert
+
+
+def _feld_wert(name: str, wert: str, gefunden: set) -> str:
+    """Login-Formulare: Geheimnisse schwärzen, Zugangsdaten auf die Platzhalter."""
+    if _ist_geheim(name):
+        return _geheim_wert(name, wert, gefunden)
+    name = name.lower()
+    if any(f in name for f in PASSWORT_FELDER):
+        return REPLAY_PASSWORT
+    if any(f in name for f in BENUTZER_FELDER):
+        return REPLAY_EMAIL
+    return wert
+
+
+def _parameter_schwaerzen(text: str, gefunden: set, ersetzen=_geheim_wert) -> str:
+    paare = parse_qsl(text, keep_blank_values=True)
+    if not any(_ist_geheim(name) for name, _ in paare):
+        return text
+    return urlencode([(name, ersetzen(name, wert, gefunden)) for name, wert in paare], safe="")
+
+
+def _url_schwaerzen(url: str, gefunden: set) -> str:
+    """code/state/Tokens in Query und Fragment (implicit flow: #access_token=...)."""
+    if not url:
+        return url
+    teile = urlsplit(url)
+    return urlunsplit(teile._replace(query=_parameter_schwaerzen(teile.query, gefunden),
+                                     fragment=_parameter_schwaerzen(teile.fragment, gefunden)))
+
+
+def _json_schwaerzen(obj, gefunden: set, ersetzen=_token_wert):
+    """Token-Felder in beliebiger Tiefe, z.B. die Antwort des Token-Endpunkts."""
+    if isinstance(obj, dict):
+        return {k: ersetzen(k, v, gefunden) if isinstance(v, str) else _json_schwaerzen(v, gefunden, ersetzen)
+                for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_json_schwaerzen(v, gefunden, ersetzen) for v in obj]
+    return obj
+
+
+def _inhalt_schwaerzen(content: dict, gefunden: set):
+    """JSON-Antworten (auch base64-eingebettet) schwärzen."""
+    if "json" not in content.get("mimeType", "") or not content.get("text"):
+        return
+    base64_kodiert = content.get("encoding") == "base64"
+    try:
+        text = base64.b64decode(content["text"]).decode("utf-8") if base64_kodiert else content["text"]
+        daten = json.loads(text)
+    except ValueError:
+        return
+    text = json.dumps(_json_schwaerzen(daten, gefunden), separators=(",", ":"), ensure_ascii=False)
+    content["text"] = base64.b64encode(text.encode("utf-8")).decode("ascii") if base64_kodiert else text
+    content["size"] = len(text.encode("utf-8"))
+
+
+def _ersetzungen(geheimnisse: dict) -> list[tuple[str, str]]:
+    """Literal-Ersetzungen in allen gängigen Kodierungen (roh, URL, JSON-escaped)."""
+    paare = []
+    for geheim, platzhalter in geheimnisse.items():
+        if not geheim:
+            continue
+        for kodieren in (str, quote, quote_plus, lambda t: json.dumps(t)[1:-1]):
+            paare.append((kodieren(geheim), kodieren(platzhalter)))
+    # Längere zuerst, damit Teilstrings nicht vorher zerstört werden
+    return sorted(set(paare), key=lambda p: -len(p[0]))
+
+
+def abschliessen(pfad: str, email: str | None = None, passwort: str | None = None):
+    """Nach context.close(): Aufnahme schwärzen. Scheitert das, wird sie gelöscht -
+    eine ungeschwärzte Aufnahme mit Zugangsdaten bleibt nie liegen."""
+    if not os.path.exists(pfad):
+        return
+    try:
+        schwaerzen(pfad, email, passwort)
+    except Exception as e:
+        os.remove(pfad)
+        print(f"{ts()} ⚠️ Aufnahme konnte nicht geschwärzt werden ({e}), gelöscht: {pfad}")
+
+
+def schwaerzen(pfad: str, email: str | None = None, passwort: str | None = None) -> int:
+    """Entfernt Zugangsdaten, Cookies und Auth-Header aus einer HAR-Datei (in place).
+    Gibt die Anzahl der Einträge zurück."""
+    with open(pfad, encoding="utf-8") as f:
+        har = json.load(f)
+
+    eintraege = har["log"]["entries"]
+    gefunden = set()  # geschwärzte Werte, werden am Ende überall ersetzt (Referer, HTML, ...)
+    for eintrag in eintraege:
+        request, response = eintrag["request"], eintrag["response"]
+        _header_schwaerzen(request.get("headers", []))
+        _header_schwaerzen(response.get("headers", []))
+        for cookie in request.get("cookies", []) + response.get("cookies", []):
+            cookie["value"] = GESCHWAERZT
+        request["url"] = _url_schwaerzen(request["url"], gefunden)
+        for param in request.get("queryString", []):
+            param["value"] = _geheim_wert(param["name"], param.get("value", ""), gefunden)
+        response["redirectURL"] = _url_schwaerzen(response.get("redirectURL", ""), gefunden)
+        for h in response.get("headers", []):
+            if h["name"].lower() == "location":
+                h["value"] = _url_schwaerzen(h["value"], gefunden)
+        _inhalt_schwaerzen(response.get("content", {}), gefunden)
+        post = request.get("postData")
+        if post:
+            params = post.get("params", [])
+            for param in params:
+                param["value"] = _feld_wert(param["name"], param.get("value", ""), gefunden)
+            if params and "x-www-form-urlencoded" in post.get("mimeType", ""):
+                post["text"] = urlencode([(p["name"], p["value"]) for p in params])
+            elif "x-www-form-urlencoded" in post.get("mimeType", "") and post.get("text"):
+                post["text"] = _parameter_schwaerzen(post["text"], gefunden, _feld_wert)
+            if "json" in post.get("mimeType", "") and post.get("text"):
+                try:
+                    body = json.loads(post["text"])
+                except ValueError:
+                    body = None
+                if isinstance(body, dict):
+                    post["text"] = json.dumps(_json_schwaerzen(body, gefunden, _feld_wert), separators=(",", ":"))
+
+    text = json.dumps(har, ensure_ascii=False)
+    geheimnisse = {wert: GESCHWAERZT for wert in gefunden if len(wert) >= MIN_LAENGE}
+    geheimnisse.update({email: REPLAY_EMAIL, passwort: REPLAY_PASSWORT})
+    for alt, neu in _ersetzungen(geheimnisse):
+        text = text.replace(alt, neu)
+
+    zwischen = pfad + ".tmp"
+    with open(zwischen, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(zwischen, pfad)
+    print(f"{ts()} 📼 Aufnahme mit {len(eintraege)} Requests gespeichert und geschwärzt: {pfad}")
+    return len(eintraege)
@@ -0,0 +1,120 @@
+import json
+import os
+import re
+import sqlite3
+from datetime import datetime
+from urllib.parse import parse_qs, urlparse
+
+from ablage import sha256_datei
+from reusables import ts
+
+# Dateinamen aus get_download_filename, z.B.
+# "RG_01_2024-706855677982_2024-10-31MusterMax_607227512704.pdf"
+DATEINAME_MUSTER = re.compile(r"^RG_(?:\d+_)?\d{4}-(?P<auftrag>\d+)_.*?(?:_(?P<rechnungsnr>\d+))?\.pdf$")
+
+
+SPALTEN = ("auftragsnummer", "dateipfad", "rechnungsnr", "groesse", "sha256", "exportiert_am")
+
+
+def manifest_pfad(download_dir: str) -> str:
+    """Manifest liegt neben dem Download-Ordner: rechnungen -> rechnungen_manifest.sqlite"""
+    return os.path.normpath(download_dir) + "_manifest.sqlite"
+
+
+def auftragsnummer_aus_url(url: str) -> str | None:
+    """Liest die Auftragsnummer aus dem 'auftragsnummer='-Parameter eines Detail-Links."""
+    werte = parse_qs(urlparse(url).query).get("auftragsnummer")
+    if werte and werte[0].strip():
+        return werte[0].strip()
+    return None
+
+
+class SyncManifest:
+    """Lokales Verzeichnis aller exportierten Rechnungen, Schlüssel ist die Auftragsnummer."""
+
+    def __init__(self, pfad: str):
+        self.pfad = pfad
+        self.conn = sqlite3.connect(pfad)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS rechnungen (
+                auftragsnummer TEXT PRIMARY KEY,
+                dateipfad      TEXT NOT NULL,
+                rechnungsnr    TEXT,
+                groesse        INTEGER,
+                sha256         TEXT,
+                exportiert_am  TEXT
+            )
+        """)
+        # Ausgelesene Rechnungsdaten (belege.py), Schlüssel ist der Datei-Hash:
+        # unveränderte PDFs werden nie zweimal geparst
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS belege (
+                sha256 TEXT PRIMARY KEY,
+                daten  TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM rechnungen").fetchone()[0]
+
+    def ist_exportiert(self, auftragsnummer: str | None) -> bool:
+        """True, wenn die Reise im Manifest steht und die Datei noch existiert."""
+        if not auftragsnummer:
+            return False
+        row = self.conn.execute(
+            "SELECT dateipfad FROM rechnungen WHERE auftragsnummer = ?", (auftragsnummer,)
+        ).fetchone()
+        return row is not None and os.path.exists(row[0])
+
+    def eintragen(self, auftragsnummer: str, dateipfad: str, rechnungsnr: str = "", sha256: str | None = None):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO rechnungen VALUES (?, ?, ?, ?, ?, ?)",
+            (auftragsnummer, dateipfad, rechnungsnr, os.path.getsize(dateipfad),
+             sha256 or sha256_datei(dateipfad), datetime.now().isoformat(timespec="seconds")),
+        )
+        self.conn.commit()
+
+    def eintrag(self, auftragsnummer: str) -> dict | None:
+        row = self.conn.execute(
+            "SELECT auftragsnummer, dateipfad, rechnungsnr, groesse, sha256, exportiert_am "
+            "FROM rechnungen WHERE auftragsnummer = ?", (auftragsnummer,)
+        ).fetchone()
+        return dict(zip(SPALTEN, row)) if row else None
+
+    def eintraege(self) -> list[dict]:
+        rows = self.conn.execute(
+            "SELECT auftragsnummer, dateipfad, rechnungsnr, groesse, sha256, exportiert_am "
+            "FROM rechnungen ORDER BY dateipfad"
+        ).fetchall()
+        return [dict(zip(SPALTEN, row)) for row in rows]
+
+    def beleg(self, sha256: str) -> dict | None:
+        row = self.conn.execute("SELECT daten FROM belege WHERE sha256 = ?", (sha256,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def beleg_speichern(self, sha256: str, daten: dict):
+        self.conn.execute("INSERT OR REPLACE INTO belege VALUES (?, ?)",
+                          (sha256, json.dumps(daten, ensure_ascii=False)))
+        self.conn.commit()
+
+    def importiere_bestand(self, download_dir: str) -> int:
+        """Übernimmt bereits vorhandene RG_*.pdf Dateien (z.B. aus Läufen vor dem Manifest)."""
+        if not os.path.isdir(download_dir):
+            return 0
+        anzahl = 0
+        for name in sorted(os.listdir(download_dir)):
+            treffer = DATEINAME_MUSTER.match(name)
+            pfad = os.path.join(download_dir, name)
+            if not treffer or os.path.getsize(pfad) == 0:
+                continue
+            if self.ist_exportiert(treffer["auftrag"]):
+                continue
+            self.eintragen(treffer["auftrag"], pfad, treffer["rechnungsnr"] or "")
+            anzahl += 1
+        if anzahl:
+            print(f"{ts()} 🗂️  {anzahl} vorhandene Rechnungen ins Manifest übernommen.")
+        return anzahl
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,141 @@
+import functools
+import inspect
+import json
+import math
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+from reusables import ts
+
+METRIK_DATEI = "metrics_%Y%m%d-%H%M%S.jsonl"
+
+
+def perzentil(werte: list[float], p: float) -> float:
+    """Nearest-Rank-Perzentil, p in 0..100."""
+    if not werte:
+        return 0.0
+    sortiert = sorted(werte)
+    rang = max(1, math.ceil(p / 100 * len(sortiert)))
+    return sortiert[rang - 1]
+
+
+class Metriken:
+    """Sammelt Spans (Stufe, Dauer, Ergebnis, Versuch) und schreibt sie als JSON-Lines."""
+
+    def __init__(self, pfad: str | None = None):
+        self.pfad = pfad
+        self.datei = open(pfad, "a", encoding="utf-8") if pfad else None
+        self.dauern = defaultdict(list)
+        self.fehler = defaultdict(int)
+        self.versuche = defaultdict(int)
+
+    def versuch(self, stufe: str, schluessel) -> int:
+        self.versuche[(stufe, schluessel)] += 1
+        return self.versuche[(stufe, schluessel)]
+
+    def schreibe(self, stufe: str, dauer: float, ergebnis: str, **attribute):
+        self.dauern[stufe].append(dauer)
+        if ergebnis != "ok":
+            self.fehler[stufe] += 1
+        if self.datei:
+            eintrag = {"zeit": datetime.now().isoformat(timespec="milliseconds"), "stufe": stufe,
+                       "dauer_s": round(dauer, 3), "ergebnis": ergebnis, **attribute}
+            self.datei.write(json.dumps(eintrag, ensure_ascii=False, default=str) + "\n")
+            self.datei.flush()
+
+    def zusammenfassung(self) -> list[str]:
+        zeilen = [f"{'Stufe':<26}{'n':>5}{'Fehler':>8}{'p50':>8}{'p95':>8}{'max':>8}"]
+        for stufe, werte in self.dauern.items():
+            zeilen.append(f"{stufe:<26}{len(werte):>5}{self.fehler[stufe]:>8}"
+                          f"{perzentil(werte, 50):>7.1f}s{perzentil(werte, 95):>7.1f}s{max(werte):>7.1f}s")
+        return zeilen
+
+    def close(self):
+        if self.datei:
+            self.datei.close()
+            self.datei = None
+
+
+# Aktive Instanz für den laufenden Export; ohne starten() wird nur im Speicher gezählt
+_aktiv = Metriken()
+
+
+def starten(pfad: str | None = None) -> Metriken:
+    global _aktiv
+    _aktiv.close()
+    _aktiv = Metriken(pfad or datetime.now().strftime(METRIK_DATEI))
+    return _aktiv
+
+
+def aktiv() -> Metriken:
+    return _aktiv
+
+
+def fehler_name(fehler: BaseException) -> str:
+    """Fehlerklasse (retry.TripFehler) falls vorhanden, sonst der Exception-Typ."""
+    return getattr(fehler, "klasse", type(fehler).__name__)
+
+
+@contextmanager
+def messe(stufe: str, **attribute):
+    """Span um einen Codeblock: with messe("trip.goto", index=3): ..."""
+    start = time.perf_counter()
+    ergebnis = "ok"
+    try:
+        yield attribute
+    except BaseException as e:
+        ergebnis = fehler_name(e)
+        raise
+    finally:
+        _aktiv.schreibe(stufe, time.perf_counter() - start, ergebnis, **attribute)
+
+
+def gemessen(stufe: str, schluessel=None):
+    """Decorator für (async) Funktionen. Rückgabewert False oder Exception zählt als Fehler.
+    schluessel(*args, **kwargs) identifiziert wiederholte Aufrufe, z.B. die URL einer Reise."""
+    def decorator(func):
+        def attribute(args, kwargs) -> dict:
+            if schluessel is None:
+                return {}
+            key = schluessel(*args, **kwargs)
+            return {"schluessel": key, "versuch": _aktiv.versuch(stufe, key)}
+
+        def ergebnis_von(wert) -> str:
+            return "fehler" if wert is False else "ok"
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                attr = attribute(args, kwargs)
+                start = time.perf_counter()
+                try:
+                    wert = await func(*args, **kwargs)
+                except BaseException as e:
+                    _aktiv.schreibe(stufe, time.perf_counter() - start, fehler_name(e), **attr)
+                    raise
+                _aktiv.schreibe(stufe, time.perf_counter() - start, ergebnis_von(wert), **attr)
+                return wert
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                attr = attribute(args, kwargs)
+                start = time.perf_counter()
+                try:
+                    wert = func(*args, **kwargs)
+                except BaseException as e:
+                    _aktiv.schreibe(stufe, time.perf_counter() - start, fehler_name(e), **attr)
+                    raise
+                _aktiv.schreibe(stufe, time.perf_counter() - start, ergebnis_von(wert), **attr)
+                return wert
+        return wrapper
+    return decorator
+
+
+def drucke_zusammenfassung():
+    if not _aktiv.dauern:
+        return
+    print(f"{ts()} 📈 Laufzeiten je Stufe" + (f" (Details: {_aktiv.pfad})" if _aktiv.pfad else ""))
+    for zeile in _aktiv.zusammenfassung():
+        print(f"    {zeile}")
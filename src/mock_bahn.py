@@ -0,0 +1,358 @@
+"""Lokaler Nachbau der bahn.de-Seiten, die der Export braucht.
+
+Login (username/password in zwei Schritten), Reiseübersicht "vergangene" mit
+"Weitere Reisen laden" (Liste per JSON unter /api/reisen), Detailseiten mit
+.test-auftragsnummer/.test-anlagedatum/.test-kundenname sowie die Buttons
+"Rechnung erstellen" und "Rechnung als PDF herunterladen".
+
+    python mock_bahn.py --port 8765 --reisen 200 --latenz 150 --fehlerquote 0.02
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import date, timedelta
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from reusables import ts
+
+LISTEN_PFAD = "/buchung/reiseuebersicht/vergangene"
+DETAIL_PFAD = "/buchung/reiseuebersicht/details"
+SEITENGROESSE = 10
+MONATE = ["Jan.", "Feb.", "März", "Apr.", "Mai", "Juni", "Juli", "Aug.", "Sep.", "Okt.", "Nov.", "Dez."]
+NAMEN = ["Max Mustermann", "Erika Musterfrau", "Hans Beispiel"]
+STRECKEN = [("Berlin Hbf", "München Hbf"), ("Hamburg Hbf", "Köln Hbf"), ("Frankfurt(Main)Hbf", "Stuttgart Hbf")]
+
+
+def erzeuge_reisen(anzahl: int, seed: int = 1) -> list[dict]:
+    """Deterministische Testreisen, neueste zuerst (wie im Portal)."""
+    zufall = random.Random(seed)
+    heute = date(2025, 6, 30)
+    reisen = []
+    for i in range(anzahl):
+        gebucht = heute - timedelta(days=3 * i + zufall.randint(0, 2))
+        von, nach = STRECKEN[i % len(STRECKEN)]
+        brutto = zufall.randint(1990, 18990)
+        reisen.append({
+            "auftragsnummer": str(700000000000 + i),
+            "rechnungsnummer": str(600000000000 + i),
+            "gebuchtAm": gebucht.isoformat(),
+            "reisedatum": (gebucht + timedelta(days=zufall.randint(1, 20))).isoformat(),
+            "kundenname": NAMEN[i % len(NAMEN)],
+            "von": von,
+            "nach": nach,
+            "bruttoCent": brutto,
+        })
+    return reisen
+
+
+def anlagedatum_text(iso: str) -> str:
+    d = date.fromisoformat(iso)
+    return f"gebucht am {d.day}. {MONATE[d.month - 1]} {d.year}"
+
+
+def euro(cent: int) -> str:
+    return f"{cent // 100},{cent % 100:02d} EUR"
+
+
+def erzeuge_pdf(reise: dict) -> bytes:
+    """Minimales, gültiges PDF mit den Rechnungsdaten als Text."""
+    brutto = reise["bruttoCent"]
+    netto = round(brutto / 1.19)
+    d = date.fromisoformat(reise["gebuchtAm"])
+    zeilen = [
+        "Deutsche Bahn - Rechnung",
+        f"Rechnungsnummer: {reise['rechnungsnummer']}",
+        f"Auftragsnummer: {reise['auftragsnummer']}",
+        f"Rechnungsdatum: {d.strftime('%d.%m.%Y')}",
+        f"Kunde: {reise['kundenname']}",
+        f"Verbindung: {reise['von']} - {reise['nach']}",
+        f"Summe netto: {euro(netto)}",
+        f"MwSt 19%: {euro(brutto - netto)}",
+        f"Gesamtbetrag brutto: {euro(brutto)}",
+    ]
+    text = "BT /F1 11 Tf 50 780 Td 14 TL " + " ".join(
+        "(" + z.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ") '" for z in zeilen
+    ) + " ET"
+    stream = text.encode("latin-1", errors="replace")
+    objekte = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+        b"/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>",
+        b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for nr, obj in enumerate(objekte, start=1):
+        offsets.append(len(pdf))
+        pdf += f"{nr} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(pdf)
+    pdf += f"xref\n0 {len(objekte) + 1}\n0000000000 65535 f \n".encode()
+    for off in offsets:
+        pdf += f"{off:010d} 00000 n \n".encode()
+    pdf += f"trailer\n<< /Size {len(objekte) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(pdf)
+
+
+SEITE = """<!DOCTYPE html><html lang="de"><head><meta charset="utf-8"><title>{titel}</title></head>
+<body>{cookie_banner}{inhalt}</body></html>"""
+
+COOKIE_BANNER = """<div id="consent" style="position:fixed;bottom:0;left:0;right:0;background:#eee;padding:8px">
+<button onclick="document.cookie='consent=1;path=/';document.getElementById('consent').remove()">Alle Cookies zulassen</button>
+</div>"""
+
+LOGIN_BENUTZER = """<form method="post" action="/auth/login"><input name="username" autofocus></form>"""
+LOGIN_PASSWORT = """<form method="post" action="/auth/login"><input type="hidden" name="username" value="{username}">
+<input name="password" type="password" autofocus></form>"""
+LOGIN_FEHLER = """<p>Es ist ein Fehler aufgetreten</p>""" + LOGIN_BENUTZER
+
+LISTE = """<main><ul id="reisen"></ul><div id="mehr"></div></main>
+<script>
+let offset = 0;
+async function laden() {
+  const r = await fetch(`/api/reisen?offset=${offset}&limit=%(seite)d`);
+  const daten = await r.json();
+  const ul = document.getElementById('reisen');
+  for (const reise of daten.reisen) {
+    const li = document.createElement('li');
+    li.className = 'reise-card';
+    li.innerHTML = `<span class="test-reisedatum">${reise.reisedatum}</span>
+      <span class="test-gebucht">${reise.gebuchtAm}</span> <span class="test-kunde">${reise.kundenname}</span>
+      <a href="%(detail)s?auftragsnummer=${reise.auftragsnummer}">${reise.von} &rarr; ${reise.nach}</a>`;
+    ul.appendChild(li);
+  }
+  offset += daten.reisen.length;
+  const mehr = document.getElementById('mehr');
+  mehr.innerHTML = daten.weitere
+    ? '<button type="button" onclick="laden()"><span class="test-button-label">Weitere Reisen laden</span></button>'
+    : '';
+}
+laden();
+</script>"""
+
+DETAIL = """<main id="detail">Lade Auftrag...</main>
+<script>
+const nr = new URLSearchParams(location.search).get('auftragsnummer');
+async function pdfLaden() {
+  const r = await fetch(`/api/rechnung/${nr}/pdf`);
+  if (!r.ok) return;
+  const name = (r.headers.get('content-disposition') || '').split('filename=')[1].replaceAll('"', '');
+  const a = document.createElement('a');
+  a.href = URL.createObjectURL(await r.blob());
+  a.download = name;
+  document.body.appendChild(a);
+  a.click();
+}
+function zeigeDownload() {
+  document.getElementById('rechnung').innerHTML =
+    '<button type="button" onclick="pdfLaden()">Rechnung als PDF herunterladen</button>';
+}
+async function erstellen() {
+  document.getElementById('rechnung').innerHTML = '<p>Rechnung wird erstellt...</p>';
+  const r = await fetch(`/api/rechnung/${nr}`, {method: 'POST', headers: {'Content-Type': 'application/json'},
+                                                body: JSON.stringify({auftragsnummer: nr})});
+  if (r.ok) zeigeDownload();
+}
+(async () => {
+  const r = await fetch(`/api/auftrag/${nr}`);
+  if (!r.ok) { document.getElementById('detail').innerText = 'Es ist ein Fehler aufgetreten'; return; }
+  const a = await r.json();
+  document.getElementById('detail').innerHTML = `
+    <h1 class="test-auftragsnummer">Auftragsnummer ${a.auftragsnummer}</h1>
+    <p class="test-anlagedatum">${a.anlagedatum}</p>
+    <p class="test-kundenname">${a.kundenname}</p>
+    <div id="rechnung"></div>`;
+  if (a.rechnungErstellt) zeigeDownload();
+  else document.getElementById('rechnung').innerHTML =
+    '<button type="button" class="rechnung-abruf__create-rechnung-button" onclick="erstellen()">Rechnung erstellen</button>';
+})();
+</script>"""
+
+
+class MockPortal:
+    """Zustand des Testportals: Reisen, erzeugte Rechnungen, Sessions und Zähler."""
+
+    def __init__(self, reisen: int = 50, latenz_ms: int = 100, fehlerquote: float = 0.0,
+                 generierung_ms: int = 500, cookie_banner: bool = True, seed: int = 1):
+        self.reisen = erzeuge_reisen(reisen, seed)
+        self.nach_nummer = {r["auftragsnummer"]: r for r in self.reisen}
+        self.latenz_ms = latenz_ms
+        self.fehlerquote = fehlerquote
+        self.generierung_ms = generierung_ms
+        self.cookie_banner = cookie_banner
+        self.zufall = random.Random(seed)
+        self.sessions = set()
+        # Jede zweite Rechnung existiert schon, die anderen müssen erst erstellt werden
+        self.erstellt = {r["auftragsnummer"] for i, r in enumerate(self.reisen) if i % 2 == 0}
+        self.zaehler = {"requests": 0, "pdfs": 0, "fehler": 0}
+        self.lock = threading.Lock()
+
+    def verzoegern(self):
+        if self.latenz_ms:
+            time.sleep(self.zufall.uniform(0.5, 1.5) * self.latenz_ms / 1000)
+
+    def zufallsfehler(self) -> bool:
+        with self.lock:
+            if self.zufall.random() < self.fehlerquote:
+                self.zaehler["fehler"] += 1
+                return True
+        return False
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    portal: MockPortal = None
+
+    def log_message(self, format, *args):
+        pass
+
+    # --- Antworten ---
+    def _senden(self, status: int, body: bytes, typ: str, header: dict = None):
+        self.send_response(status)
+        self.send_header("Content-Type", typ)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (header or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _html(self, titel: str, inhalt: str, status: int = 200, header: dict = None):
+        banner = COOKIE_BANNER if self.portal.cookie_banner and "consent" not in self._cookies() else ""
+        seite = SEITE.format(titel=titel, cookie_banner=banner, inhalt=inhalt)
+        self._senden(status, seite.encode("utf-8"), "text/html; charset=utf-8", header)
+
+    def _json(self, daten, status: int = 200):
+        self._senden(status, json.dumps(daten).encode("utf-8"), "application/json")
+
+    def _umleiten(self, ziel: str, header: dict = None):
+        self.send_response(302)
+        self.send_header("Location", ziel)
+        self.send_header("Content-Length", "0")
+        for k, v in (header or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+
+    def _cookies(self) -> dict:
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        return {k: m.value for k, m in cookie.items()}
+
+    def _eingeloggt(self) -> bool:
+        return self._cookies().get("mock_session") in self.portal.sessions
+
+    # --- Routen ---
+    def do_GET(self):
+        with self.portal.lock:
+            self.portal.zaehler["requests"] += 1
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        if url.path == "/auth/login":
+            return self._html("Login", LOGIN_BENUTZER)
+        if url.path.startswith("/buchung/") and not self._eingeloggt():
+            return self._umleiten("/auth/login")
+        if url.path == LISTEN_PFAD:
+            return self._html("Vergangene Reisen", LISTE % {"seite": SEITENGROESSE, "detail": DETAIL_PFAD})
+        if url.path == DETAIL_PFAD:
+            return self._html("Reisedetails", DETAIL)
+        if not url.path.startswith("/api/"):
+            return self._senden(404, b"not found", "text/plain")
+        if not self._eingeloggt():
+            return self._json({"fehler": "nicht angemeldet"}, 401)
+
+        self.portal.verzoegern()
+        if self.portal.zufallsfehler():
+            return self._json({"fehler": "zufall"}, 503)
+
+        teile = url.path.strip("/").split("/")
+        if teile == ["api", "reisen"]:
+            offset = int(query.get("offset", 0))
+            limit = int(query.get("limit", SEITENGROESSE))
+            seite = self.portal.reisen[offset:offset + limit]
+            return self._json({"reisen": seite, "weitere": offset + limit < len(self.portal.reisen)})
+        if len(teile) == 3 and teile[1] == "auftrag" and teile[2] in self.portal.nach_nummer:
+            reise = self.portal.nach_nummer[teile[2]]
+            return self._json({
+                "auftragsnummer": reise["auftragsnummer"],
+                "anlagedatum": anlagedatum_text(reise["gebuchtAm"]),
+                "kundenname": reise["kundenname"],
+                "rechnungErstellt": reise["auftragsnummer"] in self.portal.erstellt,
+            })
+        if len(teile) == 4 and teile[1] == "rechnung" and teile[3] == "pdf":
+            reise = self.portal.nach_nummer.get(teile[2])
+            if reise is None or reise["auftragsnummer"] not in self.portal.erstellt:
+                return self._json({"fehler": "Rechnung noch nicht erstellt"}, 404)
+            with self.portal.lock:
+                self.portal.zaehler["pdfs"] += 1
+            name = f"DB_Rechnung_{reise['rechnungsnummer']}.pdf"
+            return self._senden(200, erzeuge_pdf(reise), "application/pdf",
+                                {"Content-Disposition": f'attachment; filename="{name}"'})
+        return self._json({"fehler": "unbekannt"}, 404)
+
+    def do_POST(self):
+        with self.portal.lock:
+            self.portal.zaehler["requests"] += 1
+        url = urlparse(self.path)
+        laenge = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(laenge).decode("utf-8") if laenge else ""
+
+        if url.path == "/auth/login":
+            form = {k: v[0] for k, v in parse_qs(body).items()}
+            if "password" not in form:
+                return self._html("Login", LOGIN_PASSWORT.format(username=form.get("username", "")))
+            if not form.get("username") or not form.get("password"):
+                return self._html("Login", LOGIN_FEHLER)
+            session = f"s{random.getrandbits(64):x}"
+            with self.portal.lock:
+                self.portal.sessions.add(session)
+            return self._umleiten(LISTEN_PFAD, {"Set-Cookie": f"mock_session={session}; Path=/; HttpOnly"})
+
+        teile = url.path.strip("/").split("/")
+        if len(teile) == 3 and teile[:2] == ["api", "rechnung"]:
+            if not self._eingeloggt():
+                return self._json({"fehler": "nicht angemeldet"}, 401)
+            self.portal.verzoegern()
+            if self.portal.zufallsfehler():
+                return self._json({"fehler": "zufall"}, 503)
+            if teile[2] not in self.portal.nach_nummer:
+                return self._json({"fehler": "unbekannt"}, 404)
+            time.sleep(self.portal.generierung_ms / 1000)
+            with self.portal.lock:
+                self.portal.erstellt.add(teile[2])
+            return self._json({"status": "erstellt"})
+        return self._json({"fehler": "unbekannt"}, 404)
+
+
+def starte_server(portal: MockPortal, port: int = 0) -> ThreadingHTTPServer:
+    """Startet den Server im Hintergrund-Thread. port=0 wählt einen freien Port."""
+    handler = type("Handler", (MockHandler,), {"portal": portal})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def basis_url(server: ThreadingHTTPServer) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}{LISTEN_PFAD}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lokales Test-Portal für den DB Rechnungsexport")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--reisen", type=int, default=50, help="Anzahl Reisen")
+    parser.add_argument("--latenz", type=int, default=100, help="Mittlere API-Latenz in ms")
+    parser.add_argument("--fehlerquote", type=float, default=0.0, help="Anteil zufälliger 503-Antworten (0..1)")
+    parser.add_argument("--generierung", type=int, default=500, help="Dauer 'Rechnung erstellen' in ms")
+    parser.add_argument("--ohne-cookie-banner", action="store_true")
+    args = parser.parse_args()
+
+    portal = MockPortal(args.reisen, args.latenz, args.fehlerquote, args.generierung, not args.ohne_cookie_banner)
+    server = starte_server(portal, args.port)
+    print(f"{ts()} 🧪 Test-Portal läuft: {basis_url(server)} (Strg+C beendet)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
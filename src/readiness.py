@@ -0,0 +1,69 @@
+from reusables import ts
+
+# Kompatibilitätsmodus: alte feste Pausen und slow_mo wieder einschalten.
+# Standard ist das Warten auf konkrete Signale (Locator-Zustand, DOM, Netzwerk, Download).
+FESTE_WARTEZEITEN = False
+SLOW_MO_KOMPATIBEL = 500
+
+
+def setze_feste_wartezeiten(aktiv: bool):
+    global FESTE_WARTEZEITEN
+    FESTE_WARTEZEITEN = aktiv
+    modus = "feste Wartezeiten" if aktiv else "ereignisbasiert"
+    print(f"{ts()} ⏱️  Wartemodus: {modus}")
+
+
+def modus_name() -> str:
+    return "fest" if FESTE_WARTEZEITEN else "ereignis"
+
+
+def slow_mo() -> int:
+    return SLOW_MO_KOMPATIBEL if FESTE_WARTEZEITEN else 0
+
+
+async def pause(page, ms: int):
+    """Feste Wartezeit, nur noch im Kompatibilitätsmodus aktiv."""
+    if FESTE_WARTEZEITEN:
+        await page.wait_for_timeout(ms)
+
+
+async def warte_auf_locator(locator, state: str = "visible", timeout: int = 5000) -> bool:
+    """Wartet bis der Locator den Zustand erreicht. False statt Exception bei Timeout."""
+    try:
+        await locator.wait_for(state=state, timeout=timeout)
+        return True
+    except Exception:
+        return False
+
+
+async def warte_auf_mehr_elemente(page, selector: str, anzahl_vorher: int, timeout: int = 10000) -> bool:
+    """DOM-Signal: wartet bis mehr als anzahl_vorher Elemente zum Selektor existieren."""
+    try:
+        await page.wait_for_function(
+            "([sel, n]) => document.querySelectorAll(sel).length > n",
+            arg=[selector, anzahl_vorher], timeout=timeout,
+        )
+        return True
+    except Exception:
+        return False
+
+
+async def warte_auf_text(page, selector: str, timeout: int = 5000) -> bool:
+    """Wartet bis das erste Element zum Selektor nicht-leeren Text hat."""
+    try:
+        await page.wait_for_function(
+            "sel => { const el = document.querySelector(sel); return !!el && el.innerText.trim().length > 0; }",
+            arg=selector, timeout=timeout,
+        )
+        return True
+    except Exception:
+        return False
+
+
+async def warte_auf_netzwerkruhe(page, timeout: int = 5000) -> bool:
+    """Netzwerk-Signal: keine offenen Requests mehr (mit Obergrenze)."""
+    try:
+        await page.wait_for_load_state("networkidle", timeout=timeout)
+        return True
+    except Exception:
+        return False
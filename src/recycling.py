@@ -0,0 +1,113 @@
+"""Frische Worker-Seiten für lange Läufe.
+
+Jede Worker-Seite wird beobachtet: Renderer-Speicher über CDP (Performance.getMetrics,
+JSHeapUsedSize und Nodes) und Dauer pro Reise. Nach NACH_REISEN Reisen, über HEAP_MB,
+über KNOTEN DOM-Knoten oder wenn die Reisen deutlich langsamer werden als am Anfang,
+wird die Seite geschlossen und im selben Context neu geöffnet - Cookies und Login
+bleiben dabei erhalten.
+
+Den gesamten Speicher des Renderer-Prozesses (Bilder, Layout, GPU) liefert CDP nicht je
+Seite: SystemInfo.getProcessInfo kennt nur CPU-Zeiten, die Memory-Domain nur Zähler.
+Der JS-Heap sieht davon nur den V8-Anteil; abgelöste DOM-Bäume, die nativen Speicher
+festhalten, zeigen sich in Nodes. Den Rest fängt das Recycling nach NACH_REISEN ab.
+"""
+import statistics
+from collections import Counter, deque
+
+from metrics import messe
+from reusables import ts
+
+NACH_REISEN = 50       # 0 = aus
+HEAP_MB = 350          # 0 = aus
+KNOTEN = 250_000       # DOM-Knoten inkl. abgelöster, eine Detailseite hat wenige Tausend; 0 = aus
+LATENZ_FAKTOR = 2.0    # Median der letzten Reisen gegen den Median der ersten; 0 = aus
+FENSTER = 5            # Reisen für die Mediane
+
+gruende = Counter()    # Alle Recyclings des Laufs, für den Bericht
+max_heap_mb = 0.0
+max_knoten = 0
+
+
+def konfigurieren(nach_reisen: int = None, heap_mb: float = None, latenz_faktor: float = None,
+                  knoten: int = None):
+    global NACH_REISEN, HEAP_MB, LATENZ_FAKTOR, KNOTEN
+    if nach_reisen is not None:
+        NACH_REISEN = nach_reisen
+    if heap_mb is not None:
+        HEAP_MB = heap_mb
+    if knoten is not None:
+        KNOTEN = knoten
+    if latenz_faktor is not None:
+        LATENZ_FAKTOR = latenz_faktor
+
+
+def bericht() -> str:
+    details = ", ".join(f"{g}: {n}" for g, n in gruende.most_common()) or "-"
+    return (f"Seiten recycelt: {sum(gruende.values())} ({details}) | max. JS-Heap {max_heap_mb:.0f} MB, "
+            f"max. {max_knoten} DOM-Knoten")
+
+
+class SeitenWaechter:
+    """Beobachtet eine Worker-Seite und ersetzt sie bei Bedarf."""
+
+    def __init__(self, page):
+        self.page = page
+        self.cdp = None
+        self.reisen = 0
+        self.basis = []                     # Dauern der ersten Reisen (Referenz)
+        self.letzte = deque(maxlen=FENSTER)
+
+    async def speicher(self) -> tuple[float | None, int | None]:
+        """(JS-Heap in MB, DOM-Knoten) der Seite, None ohne CDP (z.B. Firefox/WebKit)."""
+        global max_heap_mb, max_knoten
+        try:
+            if self.cdp is None:
+                self.cdp = await self.page.context.new_cdp_session(self.page)
+                await self.cdp.send("Performance.enable")
+            werte = (await self.cdp.send("Performance.getMetrics"))["metrics"]
+        except Exception:
+            return None, None
+        werte = {m["name"]: m["value"] for m in werte}
+        mb = werte["JSHeapUsedSize"] / 1024 / 1024 if "JSHeapUsedSize" in werte else None
+        knoten = int(werte["Nodes"]) if "Nodes" in werte else None
+        max_heap_mb = max(max_heap_mb, mb or 0.0)
+        max_knoten = max(max_knoten, knoten or 0)
+        return mb, knoten
+
+    async def pruefen(self, dauer_s: float) -> str | None:
+        """Nach jeder Reise aufrufen. Gibt den Grund zurück, falls recycelt werden soll."""
+        self.reisen += 1
+        if len(self.basis) < FENSTER:
+            self.basis.append(dauer_s)
+        self.letzte.append(dauer_s)
+
+        if NACH_REISEN and self.reisen >= NACH_REISEN:
+            return "reisen"
+        if HEAP_MB or KNOTEN:
+            mb, knoten = await self.speicher()
+            if HEAP_MB and mb is not None and mb > HEAP_MB:
+                return "speicher"
+            if KNOTEN and knoten is not None and knoten > KNOTEN:
+                return "dom"
+        if LATENZ_FAKTOR and len(self.basis) == FENSTER and self.reisen >= 2 * FENSTER:
+            if statistics.median(self.letzte) > LATENZ_FAKTOR * statistics.median(self.basis):
+                return "latenz"
+        return None
+
+    async def recyceln(self, grund: str):
+        """Schließt die Seite und öffnet eine neue im selben Context (Session bleibt)."""
+        mb, _ = await self.speicher()
+        with messe("seite.recyceln", grund=grund):
+            context = self.page.context
+            try:
+                await self.page.close()
+            except Exception:
+                pass
+            self.page = await context.new_page()
+        gruende[grund] += 1
+        heap = f", JS-Heap {mb:.0f} MB" if mb is not None else ""
+        print(f"{ts()} ♻️  Seite nach {self.reisen} Reisen erneuert ({grund}{heap})")
+        self.cdp = None
+        self.reisen = 0
+        self.letzte.clear()
+        return self.page
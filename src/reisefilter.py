@@ -0,0 +1,139 @@
+import re
+from collections import Counter
+from datetime import date, datetime
+
+# Feldnamen in den JSON-Antworten der Reiseliste (Teilstrings, klein geschrieben)
+GEBUCHT_FELDER = ("gebucht", "buchung", "anlage", "angelegt", "bestell", "created", "booking")
+REISE_FELDER = ("reisedatum", "abfahrt", "hinfahrt", "departure", "travel", "reise")
+KUNDE_FELDER = ("kunde", "reisender", "name")
+
+# CSS-Klassen der Reisekarten im DOM (".test-gebucht", ".test-reisedatum", ...)
+KARTE_GEBUCHT = ("test-gebucht", "test-anlagedatum", "test-buchungsdatum")
+KARTE_REISE = ("test-reisedatum", "test-abfahrt")
+KARTE_KUNDE = ("test-kunde", "test-kundenname")
+
+DATUM_MUSTER = re.compile(r"(\d{4}-\d{2}-\d{2})|(\d{1,2})\.(\d{1,2})\.(\d{4})")
+
+
+def datum(wert) -> date | None:
+    """ISO-Datum/-Zeitstempel oder TT.MM.JJJJ -> date, sonst None."""
+    if not isinstance(wert, str):
+        return None
+    treffer = DATUM_MUSTER.search(wert)
+    if not treffer:
+        return None
+    try:
+        if treffer.group(1):
+            return date.fromisoformat(treffer.group(1))
+        return date(int(treffer.group(4)), int(treffer.group(3)), int(treffer.group(2)))
+    except ValueError:
+        return None
+
+
+def _finde(daten: dict, namen: tuple, umwandeln):
+    """Erstes passendes Feld, auch eine Ebene tiefer (z.B. {"hinfahrt": {"abfahrt": ...}})."""
+    for tiefe in (0, 1):
+        kandidaten = [daten] if tiefe == 0 else [v for v in daten.values() if isinstance(v, dict)]
+        for obj in kandidaten:
+            for name in namen:
+                for key, wert in obj.items():
+                    if name in key.lower():
+                        ergebnis = umwandeln(wert)
+                        if ergebnis:
+                            return ergebnis
+    return None
+
+
+def _text(wert) -> str | None:
+    return wert.strip() if isinstance(wert, str) and wert.strip() and not datum(wert) else None
+
+
+def info_aus_json(auftragsnummer: str, daten: dict) -> dict:
+    """Filterrelevante Felder eines Listeneintrags aus der Netzwerk-Antwort."""
+    return {
+        "auftragsnummer": auftragsnummer,
+        "gebucht": _finde(daten, GEBUCHT_FELDER, datum),
+        "reisedatum": _finde(daten, REISE_FELDER, datum),
+        "kunde": _finde(daten, KUNDE_FELDER, _text),
+    }
+
+
+def info_aus_karte(auftragsnummer: str, felder: dict) -> dict:
+    """Wie info_aus_json, aber aus den .test-* Feldern einer Reisekarte im DOM."""
+    def erstes(klassen, umwandeln):
+        for klasse in klassen:
+            wert = umwandeln(felder.get(klasse))
+            if wert:
+                return wert
+        return None
+
+    return {
+        "auftragsnummer": auftragsnummer,
+        "gebucht": erstes(KARTE_GEBUCHT, datum),
+        "reisedatum": erstes(KARTE_REISE, datum),
+        "kunde": erstes(KARTE_KUNDE, lambda w: w.strip() if isinstance(w, str) else None),
+    }
+
+
+class ReiseFilter:
+    """Auswahl von Reisen anhand der Listendaten, bevor eine Detailseite geöffnet wird.
+    Unbekannte Felder schließen nichts aus - lieber eine Rechnung zu viel als eine zu wenig."""
+
+    def __init__(self, gebucht_von: date = None, gebucht_bis: date = None,
+                 reise_von: date = None, reise_bis: date = None,
+                 kunde: str = None, auftragsnummern=None):
+        self.gebucht_von = gebucht_von
+        self.gebucht_bis = gebucht_bis
+        self.reise_von = reise_von
+        self.reise_bis = reise_bis
+        self.kunde = kunde.lower() if kunde else None
+        self.auftragsnummern = set(auftragsnummern) if auftragsnummern else None
+        self.gefunden = set()
+        self.zaehler = Counter()
+
+    def kopie(self) -> "ReiseFilter":
+        """Gleiche Kriterien, eigene Zähler (z.B. je Konto im Batch-Modus)."""
+        return ReiseFilter(self.gebucht_von, self.gebucht_bis, self.reise_von, self.reise_bis,
+                           self.kunde, self.auftragsnummern)
+
+    @property
+    def aktiv(self) -> bool:
+        return any(w is not None for w in (self.gebucht_von, self.gebucht_bis, self.reise_von,
+                                           self.reise_bis, self.kunde, self.auftragsnummern))
+
+    @staticmethod
+    def _im_bereich(wert: date | None, von: date | None, bis: date | None) -> bool:
+        if wert is None:
+            return True
+        return (von is None or wert >= von) and (bis is None or wert <= bis)
+
+    def passt(self, info: dict) -> bool:
+        ok = (self._im_bereich(info["gebucht"], self.gebucht_von, self.gebucht_bis)
+              and self._im_bereich(info["reisedatum"], self.reise_von, self.reise_bis)
+              and (self.kunde is None or info["kunde"] is None or self.kunde in info["kunde"].lower())
+              and (self.auftragsnummern is None or info["auftragsnummer"] in self.auftragsnummern))
+        if ok and self.auftragsnummern is not None:
+            self.gefunden.add(info["auftragsnummer"])
+        self.zaehler["passt" if ok else "aussortiert"] += 1
+        return ok
+
+    def ueber_fenster(self, infos: list[dict]) -> bool:
+        """True, wenn Weiterblättern nichts mehr bringt: die Liste ist nach Reisedatum neueste
+        zuerst sortiert, also reicht es, wenn die ganze letzte Charge vor dem Zeitfenster liegt -
+        oder alle gesuchten Auftragsnummern schon gefunden sind. Gebucht wird nie nach der
+        Reise, deshalb begrenzt das Reisedatum auch das Buchungsfenster."""
+        if self.auftragsnummern is not None and self.gefunden >= self.auftragsnummern:
+            return True
+        untergrenzen = [von for von in (self.reise_von, self.gebucht_von) if von is not None]
+        if not infos or not untergrenzen:
+            return False
+        grenze = max(untergrenzen)
+        return all(info["reisedatum"] is not None and info["reisedatum"] < grenze for info in infos)
+
+    def bericht(self) -> str:
+        return f"Filter: {self.zaehler['passt']} ausgewählt, {self.zaehler['aussortiert']} aussortiert"
+
+
+def iso_datum(text: str) -> date:
+    """argparse-Typ für JJJJ-MM-TT."""
+    return datetime.strptime(text, "%Y-%m-%d").date()
@@ -0,0 +1,256 @@
+import asyncio
+import json
+from collections import Counter
+from urllib.parse import parse_qs, urlencode, urlparse, urlunparse
+
+import drossel
+from reisefilter import info_aus_json
+from reusables import ts
+
+PLATZHALTER = "{auftragsnummer}"
+
+# Bekannte Namen für Paging-Parameter und wie weitergezählt wird
+PAGING_PARAMETER = {
+    "offset": "eintraege", "start": "eintraege", "skip": "eintraege", "from": "eintraege",
+    "page": "seiten", "seite": "seiten", "pagenumber": "seiten", "pageindex": "seiten",
+}
+MAX_SEITEN = 1000  # Nur als Notbremse gegen Endlosschleifen
+# 429/5xx einer Folgeseite: so oft versuchen, Wartezeit verdoppelt sich (Retry-After gewinnt, wenn länger)
+PAGING_VERSUCHE = 4
+PAGING_WARTEZEIT_S = 2.0
+PAGING_MAX_WARTEZEIT_S = 60.0
+
+
+def finde_auftraege(daten) -> list[dict]:
+    """Sucht rekursiv alle Objekte mit einem Auftragsnummer-Feld in einer JSON-Antwort."""
+    gefunden = []
+
+    # "daten" ist der Listeneintrag, in dem die Nummer steckt (mit Datum, Name, ...)
+    def suche(obj, eintrag):
+        if isinstance(obj, dict):
+            for key, wert in obj.items():
+                if "auftragsnummer" in key.lower() and isinstance(wert, (str, int)) and str(wert).strip().isdigit():
+                    gefunden.append({"auftragsnummer": str(wert).strip(), "daten": eintrag or obj})
+                    return
+            for wert in obj.values():
+                suche(wert, eintrag)
+        elif isinstance(obj, list):
+            for wert in obj:
+                suche(wert, wert if isinstance(wert, dict) else eintrag)
+
+    suche(daten, None)
+    return gefunden
+
+
+class ReiselistenMitschnitt:
+    """Liest die Reiseliste aus den JSON-Antworten der Reiseübersicht statt aus dem DOM."""
+
+    def __init__(self, page, bei_neuen=None, reisefilter=None, ueber_seite: bool = False):
+        self.page = page
+        self.eintraege = {}        # auftragsnummer -> Rohdaten aus der Antwort, in Reihenfolge
+        self.listen_request = None  # erster Request, der Reisen geliefert hat
+        self.seiten = 0
+        self.url_muster = None
+        # async bei_neuen(detail_urls) bekommt jede neue Charge sofort (Streaming)
+        self.bei_neuen = bei_neuen
+        # reisefilter.ReiseFilter wählt schon hier aus, bevor eine Detailseite geöffnet wird
+        self.reisefilter = reisefilter
+        self.ausgewaehlt = []
+        # Folgeseiten per fetch() in der Seite statt context.request, damit HAR-Aufnahme
+        # und -Wiedergabe (har.py) sie sehen - context.request läuft an beiden vorbei
+        self.ueber_seite = ueber_seite
+        # Eigene fetch()-Aufrufe lösen ebenfalls das Response-Event der Seite aus. Die
+        # übernimmt alle_seiten_laden selbst - sonst wäre "neu" dort leer und das Paging
+        # endete nach der zweiten Seite. (url, body) -> noch erwartete Events
+        self._eigene = Counter()
+        self.letzte_charge = []
+        self.paging_fehler = None  # HTTP-Status, an dem das direkte Paging gescheitert ist
+
+    async def _on_response(self, response):
+        # Vor dem ersten await prüfen, solange die Reihenfolge der Events noch stimmt
+        eigener = (response.url, response.request.post_data)
+        if self._eigene[eigener]:
+            self._eigene[eigener] -= 1
+            return
+        if response.request.resource_type not in ("fetch", "xhr"):
+            return
+        if "json" not in (await response.all_headers()).get("content-type", ""):
+            return
+        try:
+            treffer = finde_auftraege(await response.json())
+        except Exception:
+            return
+        if not treffer:
+            return
+        if self.listen_request is None:
+            self.listen_request = response.request
+        self.seiten += 1
+        self.letzte_charge = treffer
+        await self._melden(self._uebernehmen(treffer))
+
+    async def _melden(self, nummern: list[str]):
+        # Ohne URL-Muster wird gepuffert, lerne_url_muster() meldet dann alles nach
+        if not self.url_muster or not nummern:
+            return
+        if self.reisefilter is not None:
+            nummern = [nr for nr in nummern if self.reisefilter.passt(info_aus_json(nr, self.eintraege[nr]))]
+        self.ausgewaehlt.extend(nummern)
+        if self.bei_neuen is not None and nummern:
+            await self.bei_neuen([self.detail_url(nr) for nr in nummern])
+
+    def fenster_verlassen(self) -> bool:
+        """True, wenn die zuletzt geladene Seite komplett vor dem Zeitfenster des Filters liegt."""
+        if self.reisefilter is None:
+            return False
+        return self.reisefilter.ueber_fenster(
+            [info_aus_json(t["auftragsnummer"], t["daten"]) for t in self.letzte_charge])
+
+    def _uebernehmen(self, treffer: list[dict]) -> list[str]:
+        neu = []
+        for t in treffer:
+            if t["auftragsnummer"] not in self.eintraege:
+                self.eintraege[t["auftragsnummer"]] = t["daten"]
+                neu.append(t["auftragsnummer"])
+        return neu
+
+    def starten(self):
+        self.page.on("response", self._on_response)
+        return self
+
+    def beenden(self):
+        self.page.remove_listener("response", self._on_response)
+
+    def _naechste_seite(self, request, anzahl: int):
+        """Baut URL/Body der Folgeseite, falls ein bekannter Paging-Parameter gefunden wird."""
+        teile = urlparse(request.url)
+        query = {k: v[0] for k, v in parse_qs(teile.query).items()}
+        for name, wert in query.items():
+            art = PAGING_PARAMETER.get(name.lower())
+            if art and wert.isdigit():
+                query[name] = str(int(wert) + (anzahl if art == "eintraege" else 1))
+                return urlunparse(teile._replace(query=urlencode(query))), request.post_data
+
+        if request.post_data:
+            try:
+                body = json.loads(request.post_data)
+            except ValueError:
+                return None
+            if isinstance(body, dict):
+                for name, wert in body.items():
+                    art = PAGING_PARAMETER.get(name.lower())
+                    if art and isinstance(wert, int):
+                        body[name] = wert + (anzahl if art == "eintraege" else 1)
+                        return request.url, json.dumps(body)
+        return None
+
+    async def alle_seiten_laden(self, stop_bei=None) -> bool:
+        """Fragt die Folgeseiten direkt ab (context.request oder fetch in der Seite), ohne Klick-Limit.
+        stop_bei(auftragsnummer) -> True beendet das Laden (z.B. bereits exportiert).
+        Gibt False zurück, wenn kein Paging-Parameter erkannt wurde oder eine Folgeseite
+        auch nach PAGING_VERSUCHE Versuchen nicht kam - der Aufrufer klickt dann weiter."""
+        request = self.listen_request
+        if request is None:
+            return False
+        headers = await request.all_headers()
+        headers = {k: v for k, v in headers.items() if not k.startswith(":") and k.lower() not in ("cookie", "content-length")}
+        anzahl = len(self.eintraege)
+        url, daten = request.url, request.post_data
+
+        for _ in range(MAX_SEITEN):
+            if stop_bei and any(stop_bei(nr) for nr in self.eintraege):
+                print(f"{ts()} ⏹️  Bereits exportierte Reise erreicht, Liste vollständig.")
+                return True
+            if self.fenster_verlassen():
+                print(f"{ts()} ⏹️  Zeitfenster des Filters verlassen, Liste vollständig.")
+                return True
+            naechste = self._naechste_seite(_Request(url, daten), anzahl)
+            if naechste is None:
+                return False
+            url, daten = naechste
+            status, antwort = await self._seite_abrufen(url, request.method, headers, daten)
+            if not 200 <= status < 300:
+                self.paging_fehler = status
+                print(f"{ts()} ⚠️ Reiseliste HTTP {status} nach Seite {self.seiten}, "
+                      f"lade den Rest per Klick.")
+                return False
+            treffer = finde_auftraege(antwort)
+            neu = self._uebernehmen(treffer)
+            self.seiten += 1
+            self.letzte_charge = treffer
+            await self._melden(neu)
+            print(f"{ts()}   ↓ Seite {self.seiten}: {len(neu)} neue Reisen")
+            if not neu:
+                return True
+            anzahl = len(treffer)
+        return True
+
+    async def _seite_abrufen(self, url: str, methode: str, headers: dict, daten: str | None):
+        """Wie _abrufen, wiederholt aber 429/5xx mit Backoff. Jeder Versuch läuft durch
+        die Drossel, die so auch Überlast auf der Liste mitbekommt."""
+        for versuch in range(1, PAGING_VERSUCHE + 1):
+            async with drossel.takt("liste"):
+                status, antwort, retry_after = await self._abrufen(url, methode, headers, daten)
+            if status != 429 and status < 500:
+                return status, antwort
+            wartezeit = drossel.retry_after_s(retry_after)
+            if not self.ueber_seite:
+                # context.request löst kein Response-Event aus, drossel.beobachten sieht es nicht
+                drossel.http_status(status, wartezeit)
+            if versuch == PAGING_VERSUCHE:
+                break
+            wartezeit = min(PAGING_MAX_WARTEZEIT_S,
+                            max(PAGING_WARTEZEIT_S * 2 ** (versuch - 1), wartezeit or 0))
+            print(f"{ts()}   ↻ Reiseliste HTTP {status}, neuer Versuch in {wartezeit:.0f} s")
+            await asyncio.sleep(wartezeit)
+        return status, antwort
+
+    async def _abrufen(self, url: str, methode: str, headers: dict, daten: str | None):
+        """(HTTP-Status, JSON, Retry-After) einer Listen-Seite."""
+        if not self.ueber_seite:
+            response = await self.page.context.request.fetch(url, method=methode, headers=headers, data=daten)
+            return (response.status, (await response.json() if response.ok else None),
+                    response.headers.get("retry-after"))
+        # Verbotene Header (User-Agent, Referer, ...) ignoriert fetch() stillschweigend
+        self._eigene[(url, daten)] += 1
+        try:
+            ergebnis = await self.page.evaluate("""
+                async ([url, method, headers, body]) => {
+                    const r = await fetch(url, {method, headers, body: body ?? undefined, credentials: 'include'});
+                    return {status: r.status, text: await r.text(), retryAfter: r.headers.get('retry-after')};
+                }
+            """, [url, methode, headers, daten])
+        except Exception:
+            self._eigene[(url, daten)] -= 1  # ohne Antwort kommt auch kein Event
+            raise
+        ok = 200 <= ergebnis["status"] < 300
+        return ergebnis["status"], (json.loads(ergebnis["text"]) if ok else None), ergebnis["retryAfter"]
+
+    async def lerne_url_muster(self) -> bool:
+        """Detail-URL-Muster aus einem echten Link der Seite; meldet danach die gepufferten Reisen."""
+        vorlage = await self.page.evaluate("""
+            () => { const a = document.querySelector("a[href*='auftragsnummer=']"); return a ? a.href : null; }
+        """)
+        if not vorlage:
+            return False
+        teile = urlparse(vorlage)
+        query = {k: v[0] for k, v in parse_qs(teile.query).items()}
+        query["auftragsnummer"] = PLATZHALTER
+        self.url_muster = urlunparse(teile._replace(query=urlencode(query, safe="{}")))
+        await self._melden(list(self.eintraege))
+        return True
+
+    def detail_url(self, auftragsnummer: str) -> str:
+        return self.url_muster.replace(PLATZHALTER, auftragsnummer)
+
+    def detail_urls(self) -> list[str]:
+        if not self.url_muster:
+            return []
+        return [self.detail_url(nr) for nr in self.ausgewaehlt]
+
+
+class _Request:
+    """Minimaler Ersatz für playwright.Request beim Weiterzählen der Seiten."""
+
+    def __init__(self, url: str, post_data: str | None):
+        self.url = url
+        self.post_data = post_data
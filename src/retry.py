@@ -0,0 +1,168 @@
+import asyncio
+import heapq
+from collections import Counter, defaultdict
+
+from reusables import ts
+
+# Fehlerklassen einer Reise
+NAVIGATION_TIMEOUT = "navigation_timeout"
+ELEMENT_FEHLT = "element_fehlt"
+RECHNUNG_IN_ERSTELLUNG = "rechnung_in_erstellung"
+DOWNLOAD_FEHLER = "download_fehler"
+UNBEKANNT = "unbekannt"
+
+
+class TripFehler(Exception):
+    """Fehlgeschlagene Reise mit Fehlerklasse für den RetryPlaner."""
+
+    def __init__(self, klasse: str, nachricht: str = ""):
+        super().__init__(nachricht or klasse)
+        self.klasse = klasse
+
+
+class Richtlinie:
+    """Versuchsbudget und Backoff einer Fehlerklasse."""
+
+    def __init__(self, versuche: int, basis_s: float, faktor: float = 2.0, max_s: float = 120.0):
+        self.versuche = versuche
+        self.basis_s = basis_s
+        self.faktor = faktor
+        self.max_s = max_s
+
+    def wartezeit(self, versuch: int) -> float:
+        return min(self.max_s, self.basis_s * self.faktor ** (versuch - 1))
+
+
+RICHTLINIEN = {
+    NAVIGATION_TIMEOUT: Richtlinie(versuche=4, basis_s=5, faktor=2, max_s=60),
+    ELEMENT_FEHLT: Richtlinie(versuche=2, basis_s=10, faktor=1),
+    # Rechnung wird noch erzeugt: später in derselben Runde nochmal, nicht blockierend warten
+    RECHNUNG_IN_ERSTELLUNG: Richtlinie(versuche=6, basis_s=15, faktor=1.5, max_s=60),
+    DOWNLOAD_FEHLER: Richtlinie(versuche=3, basis_s=3, faktor=2, max_s=30),
+    UNBEKANNT: Richtlinie(versuche=3, basis_s=5, faktor=2, max_s=30),
+}
+
+# So viele Fehlschläge in Folge ohne einen Erfolg = Portal ist down, Lauf abbrechen
+ABBRUCH_NACH_FEHLERSERIE = 8
+
+
+def klassifiziere(fehler: Exception) -> str:
+    if isinstance(fehler, TripFehler):
+        return fehler.klasse
+    text = str(fehler)
+    if "net::ERR_" in text or "Page.goto" in text:
+        return NAVIGATION_TIMEOUT
+    if "download" in text.lower():
+        return DOWNLOAD_FEHLER
+    if "Timeout" in text and ("wait_for" in text or "locator" in text.lower()):
+        return ELEMENT_FEHLT
+    return UNBEKANNT
+
+
+class RetryPlaner:
+    """Warteschlange der offenen Reisen mit Fälligkeitszeitpunkten.
+
+    Fehlgeschlagene Reisen kommen je nach Fehlerklasse mit Backoff wieder hinein,
+    bis ihr Budget aufgebraucht ist. Worker holen sich mit naechster() die nächste
+    fällige Reise; None heißt: nichts mehr zu tun (oder Abbruch)."""
+
+    def __init__(self, richtlinien: dict = None, abbruch_nach: int = ABBRUCH_NACH_FEHLERSERIE,
+                 max_offen: int = 0):
+        self.richtlinien = richtlinien or RICHTLINIEN
+        self.abbruch_nach = abbruch_nach
+        self.max_offen = max_offen             # 0 = unbegrenzt, sonst Gegendruck auf den Produzenten
+        self.produzent_aktiv = False
+        self._heap = []
+        self._reihenfolge = 0
+        self._signal = asyncio.Event()
+        self.in_arbeit = 0
+        self.versuche = defaultdict(Counter)   # index -> Fehlerklasse -> Anzahl
+        self.fehlerklassen = Counter()
+        self.aufgegeben = []                   # (index, url, klasse)
+        self.fehlerserie = 0
+        self.abgebrochen = False
+
+    def hinzufuegen(self, index: int, url: str, verzoegerung: float = 0.0):
+        faellig = asyncio.get_running_loop().time() + verzoegerung
+        # Bei gleicher Fälligkeit gewinnt der kleinere Index -> stabile Reihenfolge
+        heapq.heappush(self._heap, (faellig, index, self._reihenfolge, url))
+        self._reihenfolge += 1
+        self._signal.set()
+
+    async def einreihen(self, index: int, url: str):
+        """Wie hinzufuegen, wartet aber, solange max_offen Reisen anstehen (begrenzte Queue)."""
+        while self.max_offen and len(self._heap) >= self.max_offen and not self.abgebrochen:
+            self._signal.clear()
+            await self._signal.wait()
+        self.hinzufuegen(index, url)
+
+    def produzent_starten(self):
+        self.produzent_aktiv = True
+
+    def produzent_fertig(self):
+        self.produzent_aktiv = False
+        self._signal.set()
+
+    @property
+    def offen(self) -> int:
+        return len(self._heap)
+
+    async def naechster(self) -> tuple[int, str] | None:
+        loop = asyncio.get_running_loop()
+        while True:
+            if self.abgebrochen:
+                return None
+            timeout = None
+            if self._heap:
+                faellig, index, _, url = self._heap[0]
+                if faellig <= loop.time():
+                    heapq.heappop(self._heap)
+                    self.in_arbeit += 1
+                    self._signal.set()  # wartenden Produzenten wecken
+                    return index, url
+                timeout = faellig - loop.time()
+            elif self.in_arbeit == 0 and not self.produzent_aktiv:
+                return None
+            self._signal.clear()
+            try:
+                await asyncio.wait_for(self._signal.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def erfolg(self, index: int):
+        self.in_arbeit -= 1
+        self.fehlerserie = 0
+        self._signal.set()
+
+    def fehlschlag(self, index: int, url: str, klasse: str):
+        self.in_arbeit -= 1
+        self.fehlerklassen[klasse] += 1
+        self.versuche[index][klasse] += 1
+        versuch = self.versuche[index][klasse]
+        richtlinie = self.richtlinien.get(klasse, self.richtlinien[UNBEKANNT])
+
+        if klasse != RECHNUNG_IN_ERSTELLUNG:
+            self.fehlerserie += 1
+        if self.fehlerserie >= self.abbruch_nach and not self.abgebrochen:
+            print(f"{ts()} 🛑 {self.fehlerserie} Fehlschläge in Folge - Portal scheint gestört, breche ab.")
+            self.abgebrochen = True
+
+        if versuch >= richtlinie.versuche:
+            print(f"{ts()}   ✗ Reise {index + 1} aufgegeben ({klasse}, {versuch} Versuche)")
+            self.aufgegeben.append((index, url, klasse))
+        else:
+            wartezeit = richtlinie.wartezeit(versuch)
+            print(f"{ts()}   ↻ Reise {index + 1}: {klasse}, neuer Versuch in {wartezeit:.0f} s")
+            self.hinzufuegen(index, url, wartezeit)
+        self._signal.set()
+
+    def unerledigt(self) -> list[tuple[int, str]]:
+        """Aufgegebene und (bei Abbruch) noch offene Reisen, nach Index sortiert."""
+        reste = [(index, url) for index, url, _ in self.aufgegeben]
+        reste += [(index, url) for _, index, _, url in self._heap]
+        return sorted(reste)
+
+    def bericht(self) -> str:
+        klassen = ", ".join(f"{k}: {v}" for k, v in self.fehlerklassen.most_common()) or "-"
+        status = " | ABGEBROCHEN" if self.abgebrochen else ""
+        return f"Retry: Fehlerklassen {klassen} | aufgegeben: {len(self.aufgegeben)}{status}"
@@ -1,26 +1,31 @@
+import os
 import sys
 import platform
-import keyring
 from datetime import datetime
 #push changed
 
+# Zugangsdaten für nicht-interaktive Läufe (cron, CI); das Passwort darf auch im Keyring liegen
+ENV_EMAIL = "DBAHN_EMAIL"
+ENV_PASSWORT = "DBAHN_PASSWORD"
+
 def ts(format: object = "[%H:%M:%S]") -> str:
     """Gibt aktuelle Zeit als [HH:MM:SS] String zurück für Logging."""
     return datetime.now().strftime(format)
 
-# Plattformabhängige Imports
-if platform.system() == "Windows":
-    import msvcrt
-else:
-    import termios
-    import tty
+
+def _keyring():
+    """keyring erst bei Bedarf laden, der Import kostet spürbar Startzeit."""
+    import keyring
+    return keyring
 
 def get_input(prompt: str) -> str:
     """Plattformübergreifende Eingabe ohne Cursor-Probleme."""
     sys.stdout.write(prompt)
     sys.stdout.flush()
 
+    # Plattformabhängige Imports erst hier, nur die interaktive Abfrage braucht sie
     if platform.system() == "Windows":
+        import msvcrt
         # Windows: msvcrt
         input_buffer = []
         while True:
@@ -39,6 +44,8 @@ def get_input(prompt: str) -> str:
                 sys.stdout.write(char)
                 sys.stdout.flush()
     else:
+        import termios
+        import tty
         # Linux/macOS: termios
         fd = sys.stdin.fileno()
         old_settings = termios.tcgetattr(fd)
@@ -68,7 +75,9 @@ def get_password(prompt: str) -> str:
     sys.stdout.write(prompt)
     sys.stdout.flush()
 
+    # Plattformabhängige Imports erst hier, nur die interaktive Abfrage braucht sie
     if platform.system() == "Windows":
+        import msvcrt
         # Windows: msvcrt
         password_buffer = []
         while True:
@@ -87,6 +96,8 @@ def get_password(prompt: str) -> str:
                 sys.stdout.write('*')
                 sys.stdout.flush()
     else:
+        import termios
+        import tty
         # Linux/macOS: termios
         fd = sys.stdin.fileno()
         old_settings = termios.tcgetattr(fd)
@@ -111,31 +122,48 @@ def get_password(prompt: str) -> str:
         finally:
             termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
 
+def get_last_email(service_name: str = "db_bahn_portal") -> str | None:
+    """Zuletzt verwendete E-Mail aus dem Keyring, ohne Rückfrage."""
+    return _keyring().get_password(service_name, "last_email")
+
+def get_saved_password(service_name: str, email: str) -> str | None:
+    """Hinterlegtes Passwort eines Kontos aus dem Keyring, ohne Rückfrage."""
+    return _keyring().get_password(service_name, email)
+
+def get_env_credentials(service_name: str = "db_bahn_portal") -> tuple[str, str] | None:
+    """Zugangsdaten aus DBAHN_EMAIL/DBAHN_PASSWORD, ohne Rückfrage. Fehlt nur das
+    Passwort, wird es im Keyring gesucht. None, wenn keine E-Mail gesetzt ist."""
+    email = os.environ.get(ENV_EMAIL, "").strip()
+    if not email:
+        return None
+    password = os.environ.get(ENV_PASSWORT) or get_saved_password(service_name, email)
+    return (email, password) if password else None
+
 def get_credentials(service_name: str = "db_bahn_portal") -> tuple[str, str | None]:
     """Plattformübergreifende Abfrage von Login-Daten."""
     sys.stdout.write("\n=== Login-Daten ===\n")
     sys.stdout.flush()
 
-    last_email = keyring.get_password(service_name, "last_email")
+    last_email = _keyring().get_password(service_name, "last_email")
     if last_email:
         sys.stdout.write(f"Zuletzt verwendet: {last_email}\n")
         sys.stdout.flush()
         response = get_input("Verwenden (Enter) oder neu (n)? ")
         if response.strip().lower() == "":
-            password = keyring.get_password(service_name, last_email)
+            password = _keyring().get_password(service_name, last_email)
             return last_email, password
 
     email = get_input("E-Mail: ")
-    existing_password = keyring.get_password(service_name, email)
+    existing_password = _keyring().get_password(service_name, email)
     if existing_password:
         sys.stdout.write(f"Für {email} ist bereits ein Passwort hinterlegt.\n")
         sys.stdout.flush()
         response = get_input("Vorhandenes Passwort verwenden (Enter) oder neues eingeben (n)? ")
         if response.strip().lower() == "":
-            keyring.set_password(service_name, "last_email", email)
+            _keyring().set_password(service_name, "last_email", email)
             return email, existing_password
 
     password = get_password("Passwort: ")
-    keyring.set_password(service_name, email, password)
-    keyring.set_password(service_name, "last_email", email)
+    _keyring().set_password(service_name, email, password)
+    _keyring().set_password(service_name, "last_email", email)
     return email, password
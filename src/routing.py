@@ -0,0 +1,77 @@
+from urllib.parse import urlparse
+
+from reusables import ts
+
+# Ressourcentypen, die für den Rechnungs-Flow nicht gebraucht werden
+PROFILE = {
+    "aus": set(),
+    "standard": {"image", "font", "media"},
+    "streng": {"image", "font", "media", "stylesheet"},
+}
+
+# Nur diese Domains (inkl. Subdomains) dürfen überhaupt geladen werden
+ERLAUBTE_DOMAINS = ["bahn.de", "static-bahn.de", "db.de"]
+
+# Tracking/Consent-Assets, die auch auf erlaubten Domains geblockt werden
+BLOCKIERTE_MUSTER = [
+    "google-analytics", "googletagmanager", "doubleclick", "adobedtm",
+    "hotjar", "usercentrics", "consentmanager", "onetrust", "cookielaw",
+]
+
+
+class RoutingProfil:
+    """Blockt per context.route alles, was für Liste, Detailseite und PDF nicht nötig ist."""
+
+    def __init__(self, name: str = "standard", base_url: str = None):
+        self.name = name
+        self.blockierte_typen = PROFILE[name]
+        self.erlaubte_domains = list(ERLAUBTE_DOMAINS)
+        if base_url:
+            # z.B. lokaler Testserver
+            self.erlaubte_domains.append(urlparse(base_url).hostname)
+        self.zaehler = {"erlaubt": 0, "blockiert": 0}
+        self.blockiert_nach_grund = {}
+
+    @property
+    def aktiv(self) -> bool:
+        return self.name != "aus"
+
+    def _domain_erlaubt(self, host: str) -> bool:
+        return any(host == d or host.endswith("." + d) for d in self.erlaubte_domains)
+
+    def grund_fuer_block(self, url: str, resource_type: str) -> str | None:
+        """None = erlauben, sonst der Grund für das Blockieren."""
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https"):
+            return None
+        if not self._domain_erlaubt(parsed.hostname or ""):
+            return "fremddomain"
+        if resource_type in self.blockierte_typen:
+            return resource_type
+        if any(muster in url for muster in BLOCKIERTE_MUSTER):
+            return "tracking"
+        return None
+
+    async def _route(self, route):
+        request = route.request
+        grund = self.grund_fuer_block(request.url, request.resource_type)
+        if grund is None:
+            self.zaehler["erlaubt"] += 1
+            await route.fallback()
+        else:
+            self.zaehler["blockiert"] += 1
+            self.blockiert_nach_grund[grund] = self.blockiert_nach_grund.get(grund, 0) + 1
+            await route.abort("blockedbyclient")
+
+    async def installieren(self, context):
+        if not self.aktiv:
+            return
+        await context.route("**/*", self._route)
+        print(f"{ts()} 🚦 Routing-Profil '{self.name}' aktiv")
+
+    def bericht(self) -> str:
+        if not self.aktiv:
+            return "Routing: aus"
+        gruende = ", ".join(f"{k}: {v}" for k, v in sorted(self.blockiert_nach_grund.items()))
+        return (f"Routing '{self.name}': {self.zaehler['erlaubt']} erlaubt | "
+                f"{self.zaehler['blockiert']} blockiert ({gruende or '-'})")
@@ -0,0 +1,180 @@
+"""Zentrales Register der UI-Selektoren.
+
+Für jede Aktion (Cookie-Zustimmung, "Weitere Reisen laden", Rechnung erstellen/PDF)
+gibt es mehrere Kandidaten. Der zuletzt erfolgreiche steht in REGISTER_DATEI und
+wird zuerst probiert - ein einziger Roundtrip statt Durchprobieren mit Timeouts.
+Die Cookie-Zustimmung selbst (Consent-Cookies und localStorage) wird ebenfalls
+gemerkt und in neue Contexts vorbelegt, das Popup erscheint dann gar nicht mehr.
+"""
+import json
+import os
+import weakref
+
+from reusables import ts
+
+REGISTER_DATEI = "selektoren.json"
+
+KANDIDATEN = {
+    "cookie_zustimmen": [
+        "role=button[name='Allow all cookies']",
+        "role=button[name='Alle Cookies zulassen']",
+        "button:has-text('Alle Cookies')",
+        "button:has-text('Allow all')",
+    ],
+    "weitere_reisen": [
+        "button:has(.test-button-label:text('Weitere Reisen laden'))",
+        "button:has(span:text('Weitere Reisen laden'))",
+        ".test-button-label:text('Weitere Reisen laden')",
+        "span.test-button-label >> text=Weitere Reisen laden",
+    ],
+    "rechnung_erstellen": [
+        "button.rechnung-abruf__create-rechnung-button",
+        "button:has-text('Rechnung erstellen')",
+    ],
+    "rechnung_pdf": [
+        "role=button[name='Rechnung als PDF herunterladen']",
+        "button:has-text('Rechnung als PDF')",
+    ],
+}
+
+# Nur Consent-Daten merken, nie Login-Cookies (Teilstrings, klein geschrieben)
+CONSENT_MUSTER = ("consent", "cookie", "uc_", "usercentrics", "cmp", "euconsent", "didomi",
+                  "onetrust", "optanon", "tcf", "gdpr")
+
+
+def _ist_consent(name: str) -> bool:
+    return any(m in name.lower() for m in CONSENT_MUSTER)
+
+
+class SelektorRegister:
+    def __init__(self, pfad: str | None = REGISTER_DATEI):
+        self.pfad = pfad
+        self.gelernt = {}   # name -> selektor
+        self.consent = {"cookies": [], "local_storage": {}}
+        self._gepruefte_contexts = weakref.WeakSet()
+        if pfad and os.path.exists(pfad):
+            try:
+                with open(pfad, encoding="utf-8") as f:
+                    daten = json.load(f)
+                self.gelernt = daten.get("gelernt", {})
+                self.consent = daten.get("consent", self.consent)
+            except (OSError, ValueError):
+                print(f"{ts()} ⚠️ {pfad} unlesbar, Selektoren werden neu gelernt.")
+
+    def speichern(self):
+        if not self.pfad:
+            return
+        zwischen = self.pfad + ".tmp"
+        with open(zwischen, "w", encoding="utf-8") as f:
+            json.dump({"gelernt": self.gelernt, "consent": self.consent}, f, ensure_ascii=False, indent=2)
+        os.replace(zwischen, self.pfad)
+
+    def kandidaten(self, name: str) -> list[str]:
+        """Gelernter Selektor zuerst, dann die übrigen in Prioritätsreihenfolge."""
+        alle = KANDIDATEN[name]
+        gelernt = self.gelernt.get(name)
+        return [gelernt] + [s for s in alle if s != gelernt] if gelernt in alle else list(alle)
+
+    def locator(self, page, name: str):
+        """Ein Locator über alle Kandidaten, z.B. um auf das Erscheinen zu warten."""
+        kandidaten = self.kandidaten(name)
+        kombiniert = page.locator(kandidaten[0])
+        for sel in kandidaten[1:]:
+            kombiniert = kombiniert.or_(page.locator(sel))
+        return kombiniert
+
+    async def finde(self, page, name: str):
+        """Sichtbares Element zur Aktion oder None. Schneller Weg: gelernter Selektor,
+        dann eine gemeinsame Prüfung aller Kandidaten - probiert wird nur, wenn
+        überhaupt etwas sichtbar ist."""
+        kandidaten = self.kandidaten(name)
+        try:
+            if name in self.gelernt:
+                treffer = page.locator(kandidaten[0]).first
+                if await treffer.is_visible():
+                    return treffer
+            if not await self.locator(page, name).first.is_visible():
+                return None
+            for sel in kandidaten:
+                treffer = page.locator(sel).first
+                if await treffer.is_visible():
+                    self.lernen(name, sel)
+                    return treffer
+        except Exception:
+            return None
+        return None
+
+    def lernen(self, name: str, selektor: str):
+        if self.gelernt.get(name) != selektor:
+            self.gelernt[name] = selektor
+            self.speichern()
+
+    # --- Cookie-Zustimmung ---
+
+    @property
+    def consent_bekannt(self) -> bool:
+        return bool(self.consent["cookies"] or self.consent["local_storage"])
+
+    def consent_erledigt(self, context) -> bool:
+        return context in self._gepruefte_contexts
+
+    def context_erledigt(self, context):
+        self._gepruefte_contexts.add(context)
+
+    async def vorbelegen(self, context):
+        """Bekannte Zustimmung in einen neuen Context schreiben (Cookies + Init-Script)."""
+        if not self.consent_bekannt:
+            return
+        if self.consent["cookies"]:
+            await context.add_cookies(self.consent["cookies"])
+        if self.consent["local_storage"]:
+            await context.add_init_script(script="""
+                (eintraege => {
+                    const daten = eintraege[location.origin];
+                    if (!daten) return;
+                    try {
+                        for (const [k, v] of Object.entries(daten)) {
+                            if (localStorage.getItem(k) === null) localStorage.setItem(k, v);
+                        }
+                    } catch (e) {}
+                })(%s)
+            """ % json.dumps(self.consent["local_storage"]))
+
+    async def schnappschuss(self, page) -> dict:
+        cookies = await page.context.cookies()
+        speicher = await page.evaluate("() => ({origin: location.origin, daten: {...localStorage}})")
+        return {"cookies": {(c["name"], c["domain"]): c["value"] for c in cookies}, "speicher": speicher}
+
+    async def consent_lernen(self, page, vorher: dict):
+        """Neue/geänderte Consent-Cookies und -localStorage-Einträge nach dem Klick merken."""
+        nachher_cookies = await page.context.cookies()
+        cookies = [
+            {k: c[k] for k in ("name", "value", "domain", "path", "expires", "httpOnly", "secure", "sameSite") if k in c}
+            for c in nachher_cookies
+            if _ist_consent(c["name"]) and vorher["cookies"].get((c["name"], c["domain"])) != c["value"]
+        ]
+        for c in cookies:
+            if c.get("expires", -1) <= 0:
+                c.pop("expires", None)  # Session-Cookie
+        speicher = await page.evaluate("() => ({origin: location.origin, daten: {...localStorage}})")
+        alt = vorher["speicher"]["daten"] if vorher["speicher"]["origin"] == speicher["origin"] else {}
+        eintraege = {k: v for k, v in speicher["daten"].items() if _ist_consent(k) and alt.get(k) != v}
+        if not cookies and not eintraege:
+            return
+        bekannt = {(c["name"], c["domain"]): c for c in self.consent["cookies"]}
+        bekannt.update({(c["name"], c["domain"]): c for c in cookies})
+        self.consent["cookies"] = list(bekannt.values())
+        if eintraege:
+            self.consent["local_storage"].setdefault(speicher["origin"], {}).update(eintraege)
+        self.speichern()
+        print(f"{ts()} 🍪 Cookie-Zustimmung gemerkt ({len(cookies)} Cookies, {len(eintraege)} localStorage)")
+
+
+_register = None
+
+
+def register() -> SelektorRegister:
+    global _register
+    if _register is None:
+        _register = SelektorRegister()
+    return _register
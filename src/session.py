@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+from urllib.parse import urlparse
+
+import keyring
+from cryptography.fernet import Fernet, InvalidToken
+from playwright.async_api import TimeoutError as PlaywrightTimeout
+
+from reusables import ts
+
+# Verschlüsselte storage_state-Dateien, der Schlüssel liegt im Keyring
+SESSION_DIR = ".sessions"
+REISE_LINK = "a[href*='auftragsnummer=']"
+LOGIN_FORMULAR = "input[name='username'], input[name='password']"
+# So lange auf Reisen oder Login-Formular warten, danach entscheidet die geladene Seite
+SESSION_PROBE_MS = 3000
+
+
+def _session_datei(email: str) -> str:
+    name = hashlib.sha256(email.lower().encode()).hexdigest()[:16]
+    return os.path.join(SESSION_DIR, f"{name}.bin")
+
+
+def _schluessel(service_name: str, email: str, erzeugen: bool = False) -> bytes | None:
+    benutzer = f"session_key:{email}"
+    key = keyring.get_password(service_name, benutzer)
+    if key is None and erzeugen:
+        key = Fernet.generate_key().decode()
+        keyring.set_password(service_name, benutzer, key)
+    return key.encode() if key else None
+
+
+def lade_session(service_name: str, email: str | None) -> dict | None:
+    """Gibt den gespeicherten storage_state für email zurück oder None."""
+    if not email:
+        return None
+    pfad = _session_datei(email)
+    key = _schluessel(service_name, email)
+    if key is None or not os.path.exists(pfad):
+        return None
+    try:
+        with open(pfad, "rb") as f:
+            return json.loads(Fernet(key).decrypt(f.read()))
+    except (InvalidToken, ValueError) as e:
+        print(f"{ts()} ⚠️ Gespeicherte Session unlesbar, wird verworfen: {e}")
+        loesche_session(service_name, email)
+        return None
+
+
+def speichere_session(service_name: str, email: str, storage_state: dict):
+    key = _schluessel(service_name, email, erzeugen=True)
+    os.makedirs(SESSION_DIR, exist_ok=True)
+    pfad = _session_datei(email)
+    tmp = pfad + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(Fernet(key).encrypt(json.dumps(storage_state).encode()))
+    os.replace(tmp, pfad)
+
+
+def loesche_session(service_name: str, email: str):
+    try:
+        os.remove(_session_datei(email))
+    except FileNotFoundError:
+        pass
+
+
+def _ort(url: str) -> tuple[str, str]:
+    teile = urlparse(url)
+    return teile.netloc, teile.path.rstrip("/")
+
+
+async def session_gueltig(page, base_url: str, timeout: int = 15000, probe_ms: int = SESSION_PROBE_MS) -> bool:
+    """Günstiger Check: Reiseübersicht öffnen und schauen, ob Reisen oder das Login-Formular kommen.
+    Ein Konto ohne Reisen zeigt keins von beiden - dann gilt die Session als gültig, wenn die
+    geladene Seite auf der Reiseübersicht geblieben ist und kein Login-Formular zeigt.
+    Die Seite wird danach ohnehin für die Reiseliste gebraucht."""
+    try:
+        await page.goto(base_url, wait_until="domcontentloaded", timeout=timeout)
+        try:
+            el = await page.wait_for_selector(f"{REISE_LINK}, {LOGIN_FORMULAR}", timeout=probe_ms)
+            return await el.get_attribute("name") not in ("username", "password")
+        except PlaywrightTimeout:
+            pass
+        # Abgelaufene Sessions leitet die Seite spätestens nach dem Laden zum Login um
+        await page.wait_for_load_state("load", timeout=timeout)
+        if _ort(page.url) != _ort(base_url):
+            return False
+        return await page.locator(LOGIN_FORMULAR).count() == 0
+    except Exception as e:
+        print(f"{ts()} ⚠️ Session-Check fehlgeschlagen: {e}")
+        return False
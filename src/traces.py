@@ -0,0 +1,152 @@
+"""Playwright-Trace als Ringpuffer für die Fehlersuche nach dem Lauf.
+
+Der Context zeichnet durchgehend auf (Screenshots, DOM-Snapshots, Netzwerk, Timings),
+alle paar Reisen wird ein Chunk abgeschlossen. Behalten werden nur die letzten
+TEILE Chunks - zusammen etwa die letzten REISEN Reisen. Scheitert eine Reise oder
+dauert sie länger als BUDGET_S, wird der Ring sofort abgeschlossen und nach
+ORDNER/<Auftragsnummer>_<Zeit>_<n>.zip kopiert:
+
+    playwright show-trace traces/706855677982_20250101-120000_2.zip
+
+Der Bericht zeigt, was die Aufzeichnung kostet (Zeit für das Wegschreiben der
+Chunks im Verhältnis zur Reisezeit, Größe auf der Platte).
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import weakref
+from collections import Counter, deque
+
+from metrics import messe
+from reusables import ts
+
+REISEN = 0             # Reisen im Ring, 0 = aus
+TEILE = 2              # abgeschlossene Chunks im Ring
+BUDGET_S = 60.0        # Reisen darüber werden gesichert, 0 = nur Fehler
+ORDNER = "traces"
+MAX_SICHERUNGEN = 50   # Obergrenze je Lauf, damit ein kaputter Lauf nicht die Platte füllt
+
+statistik = Counter()  # Über alle Contexts des Laufs, für den Bericht
+_ringe = weakref.WeakKeyDictionary()
+
+
+def konfigurieren(reisen: int = None, budget_s: float = None, ordner: str = None):
+    global REISEN, BUDGET_S, ORDNER
+    if reisen is not None:
+        REISEN = reisen
+    if budget_s is not None:
+        BUDGET_S = budget_s
+    if ordner is not None:
+        ORDNER = ordner
+
+
+def aktiv() -> bool:
+    return REISEN > 0
+
+
+async def starten(context):
+    """Tracing im Context einschalten, falls konfiguriert."""
+    if not aktiv():
+        return
+    ring = TraceRing(context)
+    with messe("trace.start"):
+        start = time.perf_counter()
+        await context.tracing.start(screenshots=True, snapshots=True, title="Ring")
+        statistik["aufwand_ms"] += (time.perf_counter() - start) * 1000
+    _ringe[context] = ring
+
+
+async def nach_reise(context, auftragsnummer: str, dauer_s: float, fehler: str | None = None):
+    """Nach jeder Reise aufrufen (auch bei Fehlern). Ohne Tracing ein No-op."""
+    ring = _ringe.get(context)
+    if ring is not None:
+        await ring.nach_reise(auftragsnummer, dauer_s, fehler)
+
+
+async def beenden(context):
+    """Aufzeichnung verwerfen und temporäre Chunks löschen (vor context.close())."""
+    ring = _ringe.pop(context, None)
+    if ring is not None:
+        await ring.beenden()
+
+
+def bericht() -> str:
+    if not statistik["reisen"]:
+        return "Tracing: aus" if not aktiv() else "Tracing: keine Reisen"
+    anteil = statistik["aufwand_ms"] / 1000 / max(statistik["reise_s"], 1e-9) * 100
+    return (f"Tracing: {statistik['gesichert']} Traces gesichert ({statistik['fehler']} Fehler, "
+            f"{statistik['langsam']} langsam) | {statistik['chunks']} Chunks, "
+            f"{statistik['bytes'] / 1024 / 1024:.1f} MB, Aufwand {statistik['aufwand_ms'] / 1000:.1f} s "
+            f"= {anteil:.1f} % der Reisezeit")
+
+
+class TraceRing:
+    """Rollierende Trace-Chunks eines Contexts. Die Worker teilen sich den Context,
+    deshalb enthält ein Chunk die Reisen aller Worker dieses Zeitraums."""
+
+    def __init__(self, context):
+        self.context = context
+        self.je_chunk = max(1, -(-REISEN // TEILE))
+        self.teile = deque()              # (pfad, Auftragsnummern) abgeschlossener Chunks
+        self.laufend = []                 # Auftragsnummern im offenen Chunk
+        self.nr = 0
+        self.lock = asyncio.Lock()
+        self.tmp = tempfile.mkdtemp(prefix="trace_ring_")
+
+    async def nach_reise(self, auftragsnummer: str, dauer_s: float, fehler: str | None):
+        statistik["reisen"] += 1
+        statistik["reise_s"] += dauer_s
+        langsam = bool(BUDGET_S) and dauer_s > BUDGET_S
+        async with self.lock:
+            self.laufend.append(auftragsnummer)
+            sichern = (fehler is not None or langsam) and statistik["gesichert"] < MAX_SICHERUNGEN
+            if sichern or len(self.laufend) >= self.je_chunk:
+                await self._rotieren()
+            if sichern:
+                statistik["fehler" if fehler is not None else "langsam"] += 1
+                self._sichern(auftragsnummer, fehler or f"{dauer_s:.0f}s")
+
+    async def _rotieren(self):
+        """Offenen Chunk abschließen, älteste aus dem Ring werfen, neuen beginnen."""
+        self.nr += 1
+        pfad = os.path.join(self.tmp, f"teil_{self.nr}.zip")
+        with messe("trace.chunk", reisen=len(self.laufend)):
+            start = time.perf_counter()
+            try:
+                await self.context.tracing.stop_chunk(path=pfad)
+                await self.context.tracing.start_chunk(title=f"Ring {self.nr + 1}")
+            except Exception as e:
+                print(f"{ts()} ⚠️ Trace-Chunk fehlgeschlagen: {e}")
+                return
+            finally:
+                statistik["aufwand_ms"] += (time.perf_counter() - start) * 1000
+        statistik["chunks"] += 1
+        statistik["bytes"] += os.path.getsize(pfad) if os.path.exists(pfad) else 0
+        self.teile.append((pfad, self.laufend))
+        self.laufend = []
+        while len(self.teile) > TEILE:
+            alt, _ = self.teile.popleft()
+            try:
+                os.remove(alt)
+            except OSError:
+                pass
+
+    def _sichern(self, auftragsnummer: str, grund: str):
+        os.makedirs(ORDNER, exist_ok=True)
+        zeit = time.strftime("%Y%m%d-%H%M%S")
+        for n, (pfad, _) in enumerate(self.teile, start=1):
+            if os.path.exists(pfad):
+                shutil.copyfile(pfad, os.path.join(ORDNER, f"{auftragsnummer}_{zeit}_{n}.zip"))
+        statistik["gesichert"] += 1
+        reisen = sum(len(nummern) for _, nummern in self.teile)
+        print(f"{ts()} 🎞️  Trace für {auftragsnummer} gesichert ({grund}, {len(self.teile)} Teile, "
+              f"{reisen} Reisen) -> {ORDNER}/")
+
+    async def beenden(self):
+        try:
+            await self.context.tracing.stop()
+        except Exception:
+            pass
+        shutil.rmtree(self.tmp, ignore_errors=True)
@@ -0,0 +1,193 @@
+"""Dauerbetrieb: ein eingeloggter Browser bleibt offen und gleicht in festen Abständen
+nur den neuesten Teil der Reiseliste ab.
+
+    python watch.py --intervall 10 --status-port 8765
+
+Status steht nach jedem Zyklus in STATUS_DATEI und (optional) unter
+http://127.0.0.1:<port>/status als JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from playwright.async_api import async_playwright
+
+import DBahnRechnungsexport as export
+import belege
+import drossel
+import metrics
+import readiness
+from einstellungen import WATCH_INTERVALL_MIN, WATCH_WORKER
+from reusables import get_last_email, get_saved_password, ts
+from session import lade_session, session_gueltig, speichere_session
+
+STATUS_DATEI = "watch_status.json"
+
+
+class WatchStatus:
+    """Zustand des Dauerbetriebs, wird als JSON-Datei und über HTTP ausgeliefert."""
+
+    def __init__(self, pfad: str | None = STATUS_DATEI):
+        self.pfad = pfad
+        self._lock = threading.Lock()
+        self.daten = {
+            "zustand": "startet", "gestartet": _jetzt(), "konto": None,
+            "zyklen": 0, "neu_gesamt": 0, "fehler_gesamt": 0, "anmeldungen": 0,
+            "letzter_zyklus": None, "letzte_dauer_s": None, "naechster_zyklus": None,
+            "letzte_stats": None, "letzter_fehler": None,
+        }
+
+    def setzen(self, **werte):
+        with self._lock:
+            self.daten.update(werte)
+            daten = dict(self.daten)
+        if self.pfad:
+            zwischen = self.pfad + ".tmp"
+            with open(zwischen, "w", encoding="utf-8") as f:
+                json.dump(daten, f, ensure_ascii=False, indent=2)
+            os.replace(zwischen, self.pfad)
+
+    def als_json(self) -> bytes:
+        with self._lock:
+            return json.dumps(self.daten, ensure_ascii=False).encode("utf-8")
+
+
+def _jetzt() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def starte_status_server(status: WatchStatus, port: int) -> ThreadingHTTPServer:
+    """Lokaler Status-Endpunkt (nur 127.0.0.1) in einem Hintergrund-Thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("", "/status"):
+                self.send_error(404)
+                return
+            body = status.als_json()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"{ts()} 🩺 Status unter http://127.0.0.1:{server.server_address[1]}/status")
+    return server
+
+
+async def run_watch(intervall_min: float = WATCH_INTERVALL_MIN, workers: int = WATCH_WORKER,
+                    zugangsdaten: tuple[str, str] | None = None, download_dir: str = export.DOWNLOAD_DIR,
+                    routing_profil: str = export.ROUTING_PROFIL, api_modus: bool = False,
+                    listen_modus: str = export.LISTEN_MODUS, status_datei: str | None = STATUS_DATEI,
+                    status_port: int | None = None, headless: bool = True, max_zyklen: int | None = None,
+                    metrik_datei: str | None = None):
+    """Browser, Context, Login und Worker-Seiten bleiben über alle Zyklen warm. Der erste
+    Zyklus gleicht die ganze Liste ab, danach nur bis zur ersten bekannten Reise.
+    Gibt False zurück, wenn schon die erste Anmeldung scheitert."""
+    status = WatchStatus(status_datei)
+    server = starte_status_server(status, status_port) if status_port is not None else None
+    metrics.starten(metrik_datei)
+    email = zugangsdaten[0] if zugangsdaten else get_last_email(export.SERVICE_NAME)
+    storage_state = lade_session(export.SERVICE_NAME, email)
+    drossel.starten(workers)
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=headless, slow_mo=readiness.slow_mo())
+        context, routing, api = await export.konto_context(browser, storage_state, routing_profil, api_modus)
+        page = await context.new_page()
+        email = await export.anmelden(context, page, email, zugangsdaten, storage_state)
+        if email is None:
+            status.setzen(zustand="login_fehlgeschlagen")
+            await browser.close()
+            return False
+        status.setzen(zustand="bereit", konto=email, anmeldungen=1)
+        manifest = export.oeffne_manifest(download_dir)
+        pages = [await context.new_page() for _ in range(max(1, workers))]
+        zyklus = 0
+
+        try:
+            while max_zyklen is None or zyklus < max_zyklen:
+                zyklus += 1
+                start = time.perf_counter()
+                status.setzen(zustand="synchronisiert", naechster_zyklus=None)
+                try:
+                    # Abgelaufene Session transparent erneuern, ohne Rückfrage
+                    if zyklus > 1 and not await session_gueltig(page, export.BASE_URL):
+                        print(f"{ts()} 🔑 Session abgelaufen, melde neu an...")
+                        await context.clear_cookies()
+                        password = (zugangsdaten[1] if zugangsdaten
+                                    else get_saved_password(export.SERVICE_NAME, email))
+                        if not password or not await export.login_to_bahn(page, email, password):
+                            raise RuntimeError("Erneute Anmeldung fehlgeschlagen")
+                        speichere_session(export.SERVICE_NAME, email, await context.storage_state())
+                        status.setzen(anmeldungen=status.daten["anmeldungen"] + 1)
+
+                    lauf = await export.synchronisieren(page, pages, export.Lauf(manifest, download_dir, api=api),
+                                                        listen_modus=listen_modus, nur_neue=zyklus > 1)
+                    stats, planer = lauf.stats, lauf.planer
+                    dauer = time.perf_counter() - start
+                    print(f"{ts()} 🔄 Zyklus {zyklus}: Neu: {stats['neu']} | Fehler: {stats['fehler']} "
+                          f"| {dauer:.1f} s | {planer.bericht()} | {drossel.bericht()}")
+                    status.setzen(zyklen=zyklus, letzter_zyklus=_jetzt(), letzte_dauer_s=round(dauer, 1),
+                                  letzte_stats=stats, neu_gesamt=status.daten["neu_gesamt"] + stats["neu"],
+                                  fehler_gesamt=status.daten["fehler_gesamt"] + stats["fehler"])
+                except Exception as e:
+                    # Ein kaputter Zyklus beendet den Dienst nicht, nächster Versuch im Intervall
+                    print(f"{ts()} ✗ Zyklus {zyklus} fehlgeschlagen: {e}")
+                    status.setzen(zyklen=zyklus, letzter_fehler=f"{_jetzt()}: {e}")
+
+                if max_zyklen is not None and zyklus >= max_zyklen:
+                    break
+                naechster = datetime.now() + timedelta(minutes=intervall_min)
+                status.setzen(zustand="wartet", naechster_zyklus=naechster.isoformat(timespec="seconds"))
+                await asyncio.sleep(intervall_min * 60)
+        finally:
+            status.setzen(zustand="beendet")
+            print(f"{ts()} 🚦 {routing.bericht()}")
+            print(f"{ts()} 🐢 {drossel.bericht()}")
+            metrics.drucke_zusammenfassung()
+            metrics.aktiv().close()
+            manifest.close()
+            speichere_session(export.SERVICE_NAME, email, await context.storage_state())
+            belege.pool_beenden()
+            await browser.close()
+            if server is not None:
+                server.shutdown()
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DB Rechnungsexport im Dauerbetrieb")
+    parser.add_argument("--intervall", type=float, default=WATCH_INTERVALL_MIN,
+                        help=f"Minuten zwischen zwei Abgleichen (Standard: {WATCH_INTERVALL_MIN})")
+    parser.add_argument("--workers", type=int, default=WATCH_WORKER)
+    parser.add_argument("--status-datei", default=STATUS_DATEI)
+    parser.add_argument("--status-port", type=int, default=None,
+                        help="Lokalen HTTP-Status-Endpunkt auf 127.0.0.1:<port> starten")
+    parser.add_argument("--sichtbar", action="store_true", help="Browserfenster anzeigen")
+    parser.add_argument("--api", action="store_true")
+    parser.add_argument("--liste", choices=["netz", "dom"], default=export.LISTEN_MODUS)
+    parser.add_argument("--routing", default=export.ROUTING_PROFIL)
+    parser.add_argument("--metriken", metavar="DATEI", default=None)
+    args = parser.parse_args()
+    try:
+        angemeldet = asyncio.run(run_watch(args.intervall, args.workers, status_datei=args.status_datei,
+                                           status_port=args.status_port, headless=not args.sichtbar,
+                                           api_modus=args.api, listen_modus=args.liste,
+                                           routing_profil=args.routing, metrik_datei=args.metriken))
+    except KeyboardInterrupt:
+        print(f"{ts()} 👋 Dauerbetrieb beendet.")
+    else:
+        if not angemeldet:
+            sys.exit(1)
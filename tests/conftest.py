@@ -0,0 +1,21 @@
+import os
+import sys
+
+# Die Module liegen flach in src/ und importieren sich gegenseitig ohne Paket
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def chromium():
+    """Überspringt Browser-Tests, wenn Playwright oder sein Chromium fehlen
+    (playwright install chromium)."""
+    try:
+        from playwright.sync_api import sync_playwright
+        with sync_playwright() as p:
+            pfad = p.chromium.executable_path
+    except Exception as e:
+        pytest.skip(f"Playwright nicht verfügbar: {e}")
+    if not os.path.exists(pfad):
+        pytest.skip("Chromium für Playwright nicht installiert")
@@ -0,0 +1,143 @@
+import os
+import time
+
+import pytest
+
+import ablage
+
+ALT = time.time() - ablage.TEMP_MIN_ALTER_S - 60
+
+
+def arbeitsdatei(pfad, alt=False):
+    pfad.parent.mkdir(parents=True, exist_ok=True)
+    pfad.write_bytes(b"%PDF-1.4 halb")
+    if alt:
+        os.utime(pfad, (ALT, ALT))
+    return pfad
+
+
+def test_pruefen_ohne_reparieren_loescht_nichts(tmp_path):
+    laufend = arbeitsdatei(tmp_path / "RG_0001_x.pdf.part", alt=True)
+
+    ergebnis = ablage.pruefen(str(tmp_path))
+
+    assert laufend.exists()
+    assert ergebnis["temp_entfernt"] == 0
+
+
+def test_reparieren_entfernt_nur_alte_arbeitsdateien(tmp_path):
+    alt = arbeitsdatei(tmp_path / "RG_0001_x.pdf.part", alt=True)
+    laufend = arbeitsdatei(tmp_path / "RG_0002_y.pdf.part")
+    alt_im_lager = arbeitsdatei(tmp_path / ablage.OBJEKT_DIR / "ab" / "ab12.pdf.tmp", alt=True)
+
+    ergebnis = ablage.pruefen(str(tmp_path), reparieren=True)
+
+    assert ergebnis["temp_entfernt"] == 2
+    assert not alt.exists() and not alt_im_lager.exists()
+    assert laufend.exists()
+
+
+def test_aufraeumen_laesst_andere_konten_in_ruhe(tmp_path):
+    # Batch: DOWNLOAD_DIR/<konto>, ein Konto räumt beim Start nur seinen eigenen Ordner auf
+    fremd = arbeitsdatei(tmp_path / "b@example.org" / "RG_0001_x.pdf.part", alt=True)
+    eigen = arbeitsdatei(tmp_path / "RG_0001_x.pdf.part", alt=True)
+
+    assert ablage.aufraeumen(str(tmp_path)) == 1
+
+    assert fremd.exists()
+    assert not eigen.exists()
+
+
+PDF = b"%PDF-1.4\n" + b"0" * 100 + b"\n%%EOF\n"
+
+
+def download(pfad, inhalt=PDF):
+    quelle = ablage.temp_pfad(str(pfad))
+    ablage.schreiben(quelle, inhalt)
+    return quelle
+
+
+@pytest.mark.parametrize("inhalt, grund", [
+    (PDF[:-8] + b"0" * 64, "abgeschnitten"),
+    (b"<!DOCTYPE html><html><body>Wartungsarbeiten</body></html>" + b" " * 64, "HTML-Seite"),
+    (b"%PDF-1.4", "zu klein"),
+])
+def test_ablegen_weist_kaputte_downloads_ab(tmp_path, inhalt, grund):
+    ziel = tmp_path / "RG_0001_x.pdf"
+    quelle = download(ziel, inhalt)
+
+    with pytest.raises(ablage.AblageFehler, match=grund):
+        ablage.ablegen(quelle, str(ziel))
+
+    assert not os.path.exists(quelle)
+    assert not ziel.exists()
+    assert not (tmp_path / ablage.OBJEKT_DIR).exists()
+
+
+def test_gleicher_inhalt_wird_einmal_gespeichert(tmp_path):
+    erste, zweite = tmp_path / "RG_0001_x.pdf", tmp_path / "RG_0002_x.pdf"
+
+    sha256 = ablage.ablegen(download(erste), str(erste))
+    assert ablage.ablegen(download(zweite), str(zweite)) == sha256
+
+    objekte = [n for _, _, ns in os.walk(tmp_path / ablage.OBJEKT_DIR) for n in ns]
+    assert objekte == [sha256 + ".pdf"]
+    assert os.path.samefile(erste, zweite)
+    assert erste.read_bytes() == PDF
+    assert not list(tmp_path.glob("*.part")) and not list(tmp_path.glob("*.tmp"))
+
+
+def test_verlinken_ersetzt_vorhandenes_ziel(tmp_path):
+    objekt = tmp_path / "objekt.pdf"
+    objekt.write_bytes(PDF)
+    ziel = tmp_path / "RG_0001_x.pdf"
+    ziel.write_bytes(b"alt")
+
+    assert ablage.verlinken(str(objekt), str(ziel)) in ("hardlink", "symlink", "kopie")
+
+    assert ziel.read_bytes() == PDF
+    assert not (tmp_path / "RG_0001_x.pdf.tmp").exists()
+
+
+def test_pruefen_meldet_verwaisten_link(tmp_path):
+    ziel = tmp_path / "RG_0001_x.pdf"
+    ablage.ablegen(download(ziel), str(ziel))
+    verwaist = tmp_path / "RG_0002_y.pdf"
+    verwaist.symlink_to(tmp_path / ablage.OBJEKT_DIR / "00" / "fehlt.pdf")
+
+    ergebnis = ablage.pruefen(str(tmp_path))
+
+    assert ergebnis["namen_ok"] == 1
+    assert ergebnis["namen_kaputt"] == 1
+    assert os.path.islink(verwaist)  # nur gemeldet, nicht entfernt
+
+
+def test_defektes_objekt_kommt_in_quarantaene(tmp_path):
+    ziel = tmp_path / "RG_0001_x.pdf"
+    sha256 = ablage.ablegen(download(ziel), str(ziel))
+    objekt = ablage.objekt_pfad(str(tmp_path), sha256)
+    with open(objekt, "r+b") as f:  # Bitfehler: Inhalt passt nicht mehr zum Hash
+        f.seek(20)
+        f.write(b"1")
+
+    assert ablage.pruefen(str(tmp_path))["objekte_defekt"] == 1
+    assert os.path.exists(objekt)  # ohne reparieren unverändert
+
+    ergebnis = ablage.pruefen(str(tmp_path), reparieren=True)
+
+    assert ergebnis["objekte_defekt"] == 1
+    assert not os.path.exists(objekt)
+    assert (tmp_path / ablage.DEFEKT_DIR / (sha256 + ".pdf")).exists()
+    assert ablage.pruefen(str(tmp_path))["objekte_defekt"] == 0
+
+
+def test_reparieren_uebernimmt_altbestand(tmp_path):
+    alt = tmp_path / "RG_0001_x.pdf"
+    alt.write_bytes(PDF)
+
+    assert ablage.pruefen(str(tmp_path))["namen_altbestand"] == 1
+    assert ablage.pruefen(str(tmp_path), reparieren=True)["uebernommen"] == 1
+
+    ergebnis = ablage.pruefen(str(tmp_path))
+    assert ergebnis["namen_ok"] == 1
+    assert ergebnis["objekte"] == 1 and ergebnis["verwaist"] == 0
@@ -0,0 +1,89 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+import api_download
+from api_download import RechnungsApi
+
+SCHRITTE = [{"methode": "GET", "url": "https://portal.example/rechnung/{auftragsnummer}/pdf",
+             "daten": None, "header": {}}]
+
+
+class FakeAntwort:
+    def __init__(self, status, body=b""):
+        self.status = status
+        self.ok = 200 <= status < 300
+        self.url = "https://portal.example/rechnung/1/pdf"
+        self.headers = {"content-disposition": 'attachment; filename="DB_Rechnung_1.pdf"'}
+        self._body = body
+
+    async def body(self):
+        return self._body
+
+
+class FakeRequestContext:
+    def __init__(self, *ergebnisse):
+        self.ergebnisse = list(ergebnisse)
+
+    async def fetch(self, url, **kwargs):
+        ergebnis = self.ergebnisse.pop(0)
+        if isinstance(ergebnis, Exception):
+            raise ergebnis
+        return ergebnis
+
+
+class FakeBeobachtung:
+    def __init__(self, schritte):
+        self.schritte = schritte
+
+    def ergebnis(self):
+        return self.schritte
+
+
+@pytest.fixture
+def api(tmp_path):
+    pfad = tmp_path / "rechnung_api.json"
+    pfad.write_text(json.dumps(SCHRITTE), encoding="utf-8")
+    return RechnungsApi(str(pfad))
+
+
+def test_veraltete_vorlage_wird_nach_fehlerserie_verworfen(api):
+    anfragen = FakeRequestContext(*[FakeAntwort(404)] * api_download.API_MAX_FEHLER)
+    for _ in range(api_download.API_MAX_FEHLER):
+        assert asyncio.run(api.lade_pdf(anfragen, "1")) is None
+
+    assert not api.gelernt
+    assert not os.path.exists(api.pfad)
+
+
+def test_erfolg_setzt_fehlerserie_zurueck(api):
+    anfragen = FakeRequestContext(FakeAntwort(500), FakeAntwort(200, b"%PDF-1.4"), FakeAntwort(500),
+                                  FakeAntwort(500))
+    for _ in range(4):
+        asyncio.run(api.lade_pdf(anfragen, "1"))
+
+    assert api.gelernt
+    assert api.fehlerserie == 2
+
+
+def test_ui_download_ersetzt_scheiternde_vorlage(api):
+    asyncio.run(api.lade_pdf(FakeRequestContext(FakeAntwort(404)), "1"))
+    neu = [{**SCHRITTE[0], "url": "https://portal.example/v2/rechnung/{auftragsnummer}"}]
+
+    # Gleich lang wie die alte Folge, ersetzt sie aber, weil die alte gerade scheitert
+    api.lerne(FakeBeobachtung(neu))
+
+    assert api.schritte == neu
+    assert json.loads(open(api.pfad, encoding="utf-8").read()) == neu
+
+
+def test_timeouts_gehen_an_den_aufrufer(api):
+    class TimeoutError(Exception):
+        pass
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(api.lade_pdf(FakeRequestContext(TimeoutError("Timeout 30000ms exceeded")), "1"))
+    assert api.gelernt
+    assert api.fehlerserie == 0
@@ -0,0 +1,22 @@
+from belege import parse_text
+
+
+def test_rechnungsdatum_vor_anderen_daten():
+    text = "Reisedatum: 01.03.2025 / Rechnungsdatum: 15.02.2025"
+    assert parse_text(text)["rechnungsdatum"] == "2025-02-15"
+
+
+def test_zusammengesetzte_datumsangaben_zaehlen_nicht():
+    assert parse_text("Buchungsdatum: 03.01.2025\nDatum: 05.01.2025")["rechnungsdatum"] == "2025-01-05"
+    assert parse_text("Buchungsdatum: 03.01.2025")["rechnungsdatum"] == ""
+
+
+def test_unmoegliches_datum_verwirft_die_datei_nicht():
+    daten = parse_text("Rechnungsdatum: 31.02.2025\nRechnungsnummer: 123456789\nGesamtbetrag: 12,30 €")
+    assert daten["rechnungsdatum"] == ""
+    assert daten["rechnungsnummer"] == "123456789"
+    assert daten["brutto"] == 12.3
+
+
+def test_naechstes_gueltiges_datum_nach_unmoeglichem():
+    assert parse_text("Rechnungsdatum: 31.02.2025\nDatum: 28.02.2025")["rechnungsdatum"] == "2025-02-28"
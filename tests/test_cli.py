@@ -0,0 +1,129 @@
+import json
+
+import pytest
+
+import cli
+from manifest import SyncManifest, manifest_pfad
+
+PDF = b"%PDF-1.4\n" + b"0" * 100 + b"\n%%EOF\n"
+
+
+@pytest.fixture
+def archiv(tmp_path):
+    """Archiv mit zwei Rechnungen, von denen eine auf der Platte fehlt."""
+    ordner = tmp_path / "rechnungen"
+    ordner.mkdir()
+    manifest = SyncManifest(manifest_pfad(str(ordner)))
+    for auftrag in ("111", "222"):
+        pfad = ordner / f"RG_2024-{auftrag}_Muster.pdf"
+        pfad.write_bytes(PDF)
+        manifest.eintragen(auftrag, str(pfad), "9" + auftrag)
+    manifest.beleg_speichern(manifest.eintrag("111")["sha256"], {"brutto": 12.5})
+    manifest.close()
+    (ordner / "RG_2024-222_Muster.pdf").unlink()
+    return str(ordner)
+
+
+@pytest.fixture
+def sync(monkeypatch):
+    """befehl_sync ohne Browser: run_download/run_batch liefern vorgegebene stats."""
+    import DBahnRechnungsexport as export
+
+    aufrufe = {}
+    monkeypatch.setattr(export, "DOWNLOAD_DIR", export.DOWNLOAD_DIR)
+    monkeypatch.setattr(cli, "zugangsdaten_ohne_rueckfrage", lambda: ("a@example.org", "geheim"))
+    monkeypatch.setattr(export.readiness, "setze_feste_wartezeiten", lambda *a: None)
+    monkeypatch.setattr(export.drossel, "konfigurieren", lambda **kw: None)
+    monkeypatch.setattr(export.recycling, "konfigurieren", lambda **kw: aufrufe.update(recycling=kw))
+    monkeypatch.setattr(export.traces, "konfigurieren", lambda **kw: aufrufe.update(traces=kw))
+
+    def ergebnis(stats):
+        async def run_download(**kw):
+            aufrufe["run_download"] = kw
+            return stats
+
+        async def run_batch(emails, **kw):
+            aufrufe["run_batch"] = kw
+            return {email: stats for email in emails[1:]}
+
+        monkeypatch.setattr(export, "run_download", run_download)
+        monkeypatch.setattr(export, "run_batch", run_batch)
+        return aufrufe
+
+    return ergebnis
+
+
+def stats(**abweichend):
+    return {"neu": 1, "vorhanden": 0, "fehler": 0, "unerledigt": 0, "abgebrochen": 0,
+            "liste_unvollstaendig": False, **abweichend}
+
+
+@pytest.mark.parametrize("ergebnis, code", [
+    (stats(), 0),
+    (stats(fehler=2), 0),  # per Retry behoben
+    (stats(unerledigt=1), 1),
+    (stats(abgebrochen=1), 1),
+    (stats(liste_unvollstaendig=True), 1),
+    (None, 1),  # Login gescheitert
+])
+def test_sync_exit_code(sync, ergebnis, code, tmp_path):
+    sync(ergebnis)
+    assert cli.main(["--ordner", str(tmp_path), "sync"]) == code
+
+
+def test_sync_reicht_optionen_durch(sync, tmp_path):
+    aufrufe = sync(stats())
+    assert cli.main(["--ordner", str(tmp_path), "sync", "--max-heap", "200", "--trace-budget", "30",
+                     "--har-aufnahme", "lauf.har"]) == 0
+    assert aufrufe["recycling"] == {"nach_reisen": None, "heap_mb": 200.0, "knoten": None}
+    assert aufrufe["traces"] == {"reisen": None, "budget_s": 30.0}
+    assert aufrufe["run_download"]["har_aufnahme"] == "lauf.har"
+    assert aufrufe["run_download"]["workers"] == cli.WORKER_ANZAHL
+
+
+def test_sync_batch_fehlendes_konto_ist_fehler(sync, tmp_path):
+    sync(stats())
+    # run_batch liefert für das erste Konto nichts (kein Passwort/Login gescheitert)
+    assert cli.main(["--ordner", str(tmp_path), "sync", "--konten", "a@x", "b@x"]) == 1
+
+
+def test_sync_ohne_zugangsdaten(monkeypatch, tmp_path):
+    monkeypatch.setattr(cli, "zugangsdaten_ohne_rueckfrage", lambda: None)
+    assert cli.main(["--ordner", str(tmp_path), "sync"]) == 2
+
+
+def test_sync_har_nicht_im_batch(sync, tmp_path):
+    aufrufe = sync(stats())
+    assert cli.main(["--ordner", str(tmp_path), "sync", "--konten", "a@x", "--har-aufnahme", "x.har"]) == 2
+    assert "run_batch" not in aufrufe
+
+
+@pytest.mark.parametrize("befehl", ["list", "stats"])
+def test_ohne_archiv(befehl, tmp_path):
+    assert cli.main(["--ordner", str(tmp_path / "fehlt"), befehl]) == 2
+    assert not (tmp_path / "fehlt_manifest.sqlite").exists()
+
+
+def test_list_json(archiv, capsys):
+    assert cli.main(["--ordner", archiv, "list", "--json"]) == 0
+    eintraege = json.loads(capsys.readouterr().out)
+    assert [(e["auftragsnummer"], e["rechnungsnr"], e["vorhanden"]) for e in eintraege] == [
+        ("111", "9111", True), ("222", "9222", False)]
+
+
+def test_list_text(archiv, capsys):
+    assert cli.main(["--ordner", archiv, "list"]) == 0
+    ausgabe = capsys.readouterr().out
+    assert "2 Rechnungen im Archiv, 1 Dateien fehlen" in ausgabe
+    assert "✗ 222" in ausgabe
+
+
+def test_stats_json(archiv, capsys):
+    assert cli.main(["--ordner", archiv, "stats", "--json"]) == 0
+    daten = json.loads(capsys.readouterr().out)
+    assert daten["rechnungen"] == 2
+    assert daten["dateien_fehlen"] == 1
+    assert daten["eindeutige_pdfs"] == 1  # gleicher Inhalt
+    assert daten["ausgelesen"] == 1
+    assert daten["brutto_summe"] == 12.5
+    assert sum(daten["exporte_je_monat"].values()) == 2
@@ -0,0 +1,29 @@
+import asyncio
+import time
+
+import drossel
+
+
+def gleichzeitig(*arten, dauer_s=0.2):
+    async def zugriff(art):
+        async with drossel.takt(art):
+            await asyncio.sleep(dauer_s)
+
+    async def alle():
+        start = time.monotonic()
+        await asyncio.gather(*(zugriff(art) for art in arten))
+        return time.monotonic() - start
+
+    return asyncio.run(alle())
+
+
+def test_liste_belegt_keinen_platz():
+    drossel.starten(1)
+    # Ein Worker: Liste und Download laufen trotzdem parallel
+    assert gleichzeitig("download", "liste") < 0.35
+    assert drossel.drossel().laufend == 0
+
+
+def test_downloads_bleiben_begrenzt():
+    drossel.starten(1)
+    assert gleichzeitig("download", "download") >= 0.4
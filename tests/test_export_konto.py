@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+import DBahnRechnungsexport as export
+
+
+class FakeContext:
+    def __init__(self):
+        self.geschlossen = False
+
+    async def new_page(self):
+        return object()
+
+    async def close(self):
+        self.geschlossen = True
+
+
+@pytest.fixture
+def konto(monkeypatch, tmp_path):
+    context = FakeContext()
+    abgeschlossen = []
+
+    async def konto_context(*args, **kwargs):
+        return context, None, None
+
+    async def anmelden(context, page, email, *args):
+        return email
+
+    monkeypatch.setattr(export, "konto_context", konto_context)
+    monkeypatch.setattr(export, "anmelden", anmelden)
+    monkeypatch.setattr(export.har, "abschliessen", lambda pfad, *a: abgeschlossen.append(pfad))
+    return context, abgeschlossen
+
+
+def test_fehler_nach_login_schliesst_context_und_schwaerzt(konto, monkeypatch, tmp_path):
+    context, abgeschlossen = konto
+
+    def kaputt(download_dir):
+        raise OSError("Platte voll")
+
+    monkeypatch.setattr(export, "oeffne_manifest", kaputt)
+    aufnahme = str(tmp_path / "lauf.har")
+
+    with pytest.raises(OSError):
+        asyncio.run(export.export_konto(None, ("a@example.org", "geheim"), str(tmp_path),
+                                        session_nutzen=False, har_aufnahme=aufnahme))
+
+    assert context.geschlossen
+    assert abgeschlossen == [aufnahme]
+
+
+def test_gescheiterter_login_schliesst_context(konto, monkeypatch, tmp_path):
+    context, abgeschlossen = konto
+
+    async def anmelden(*args):
+        return None
+
+    monkeypatch.setattr(export, "anmelden", anmelden)
+
+    assert asyncio.run(export.export_konto(None, ("a@example.org", "x"), str(tmp_path),
+                                           session_nutzen=False, har_aufnahme="x.har")) is None
+    assert context.geschlossen
+    assert abgeschlossen == ["x.har"]
+
+
+def test_fehler_im_abgleich_schliesst_manifest(konto, monkeypatch, tmp_path):
+    context, _ = konto
+    geschlossen = []
+
+    class FakeManifest:
+        def close(self):
+            geschlossen.append(True)
+
+    async def kaputt(*args, **kwargs):
+        raise RuntimeError("Portal weg")
+
+    monkeypatch.setattr(export, "oeffne_manifest", lambda download_dir: FakeManifest())
+    monkeypatch.setattr(export, "synchronisieren", kaputt)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(export.export_konto(None, ("a@example.org", "geheim"), str(tmp_path),
+                                        workers=1, session_nutzen=False))
+
+    assert geschlossen == [True]
+    assert context.geschlossen
+
+
+class FakeBrowser:
+    geschlossen = False
+
+    async def close(self):
+        FakeBrowser.geschlossen = True
+
+
+class FakePlaywright:
+    chromium = type("Chromium", (), {"launch": staticmethod(lambda **kw: _fertig(FakeBrowser()))})()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+
+async def _fertig(wert):
+    return wert
+
+
+def test_batch_isoliert_kaputte_konten(monkeypatch):
+    async def export_konto(browser, zugangsdaten, download_dir, **kwargs):
+        email = zugangsdaten[0]
+        if email == "kaputt@example.org":
+            raise RuntimeError("Renderer abgestürzt")
+        if email == "login@example.org":
+            return None
+        await asyncio.sleep(0.05)  # läuft noch, während das kaputte Konto scheitert
+        return {"neu": 1, "vorhanden": 0, "fehler": 0, "unerledigt": 0}
+
+    monkeypatch.setattr(export, "async_playwright", FakePlaywright)
+    monkeypatch.setattr(export, "get_saved_password", lambda dienst, email: "geheim")
+    monkeypatch.setattr(export, "export_konto", export_konto)
+
+    ergebnisse = asyncio.run(export.run_batch(["ok@example.org", "kaputt@example.org", "login@example.org"]))
+
+    assert list(ergebnisse) == ["ok@example.org"]
+    assert FakeBrowser.geschlossen
@@ -0,0 +1,153 @@
+import asyncio
+import base64
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import har
+
+CODE = "Code-4f1c2a9e7b"
+STATE = "State-d83b10aa52"
+NONCE = "Nonce-77e0c4d1f9"
+VERIFIER = "Verifier-0c5e9b2f41aa"
+ACCESS = "eyJhbGciOiJSUzI1NiJ9.access.sig"
+REFRESH = "eyJhbGciOiJIUzI1NiJ9.refresh.sig"
+ID_TOKEN = "eyJhbGciOiJSUzI1NiJ9.id.sig"
+GEHEIMNISSE = (CODE, STATE, NONCE, VERIFIER, ACCESS, REFRESH, ID_TOKEN)
+
+TOKENS = {"access_token": ACCESS, "refresh_token": REFRESH, "id_token": ID_TOKEN,
+          "token_type": "Bearer", "expires_in": 300, "session": {"id_token": ID_TOKEN}}
+
+
+def eintrag(methode, url, status=200, headers=(), redirect="", post=None, inhalt=None):
+    query = [{"name": k, "value": v[0]} for k, v in parse_qs(urlsplit(url).query).items()]
+    return {
+        "request": {"method": methode, "url": url, "headers": [], "cookies": [], "queryString": query,
+                    **({"postData": post} if post else {})},
+        "response": {"status": status, "headers": [{"name": n, "value": w} for n, w in headers],
+                     "cookies": [], "redirectURL": redirect, "content": inhalt or {"size": 0, "mimeType": ""}},
+    }
+
+
+def oauth_har():
+    rueckruf = f"https://portal.example/cb?code={CODE}&state={STATE}"
+    token_form = f"grant_type=authorization_code&code={CODE}&code_verifier={VERIFIER}"
+    token_json = json.dumps(TOKENS)
+    return {"log": {"entries": [
+        eintrag("GET", f"https://login.example/auth?client_id=portal&state={STATE}&nonce={NONCE}",
+                302, [("Location", rueckruf)], rueckruf),
+        eintrag("GET", rueckruf, 200, [("Content-Type", "text/html")],
+                inhalt={"mimeType": "text/html", "text": f"<a href='/weiter?code={CODE}'>weiter</a>"}),
+        eintrag("POST", "https://login.example/token", 200,
+                post={"mimeType": "application/x-www-form-urlencoded", "text": token_form,
+                      "params": [{"name": k, "value": v[0]} for k, v in parse_qs(token_form).items()]},
+                inhalt={"mimeType": "application/json", "text": token_json}),
+        eintrag("POST", "https://login.example/token", 200,
+                inhalt={"mimeType": "application/json", "encoding": "base64",
+                        "text": base64.b64encode(token_json.encode()).decode()}),
+        eintrag("GET", "https://portal.example/implicit", 302,
+                [("location", f"https://portal.example/cb#access_token={ACCESS}&state={STATE}")]),
+        eintrag("GET", "https://portal.example/api/reisen", 200,
+                inhalt={"mimeType": "application/json", "text": json.dumps({"reisen": [{"state": "storniert"}]})}),
+    ]}}
+
+
+def geschwaerzter_text(pfad):
+    text = pfad.read_text(encoding="utf-8")
+    for e in json.loads(text)["log"]["entries"]:
+        inhalt = e["response"]["content"]
+        if inhalt.get("encoding") == "base64":
+            text += base64.b64decode(inhalt["text"]).decode()
+    return text
+
+
+def test_oauth_redirect_wird_geschwaerzt(tmp_path):
+    pfad = tmp_path / "oauth.har"
+    pfad.write_text(json.dumps(oauth_har()), encoding="utf-8")
+
+    har.schwaerzen(str(pfad))
+
+    text = geschwaerzter_text(pfad)
+    for geheim in GEHEIMNISSE:
+        assert geheim not in text
+    eintraege = json.loads(pfad.read_text(encoding="utf-8"))["log"]["entries"]
+    # Überall derselbe Platzhalter: Redirect-Ziel und Folge-Request passen beim Abspielen
+    assert eintraege[0]["response"]["redirectURL"] == eintraege[1]["request"]["url"]
+    assert eintraege[0]["response"]["headers"][0]["value"] == eintraege[1]["request"]["url"]
+    # Was kein Geheimnis ist, bleibt
+    assert "client_id=portal" in eintraege[0]["request"]["url"]
+    assert json.loads(eintraege[2]["response"]["content"]["text"])["expires_in"] == 300
+    assert "storniert" in text
+
+
+class OAuthPortal(BaseHTTPRequestHandler):
+    """Minimaler Authorization-Code-Ablauf: /auth -> 302 /cb?code=..., /cb holt per fetch die Tokens."""
+
+    def do_GET(self):
+        pfad = urlsplit(self.path).path
+        if pfad == "/auth":
+            self.send_response(302)
+            self.send_header("Location", f"/cb?code={CODE}&state={STATE}")
+            self.end_headers()
+            return
+        body = (b"<script>fetch('/token', {method: 'POST', headers: {'Content-Type': "
+                b"'application/x-www-form-urlencoded'}, body: 'code=" + CODE.encode() +
+                b"&code_verifier=" + VERIFIER.encode() + b"'}).then(r => r.json())"
+                b".then(t => { document.title = 'fertig'; });</script>")
+        self._senden("text/html", body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self._senden("application/json", json.dumps(TOKENS).encode())
+
+    def _senden(self, typ, body):
+        self.send_response(200)
+        self.send_header("Content-Type", typ)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_aufnahme_eines_oauth_logins_wird_geschwaerzt(tmp_path, monkeypatch, chromium):
+    from playwright.async_api import async_playwright
+
+    monkeypatch.setattr(har, "_aktiv", False)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), OAuthPortal)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    pfad = tmp_path / "login.har"
+
+    async def aufnehmen():
+        async with async_playwright() as p:
+            browser = await p.chromium.launch()
+            context = await browser.new_context(**har.context_optionen(str(pfad)))
+            page = await context.new_page()
+            await page.goto(f"http://127.0.0.1:{server.server_address[1]}/auth?state={STATE}&nonce={NONCE}")
+            await page.wait_for_function("document.title === 'fertig'")
+            await context.close()
+            await browser.close()
+
+    try:
+        asyncio.run(aufnehmen())
+    finally:
+        server.shutdown()
+    text = pfad.read_text(encoding="utf-8")
+    assert ACCESS in text and CODE in text  # sonst prüft der Test nichts
+
+    har.schwaerzen(str(pfad))
+
+    text = geschwaerzter_text(pfad)
+    for geheim in GEHEIMNISSE:
+        assert geheim not in text
+
+
+def test_abschliessen_loescht_nicht_schwaerzbare_aufnahme(tmp_path):
+    pfad = tmp_path / "kaputt.har"
+    pfad.write_text('{"log": {"entries": [{"request": ', encoding="utf-8")  # Abbruch beim Schreiben
+
+    har.abschliessen(str(pfad), "a@example.org", "geheim")
+
+    assert not pfad.exists()
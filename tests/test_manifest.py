@@ -0,0 +1,102 @@
+import hashlib
+
+import pytest
+
+from manifest import DATEINAME_MUSTER, SyncManifest, auftragsnummer_aus_url, manifest_pfad
+
+PDF = b"%PDF-1.4\n" + b"0" * 100 + b"\n%%EOF\n"
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    m = SyncManifest(str(tmp_path / "m.sqlite"))
+    yield m
+    m.close()
+
+
+@pytest.mark.parametrize("name, auftrag, rechnungsnr", [
+    ("RG_01_2024-706855677982_2024-10-31MusterMax_607227512704.pdf", "706855677982", "607227512704"),
+    ("RG_2024-706855677982_2024-10-31MusterMax_607227512704.pdf", "706855677982", "607227512704"),
+    ("RG_01_2024-706855677982_2024-10-31MusterMax.pdf", "706855677982", None),
+    ("RG_2024-706855677982_2024-10-31MusterMax.pdf", "706855677982", None),
+    ("RG_0001_2024-706855677982_2024-10-31Muster_Max_607227512704.pdf", "706855677982", "607227512704"),
+])
+def test_dateiname_muster(name, auftrag, rechnungsnr):
+    treffer = DATEINAME_MUSTER.match(name)
+    assert treffer is not None
+    assert treffer["auftrag"] == auftrag
+    assert treffer["rechnungsnr"] == rechnungsnr
+
+
+@pytest.mark.parametrize("name", [
+    "DB_Rechnung_607227512704.pdf",
+    "RG_01_2024-706855677982_2024-10-31MusterMax.pdf.part",
+    "RG_01_24-706855677982_MusterMax.pdf",
+    "RG_01_2024-706855677982.pdf",
+])
+def test_dateiname_muster_fremde_dateien(name):
+    assert DATEINAME_MUSTER.match(name) is None
+
+
+def test_manifest_pfad_und_url():
+    assert manifest_pfad("rechnungen/") == "rechnungen_manifest.sqlite"
+    assert auftragsnummer_aus_url("https://x/detail?auftragsnummer=%20123%20&x=1") == "123"
+    assert auftragsnummer_aus_url("https://x/detail?auftragsnummer=") is None
+
+
+def test_eintragen_und_ist_exportiert(manifest, tmp_path):
+    pdf = tmp_path / "RG_2024-111_Muster.pdf"
+    pdf.write_bytes(PDF)
+    manifest.eintragen("111", str(pdf), "9111")
+
+    assert manifest.ist_exportiert("111")
+    assert not manifest.ist_exportiert("222")
+    assert not manifest.ist_exportiert(None)
+    eintrag = manifest.eintrag("111")
+    assert eintrag["rechnungsnr"] == "9111"
+    assert eintrag["groesse"] == len(PDF)
+    assert eintrag["sha256"] == hashlib.sha256(PDF).hexdigest()
+    assert len(manifest) == 1
+
+    pdf.unlink()
+    assert not manifest.ist_exportiert("111")  # Datei weg: wird neu geladen
+
+
+def test_eintragen_ersetzt_und_bleibt_erhalten(tmp_path):
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(PDF)
+    manifest = SyncManifest(str(tmp_path / "m.sqlite"))
+    manifest.eintragen("111", str(pdf), "1")
+    manifest.eintragen("111", str(pdf), "2", sha256="abc")
+    manifest.beleg_speichern("abc", {"brutto": 1.5})
+    manifest.close()
+
+    manifest = SyncManifest(str(tmp_path / "m.sqlite"))
+    try:
+        assert [(e["rechnungsnr"], e["sha256"]) for e in manifest.eintraege()] == [("2", "abc")]
+        assert manifest.beleg("abc") == {"brutto": 1.5}
+        assert manifest.beleg("fehlt") is None
+    finally:
+        manifest.close()
+
+
+def test_importiere_bestand(manifest, tmp_path):
+    ordner = tmp_path / "rechnungen"
+    ordner.mkdir()
+    (ordner / "RG_01_2024-111_2024-10-31Muster_9111.pdf").write_bytes(PDF)
+    (ordner / "RG_2024-222_2024-11-02Muster.pdf").write_bytes(PDF)
+    (ordner / "RG_2024-333_2024-11-03Muster.pdf").write_bytes(b"")  # abgebrochener Download
+    (ordner / "notizen.pdf").write_bytes(PDF)
+
+    assert manifest.importiere_bestand(str(ordner)) == 2
+    assert manifest.eintrag("111")["rechnungsnr"] == "9111"
+    assert manifest.eintrag("222")["rechnungsnr"] == ""
+    assert manifest.eintrag("333") is None
+
+    # Zweiter Lauf: nichts Neues
+    assert manifest.importiere_bestand(str(ordner)) == 0
+    assert len(manifest) == 2
+
+
+def test_importiere_bestand_ohne_ordner(manifest, tmp_path):
+    assert manifest.importiere_bestand(str(tmp_path / "fehlt")) == 0
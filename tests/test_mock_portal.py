@@ -0,0 +1,211 @@
+"""Test-Portal (mock_bahn) und Benchmark ohne Browser: reines HTTP gegen starte_server."""
+import asyncio
+import json
+import os
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.parse import urlencode, urlparse
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+import pytest
+
+import ablage
+import benchmark
+import DBahnRechnungsexport as export
+from mock_bahn import LISTEN_PFAD, MockPortal, starte_server
+
+
+class Client:
+    """Browser-loser Client mit Cookie-Jar, folgt Weiterleitungen."""
+
+    def __init__(self, server):
+        self.basis = f"http://127.0.0.1:{server.server_address[1]}"
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies))
+
+    def abrufen(self, pfad: str, form: dict = None, methode: str = None):
+        """(Status, Header, Body, Pfad nach Weiterleitungen)"""
+        daten = urlencode(form).encode() if form is not None else None
+        try:
+            antwort = self.opener.open(Request(self.basis + pfad, data=daten, method=methode), timeout=10)
+        except HTTPError as e:
+            return e.code, e.headers, e.read(), urlparse(e.url).path
+        with antwort:
+            return antwort.status, antwort.headers, antwort.read(), urlparse(antwort.url).path
+
+    def json(self, pfad: str, methode: str = None):
+        status, _, body, _ = self.abrufen(pfad, methode=methode)
+        return status, json.loads(body)
+
+    def anmelden(self):
+        self.abrufen("/auth/login", {"username": "test@example.org"})
+        return self.abrufen("/auth/login", {"username": "test@example.org", "password": "geheim"})
+
+
+@pytest.fixture
+def portal_server():
+    gestartet = []
+
+    def starten(**optionen):
+        portal = MockPortal(**{"reisen": 25, "latenz_ms": 0, "generierung_ms": 0, **optionen})
+        server = starte_server(portal)
+        gestartet.append(server)
+        return portal, Client(server)
+
+    yield starten
+    for server in gestartet:
+        server.shutdown()
+
+
+def test_ohne_login(portal_server):
+    _, client = portal_server()
+
+    status, _, body, pfad = client.abrufen(LISTEN_PFAD)
+    assert (status, pfad) == (200, "/auth/login")
+    assert b'name="username"' in body
+    assert client.json("/api/reisen")[0] == 401
+    assert client.json("/api/rechnung/700000000001", methode="POST")[0] == 401
+
+
+def test_login_in_zwei_schritten(portal_server):
+    portal, client = portal_server()
+
+    status, _, body, _ = client.abrufen("/auth/login", {"username": "test@example.org"})
+    assert status == 200
+    assert b'name="password"' in body and b'value="test@example.org"' in body
+    assert not portal.sessions
+
+    status, _, body, pfad = client.abrufen("/auth/login", {"username": "test@example.org", "password": "geheim"})
+    assert (status, pfad) == (200, LISTEN_PFAD)
+    assert [c.name for c in client.cookies] == ["mock_session"]
+    assert len(portal.sessions) == 1
+
+
+def test_login_ohne_passwort_scheitert(portal_server):
+    portal, client = portal_server()
+
+    status, _, _, pfad = client.abrufen("/auth/login", {"username": "test@example.org", "password": ""})
+    assert (status, pfad) == (200, "/auth/login")
+    assert not portal.sessions
+
+
+def test_reisen_mit_offset_und_limit(portal_server):
+    portal, client = portal_server()
+    client.anmelden()
+
+    gesammelt, offset = [], 0
+    while True:
+        status, seite = client.json(f"/api/reisen?offset={offset}&limit=10")
+        assert status == 200
+        gesammelt += seite["reisen"]
+        offset += 10
+        if not seite["weitere"]:
+            break
+
+    assert offset == 30
+    assert [r["auftragsnummer"] for r in gesammelt] == [r["auftragsnummer"] for r in portal.reisen]
+    # Neueste zuerst, wie im Portal
+    assert [r["gebuchtAm"] for r in gesammelt] == sorted((r["gebuchtAm"] for r in gesammelt), reverse=True)
+    assert client.json("/api/reisen?offset=100&limit=10")[1] == {"reisen": [], "weitere": False}
+
+
+def test_rechnung_erstellen_und_pdf(portal_server):
+    portal, client = portal_server()
+    client.anmelden()
+    reise = portal.reisen[1]  # ungerade Position: noch nicht erstellt
+    nr = reise["auftragsnummer"]
+
+    assert client.json(f"/api/auftrag/{nr}")[1]["rechnungErstellt"] is False
+    assert client.abrufen(f"/api/rechnung/{nr}/pdf")[0] == 404
+    assert client.json(f"/api/rechnung/{nr}", methode="POST") == (200, {"status": "erstellt"})
+    assert client.json(f"/api/auftrag/{nr}")[1]["rechnungErstellt"] is True
+
+    status, header, body, _ = client.abrufen(f"/api/rechnung/{nr}/pdf")
+    assert status == 200
+    assert header["Content-Type"] == "application/pdf"
+    assert f'filename="DB_Rechnung_{reise["rechnungsnummer"]}.pdf"' in header["Content-Disposition"]
+    assert reise["rechnungsnummer"].encode() in body
+    assert portal.zaehler["pdfs"] == 1
+
+
+def test_pdf_ist_vollstaendig(portal_server, tmp_path):
+    portal, client = portal_server()
+    client.anmelden()
+
+    _, _, body, _ = client.abrufen(f"/api/rechnung/{portal.reisen[0]['auftragsnummer']}/pdf")
+    pfad = tmp_path / "rechnung.pdf"
+    pfad.write_bytes(body)
+    assert ablage.pdf_fehler(str(pfad)) is None
+
+
+def test_unbekannte_rechnung(portal_server):
+    _, client = portal_server()
+    client.anmelden()
+
+    assert client.json("/api/rechnung/123", methode="POST")[0] == 404
+    assert client.abrufen("/api/rechnung/123/pdf")[0] == 404
+
+
+def test_fehlerquote(portal_server):
+    portal, client = portal_server(fehlerquote=1.0)
+    status, _, _, pfad = client.anmelden()  # Login ist von der Fehlerinjektion ausgenommen
+    assert (status, pfad) == (200, LISTEN_PFAD)
+
+    assert client.json("/api/reisen")[0] == 503
+    assert client.json(f"/api/rechnung/{portal.reisen[1]['auftragsnummer']}", methode="POST")[0] == 503
+    assert portal.zaehler["fehler"] == 2
+    assert portal.reisen[1]["auftragsnummer"] not in portal.erstellt
+
+
+def test_fehlerquote_ist_reproduzierbar():
+    def fehler(portal):
+        return [portal.zufallsfehler() for _ in range(200)]
+
+    a, b = MockPortal(reisen=1, fehlerquote=0.2, seed=7), MockPortal(reisen=1, fehlerquote=0.2, seed=7)
+    ergebnis = fehler(a)
+    assert ergebnis == fehler(b)
+    assert 20 < sum(ergebnis) < 60
+    assert a.zaehler["fehler"] == sum(ergebnis)
+
+
+@pytest.fixture
+def ohne_browser(monkeypatch):
+    """run_download ohne Browser: prüft nur, was benchmark_lauf übergibt."""
+    aufrufe = []
+
+    def setzen(stats):
+        async def run_download(**kw):
+            aufrufe.append({"base_url": export.BASE_URL, "cwd": os.getcwd(), **kw})
+            return stats
+
+        monkeypatch.setattr(export, "run_download", run_download)
+        return aufrufe
+
+    return setzen
+
+
+def test_benchmark_lauf(ohne_browser):
+    aufrufe = ohne_browser({"neu": 6, "fehler": 1, "erste_reise_s": 0.4})
+    alte_base_url, alter_ordner = export.BASE_URL, os.getcwd()
+
+    ergebnis = asyncio.run(benchmark.benchmark_lauf(2, {"reisen": 6, "latenz_ms": 0}, api_modus=True))
+
+    aufruf, = aufrufe
+    assert urlparse(aufruf["base_url"]).path == LISTEN_PFAD
+    assert aufruf["cwd"] != alter_ordner and not os.path.exists(aufruf["cwd"])
+    assert aufruf["workers"] == 2 and aufruf["api_modus"] is True
+    assert aufruf["zugangsdaten"] == benchmark.ZUGANGSDATEN
+    assert (export.BASE_URL, os.getcwd()) == (alte_base_url, alter_ordner)
+    assert ergebnis["neu"] == 6 and ergebnis["fehler"] == 1
+    assert ergebnis["erste_rechnung_s"] == 0.4
+    assert ergebnis["arbeitsordner"] is None
+
+
+def test_benchmark_lauf_ohne_login(ohne_browser):
+    ohne_browser(None)
+    alte_base_url, alter_ordner = export.BASE_URL, os.getcwd()
+
+    with pytest.raises(RuntimeError, match="Login"):
+        asyncio.run(benchmark.benchmark_lauf(1, {"reisen": 2, "latenz_ms": 0}))
+
+    assert (export.BASE_URL, os.getcwd()) == (alte_base_url, alter_ordner)
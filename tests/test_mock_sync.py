@@ -0,0 +1,48 @@
+"""End-to-End: cli sync gegen das lokale Test-Portal (mock_bahn), echter Browser."""
+import pytest
+
+import cli
+from manifest import SyncManifest, manifest_pfad
+from mock_bahn import MockPortal, basis_url, starte_server
+
+REISEN = 12
+
+
+@pytest.fixture
+def portal(monkeypatch, tmp_path, chromium):
+    import DBahnRechnungsexport as export
+
+    portal = MockPortal(reisen=REISEN, latenz_ms=0, generierung_ms=50)
+    server = starte_server(portal)
+    monkeypatch.setattr(export, "BASE_URL", basis_url(server))
+    monkeypatch.setattr(export, "DOWNLOAD_DIR", export.DOWNLOAD_DIR)  # cli sync setzt es auf --ordner
+    monkeypatch.setenv(cli.ENV_EMAIL, "test@example.org")
+    monkeypatch.setenv(cli.ENV_PASSWORT, "geheim")
+    # selektoren.json, Session und Archiv landen im Testordner
+    monkeypatch.chdir(tmp_path)
+    yield portal
+    server.shutdown()
+
+
+def test_sync_gegen_mock_portal(portal, tmp_path):
+    ordner = tmp_path / "rechnungen"
+
+    code = cli.main(["--ordner", str(ordner), "sync", "--neu-anmelden", "--workers", "2"])
+
+    assert code == 0
+    assert len(list(ordner.glob("*.pdf"))) == REISEN
+    manifest = SyncManifest(manifest_pfad(str(ordner)))
+    try:
+        eintraege = manifest.eintraege()
+    finally:
+        manifest.close()
+    assert {e["auftragsnummer"] for e in eintraege} == set(portal.nach_nummer)
+    assert all(e["sha256"] for e in eintraege)
+    geladen = portal.zaehler["pdfs"]
+
+    # Zweiter Lauf: alles bekannt, nichts wird erneut geladen
+    code = cli.main(["--ordner", str(ordner), "sync", "--neu-anmelden", "--workers", "2", "--nur-neue"])
+
+    assert code == 0
+    assert portal.zaehler["pdfs"] == geladen
+    assert len(list(ordner.glob("*.pdf"))) == REISEN
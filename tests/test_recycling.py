@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+import recycling
+from recycling import SeitenWaechter
+
+
+class FakeCdp:
+    def __init__(self, metriken):
+        self.metriken = metriken
+
+    async def send(self, methode):
+        if methode == "Performance.getMetrics":
+            return {"metrics": [{"name": n, "value": w} for n, w in self.metriken.items()]}
+        return {}
+
+
+class FakeContext:
+    def __init__(self, metriken):
+        self.metriken = metriken
+        self.seiten = 0
+
+    async def new_cdp_session(self, page):
+        return FakeCdp(self.metriken)
+
+    async def new_page(self):
+        self.seiten += 1
+        return FakePage(self)
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.geschlossen = False
+
+    async def close(self):
+        self.geschlossen = True
+
+
+@pytest.fixture
+def waechter(monkeypatch):
+    monkeypatch.setattr(recycling, "NACH_REISEN", 0)
+    monkeypatch.setattr(recycling, "LATENZ_FAKTOR", 2.0)
+    monkeypatch.setattr(recycling, "gruende", recycling.Counter())
+    monkeypatch.setattr(recycling, "max_heap_mb", 0.0)
+    monkeypatch.setattr(recycling, "max_knoten", 0)
+
+    def erzeugen(metriken=None):
+        return SeitenWaechter(FakePage(FakeContext(metriken or {"JSHeapUsedSize": 50 * 1024 * 1024,
+                                                                "Nodes": 3000})))
+    return erzeugen
+
+
+def gruende(waechter, dauern):
+    async def lauf():
+        return [await waechter.pruefen(d) for d in dauern]
+    return asyncio.run(lauf())
+
+
+def test_latenz_drift_recycelt(waechter):
+    w = waechter()
+    # Erst FENSTER Reisen als Referenz, dann dreimal so langsam
+    ergebnis = gruende(w, [1.0] * recycling.FENSTER + [3.0] * recycling.FENSTER)
+
+    assert ergebnis[:-1] == [None] * (2 * recycling.FENSTER - 1)
+    assert ergebnis[-1] == "latenz"
+
+
+def test_stabile_latenz_recycelt_nicht(waechter):
+    w = waechter()
+    assert set(gruende(w, [1.0, 1.4, 0.8, 1.2, 1.0] * 4)) == {None}
+
+
+def test_nach_recyceln_neue_messung(waechter):
+    w = waechter()
+    gruende(w, [1.0] * recycling.FENSTER + [3.0] * recycling.FENSTER)
+    alte_seite = w.page
+
+    asyncio.run(w.recyceln("latenz"))
+
+    assert alte_seite.geschlossen and w.page is not alte_seite
+    assert recycling.gruende["latenz"] == 1
+    # Die Referenz vom Anfang bleibt, das Fenster füllt sich neu
+    assert gruende(w, [1.0] * (2 * recycling.FENSTER)) == [None] * (2 * recycling.FENSTER)
+
+
+@pytest.mark.parametrize("metriken, grund", [
+    ({"JSHeapUsedSize": 400 * 1024 * 1024, "Nodes": 3000}, "speicher"),
+    ({"JSHeapUsedSize": 50 * 1024 * 1024, "Nodes": 300_000}, "dom"),
+    ({"JSHeapUsedSize": 50 * 1024 * 1024, "Nodes": 3000}, None),
+    ({}, None),
+])
+def test_speicher_grenzen(waechter, monkeypatch, metriken, grund):
+    monkeypatch.setattr(recycling, "HEAP_MB", 350)
+    monkeypatch.setattr(recycling, "KNOTEN", 250_000)
+    assert gruende(waechter(metriken), [1.0]) == [grund]
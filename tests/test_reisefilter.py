@@ -0,0 +1,148 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+import drossel
+import reiseliste
+from reisefilter import ReiseFilter, info_aus_json
+from reiseliste import ReiselistenMitschnitt
+
+
+def eintrag(nr, gebucht, abfahrt, kunde="Max Mustermann"):
+    """Listeneintrag wie in der JSON-Antwort der Reiseübersicht."""
+    return {
+        "auftragsnummer": nr,
+        "buchungsDatum": gebucht,
+        "status": "ABGESCHLOSSEN",
+        "reisender": {"name": kunde},
+        "hinfahrt": {"abfahrt": abfahrt, "zielBahnhof": "Berlin Hbf"},
+        "preis": {"betrag": 49.9, "waehrung": "EUR"},
+    }
+
+
+@pytest.mark.parametrize("daten, gebucht, reisedatum, kunde", [
+    (eintrag("1", "2024-10-31T12:00:00Z", "2024-11-05T08:12:00+01:00"),
+     date(2024, 10, 31), date(2024, 11, 5), "Max Mustermann"),
+    ({"gebuchtAm": "31.10.2024", "reiseDatum": "5.11.2024", "kundenName": " Erika "},
+     date(2024, 10, 31), date(2024, 11, 5), "Erika"),
+    ({"buchung": {"createdAt": "2024-10-31"}, "reise": {"departure": "2024-11-05"}},
+     date(2024, 10, 31), date(2024, 11, 5), None),
+    # Zwei Ebenen tief wird nicht mehr gesucht
+    ({"details": {"hinfahrt": {"abfahrt": "2024-11-05"}}}, None, None, None),
+    # Ein Datum ist kein Kundenname, eine Buchungsnummer kein Buchungsdatum
+    ({"name": "2024-10-31", "buchungsnummer": "4711"}, None, None, None),
+    ({"status": "STORNIERT"}, None, None, None),
+])
+def test_info_aus_json(daten, gebucht, reisedatum, kunde):
+    info = info_aus_json("1", daten)
+    assert (info["gebucht"], info["reisedatum"], info["kunde"]) == (gebucht, reisedatum, kunde)
+
+
+def info(gebucht=None, reisedatum=None, kunde=None, nr="1"):
+    return {"auftragsnummer": nr, "gebucht": gebucht, "reisedatum": reisedatum, "kunde": kunde}
+
+
+@pytest.mark.parametrize("kriterien, reise, passt", [
+    ({}, info(), True),
+    ({"reise_von": date(2024, 1, 1)}, info(reisedatum=date(2024, 1, 1)), True),
+    ({"reise_von": date(2024, 1, 1)}, info(reisedatum=date(2023, 12, 31)), False),
+    ({"reise_bis": date(2024, 1, 31)}, info(reisedatum=date(2024, 2, 1)), False),
+    ({"gebucht_von": date(2024, 1, 1), "gebucht_bis": date(2024, 1, 31)}, info(gebucht=date(2024, 1, 15)), True),
+    ({"gebucht_bis": date(2024, 1, 31)}, info(gebucht=date(2024, 2, 1)), False),
+    ({"kunde": "MUSTER"}, info(kunde="Max Mustermann"), True),
+    ({"kunde": "erika"}, info(kunde="Max Mustermann"), False),
+    ({"auftragsnummern": ["1", "2"]}, info(nr="2"), True),
+    ({"auftragsnummern": ["1", "2"]}, info(nr="3"), False),
+    # Unbekannte Felder schließen nichts aus
+    ({"reise_von": date(2024, 1, 1), "gebucht_bis": date(2024, 1, 31), "kunde": "erika"}, info(), True),
+    ({"reise_von": date(2024, 1, 1)}, info(gebucht=date(2020, 1, 1)), True),
+])
+def test_passt(kriterien, reise, passt):
+    reisefilter = ReiseFilter(**kriterien)
+    assert reisefilter.passt(reise) is passt
+    assert reisefilter.zaehler["passt" if passt else "aussortiert"] == 1
+
+
+@pytest.mark.parametrize("kriterien, charge, ueber", [
+    ({}, [info(reisedatum=date(2020, 1, 1))], False),
+    ({"reise_von": date(2024, 1, 1)}, [], False),
+    ({"reise_von": date(2024, 1, 1)}, [info(reisedatum=date(2023, 12, 1)), info(reisedatum=date(2023, 11, 1))], True),
+    ({"reise_von": date(2024, 1, 1)}, [info(reisedatum=date(2024, 1, 2)), info(reisedatum=date(2023, 11, 1))], False),
+    # Ohne Reisedatum weiß man nichts - weiterblättern
+    ({"reise_von": date(2024, 1, 1)}, [info(reisedatum=date(2023, 12, 1)), info()], False),
+    # Gebucht wird vor der Reise: gebucht_von begrenzt auch das Reisedatum
+    ({"gebucht_von": date(2024, 1, 1)}, [info(reisedatum=date(2023, 12, 1))], True),
+    ({"gebucht_von": date(2023, 1, 1), "reise_von": date(2024, 1, 1)}, [info(reisedatum=date(2023, 6, 1))], True),
+    ({"kunde": "muster"}, [info(reisedatum=date(2020, 1, 1))], False),
+])
+def test_ueber_fenster(kriterien, charge, ueber):
+    assert ReiseFilter(**kriterien).ueber_fenster(charge) is ueber
+
+
+def test_ueber_fenster_wenn_alle_auftraege_gefunden():
+    reisefilter = ReiseFilter(auftragsnummern=["1", "2"])
+    reisefilter.passt(info(nr="1"))
+    assert not reisefilter.ueber_fenster([info(nr="1")])
+    reisefilter.passt(info(nr="2"))
+    assert reisefilter.ueber_fenster([info(nr="2")])
+
+
+class FakeAntwort:
+    status = 200
+    ok = True
+    headers = {}
+
+    def __init__(self, daten):
+        self._daten = daten
+
+    async def json(self):
+        return self._daten
+
+
+class FakeRequest:
+    def __init__(self, seiten):
+        self.seiten = list(seiten)
+        self.urls = []
+
+    async def fetch(self, url, method=None, headers=None, data=None):
+        self.urls.append(url)
+        return FakeAntwort(self.seiten.pop(0))
+
+
+class FakeListenRequest:
+    url = "https://www.bahn.de/web/api/reisen?offset=0&limit=2"
+    method = "GET"
+    post_data = None
+
+    async def all_headers(self):
+        return {"accept": "application/json"}
+
+
+def test_paging_endet_am_zeitfenster():
+    """Liste neueste zuerst: die zweite Seite liegt komplett vor reise_von, die dritte wird
+    gar nicht mehr abgefragt."""
+    seiten = [
+        {"reisen": [eintrag("103", "2024-02-20", "2024-03-01"), eintrag("102", "2023-12-01", "2023-12-20")],
+         "weitere": True},
+        {"reisen": [eintrag("101", "2023-11-01", "2023-11-10"), eintrag("100", "2023-10-01", "2023-10-05")],
+         "weitere": True},
+        {"reisen": [eintrag("099", "2023-09-01", "2023-09-02")], "weitere": False},
+    ]
+    drossel.starten(2)
+    page = type("Seite", (), {})()
+    page.context = type("Context", (), {})()
+    page.context.request = FakeRequest(seiten[1:])
+    reisefilter = ReiseFilter(reise_von=date(2024, 1, 1))
+    m = ReiselistenMitschnitt(page, reisefilter=reisefilter)
+    m.listen_request = FakeListenRequest()
+    m.url_muster = "https://www.bahn.de/buchung/reise?auftragsnummer={auftragsnummer}"
+    m.letzte_charge = reiseliste.finde_auftraege(seiten[0])
+    asyncio.run(m._melden(m._uebernehmen(m.letzte_charge)))
+
+    assert asyncio.run(m.alle_seiten_laden()) is True
+
+    assert len(page.context.request.urls) == 1
+    assert list(m.eintraege) == ["103", "102", "101", "100"]
+    assert m.ausgewaehlt == ["103"]
+    assert reisefilter.zaehler == {"passt": 1, "aussortiert": 3}
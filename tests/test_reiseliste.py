@@ -0,0 +1,130 @@
+import asyncio
+import json
+
+import drossel
+import reiseliste
+from reiseliste import ReiselistenMitschnitt
+
+
+class FakeAntwort:
+    def __init__(self, status, daten=None, retry_after=None):
+        self.status = status
+        self.ok = 200 <= status < 300
+        self._daten = daten
+        self.headers = {"retry-after": retry_after} if retry_after else {}
+
+    async def json(self):
+        return self._daten
+
+
+class FakeRequest:
+    def __init__(self, antworten):
+        self.antworten = list(antworten)
+        self.urls = []
+
+    async def fetch(self, url, method=None, headers=None, data=None):
+        self.urls.append(url)
+        return self.antworten.pop(0)
+
+
+class FakeListenRequest:
+    url = "https://portal.example/api/reisen?offset=0&limit=2"
+    method = "GET"
+    post_data = None
+
+    async def all_headers(self):
+        return {"accept": "application/json"}
+
+
+class FakeSeite:
+    def __init__(self, antworten):
+        self.context = type("Context", (), {})()
+        self.context.request = FakeRequest(antworten)
+
+
+def seite(*nummern):
+    return {"reisen": [{"auftragsnummer": nr} for nr in nummern]}
+
+
+def mitschnitt(antworten, monkeypatch):
+    monkeypatch.setattr(reiseliste, "PAGING_WARTEZEIT_S", 0.0)
+    drossel.starten(2)
+    m = ReiselistenMitschnitt(FakeSeite(antworten))
+    m.listen_request = FakeListenRequest()
+    m._uebernehmen(reiseliste.finde_auftraege(seite("100", "101")))
+    return m
+
+
+def test_paging_wiederholt_429_und_5xx(monkeypatch):
+    m = mitschnitt([FakeAntwort(429, retry_after="0"), FakeAntwort(503),
+                    FakeAntwort(200, seite("102", "103")), FakeAntwort(200, seite())], monkeypatch)
+
+    assert asyncio.run(m.alle_seiten_laden()) is True
+    assert list(m.eintraege) == ["100", "101", "102", "103"]
+    assert m.paging_fehler is None
+    assert drossel.drossel().zaehler["http_429"] == 1
+    assert drossel.drossel().zaehler["http_5xx"] == 1
+
+
+def test_paging_gibt_nach_versuchen_auf(monkeypatch):
+    m = mitschnitt([FakeAntwort(503)] * reiseliste.PAGING_VERSUCHE, monkeypatch)
+
+    # False: der Aufrufer lädt per Klick weiter, statt die Teilliste als vollständig zu nehmen
+    assert asyncio.run(m.alle_seiten_laden()) is False
+    assert m.paging_fehler == 503
+    assert len(m.page.context.request.urls) == reiseliste.PAGING_VERSUCHE
+
+
+def test_paging_wiederholt_andere_fehler_nicht(monkeypatch):
+    m = mitschnitt([FakeAntwort(404)], monkeypatch)
+
+    assert asyncio.run(m.alle_seiten_laden()) is False
+    assert m.paging_fehler == 404
+
+
+class FakeSeitenAntwort:
+    """Response-Event einer fetch()-Anfrage aus der Seite."""
+
+    def __init__(self, url, daten):
+        self.url = url
+        self.request = type("Request", (), {"resource_type": "fetch", "post_data": None})()
+        self._daten = daten
+
+    async def all_headers(self):
+        return {"content-type": "application/json"}
+
+    async def json(self):
+        return self._daten
+
+
+class FakeHarSeite:
+    """fetch() in der Seite (HAR-Modus): löst wie im Browser das Response-Event aus."""
+
+    def __init__(self, seiten):
+        self.seiten = list(seiten)
+        self.listener = []
+
+    def on(self, event, listener):
+        self.listener.append(listener)
+
+    def remove_listener(self, event, listener):
+        self.listener.remove(listener)
+
+    async def evaluate(self, skript, argumente):
+        url = argumente[0]
+        daten = self.seiten.pop(0)
+        for listener in self.listener:
+            await listener(FakeSeitenAntwort(url, daten))
+        return {"status": 200, "text": json.dumps(daten), "retryAfter": None}
+
+
+def test_eigene_fetches_beenden_paging_nicht():
+    drossel.starten(2)
+    seite_ = FakeHarSeite([seite("102", "103"), seite("104", "105"), seite()])
+    m = ReiselistenMitschnitt(seite_, ueber_seite=True).starten()
+    m.listen_request = FakeListenRequest()
+    m._uebernehmen(reiseliste.finde_auftraege(seite("100", "101")))
+
+    assert asyncio.run(m.alle_seiten_laden()) is True
+    assert list(m.eintraege) == ["100", "101", "102", "103", "104", "105"]
+    assert m.seiten == 3
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+import retry
+from retry import RetryPlaner, Richtlinie, TripFehler, klassifiziere
+
+
+@pytest.mark.parametrize("fehler, klasse", [
+    (TripFehler(retry.RECHNUNG_IN_ERSTELLUNG), retry.RECHNUNG_IN_ERSTELLUNG),
+    (Exception("Page.goto: net::ERR_CONNECTION_RESET at https://www.bahn.de"), retry.NAVIGATION_TIMEOUT),
+    (Exception("Page.goto: Timeout 20000ms exceeded."), retry.NAVIGATION_TIMEOUT),
+    (Exception("Timeout 10000ms exceeded while waiting for event \"download\""), retry.DOWNLOAD_FEHLER),
+    (Exception("Locator.wait_for: Timeout 15000ms exceeded."), retry.ELEMENT_FEHLT),
+    (Exception("Page.wait_for_selector: Timeout 5000ms exceeded."), retry.ELEMENT_FEHLT),
+    (Exception("Target page, context or browser has been closed"), retry.UNBEKANNT),
+])
+def test_klassifiziere(fehler, klasse):
+    assert klassifiziere(fehler) == klasse
+
+
+def test_wartezeit_waechst_bis_zur_obergrenze():
+    richtlinie = Richtlinie(versuche=5, basis_s=5, faktor=2, max_s=30)
+    assert [richtlinie.wartezeit(v) for v in range(1, 6)] == [5, 10, 20, 30, 30]
+
+
+def planer_lauf(ablauf, **optionen):
+    """Führt ablauf(planer) im Event-Loop aus, ohne Backoff-Wartezeiten abzuwarten."""
+    sofort = {k: Richtlinie(r.versuche, 0, r.faktor, 0) for k, r in retry.RICHTLINIEN.items()}
+
+    async def lauf():
+        planer = RetryPlaner(sofort, **optionen)
+        await ablauf(planer)
+        return planer
+
+    return asyncio.run(lauf())
+
+
+async def scheitern(planer, klasse, mal):
+    for _ in range(mal):
+        index, url = await planer.naechster()
+        planer.fehlschlag(index, url, klasse)
+
+
+@pytest.mark.parametrize("klasse", sorted(retry.RICHTLINIEN))
+def test_budget_je_fehlerklasse(klasse):
+    versuche = retry.RICHTLINIEN[klasse].versuche
+
+    async def ablauf(planer):
+        planer.hinzufuegen(0, "reise-0")
+        await scheitern(planer, klasse, versuche)
+        assert await planer.naechster() is None  # aufgegeben, nichts mehr offen
+
+    planer = planer_lauf(ablauf, abbruch_nach=100)
+    assert planer.aufgegeben == [(0, "reise-0", klasse)]
+    assert planer.unerledigt() == [(0, "reise-0")]
+
+
+def test_erfolg_nach_fehlschlag_ist_erledigt():
+    async def ablauf(planer):
+        planer.hinzufuegen(0, "reise-0")
+        await scheitern(planer, retry.DOWNLOAD_FEHLER, 1)
+        index, _ = await planer.naechster()
+        planer.erfolg(index)
+        assert await planer.naechster() is None
+
+    planer = planer_lauf(ablauf)
+    assert planer.unerledigt() == []
+    assert planer.fehlerklassen[retry.DOWNLOAD_FEHLER] == 1
+
+
+def test_abbruch_nach_fehlerserie():
+    n = retry.ABBRUCH_NACH_FEHLERSERIE
+
+    async def ablauf(planer):
+        for i in range(n + 2):
+            planer.hinzufuegen(i, f"reise-{i}")
+        for _ in range(n):
+            index, url = await planer.naechster()
+            planer.fehlschlag(index, url, retry.NAVIGATION_TIMEOUT)
+        assert await planer.naechster() is None
+
+    planer = planer_lauf(ablauf)
+    assert planer.abgebrochen
+    # Nicht verarbeitete und wieder eingeplante Reisen bleiben als unerledigt stehen
+    assert len(planer.unerledigt()) == n + 2
+
+
+def test_rechnung_in_erstellung_zaehlt_nicht_zur_fehlerserie():
+    n = retry.ABBRUCH_NACH_FEHLERSERIE
+
+    async def ablauf(planer):
+        for i in range(n):
+            planer.hinzufuegen(i, f"reise-{i}")
+        for _ in range(n):
+            index, url = await planer.naechster()
+            planer.fehlschlag(index, url, retry.RECHNUNG_IN_ERSTELLUNG)
+
+    planer = planer_lauf(ablauf)
+    assert not planer.abgebrochen
+    assert planer.fehlerserie == 0
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+from playwright.async_api import TimeoutError as PlaywrightTimeout
+
+import session
+
+BASE_URL = "https://www.bahn.de/buchung/reiseuebersicht/vergangene"
+
+
+class FakeElement:
+    def __init__(self, name):
+        self.name = name
+
+    async def get_attribute(self, attribut):
+        return self.name
+
+
+class FakeLocator:
+    def __init__(self, anzahl):
+        self.anzahl = anzahl
+
+    async def count(self):
+        return self.anzahl
+
+
+class FakePage:
+    """element: was wait_for_selector findet (None = Timeout), url: wohin die Seite nach
+    dem Laden geleitet hat, formular: Login-Formulare nach dem Laden."""
+
+    def __init__(self, element=None, url=BASE_URL, formular=0):
+        self.element = element
+        self.url = "about:blank"
+        self._ziel = url
+        self.formular = formular
+        self.wartezeiten = []
+
+    async def goto(self, url, **kwargs):
+        self.url = url
+
+    async def wait_for_selector(self, selektor, timeout):
+        self.wartezeiten.append(timeout)
+        if self.element is None:
+            raise PlaywrightTimeout("Timeout")
+        return FakeElement(self.element)
+
+    async def wait_for_load_state(self, zustand, timeout):
+        self.url = self._ziel
+
+    def locator(self, selektor):
+        return FakeLocator(self.formular)
+
+
+@pytest.mark.parametrize("page, gueltig", [
+    (FakePage(element=None), True),  # Konto ohne Reisen
+    (FakePage(element="reise"), True),
+    (FakePage(element="username"), False),
+    (FakePage(element=None, url="https://accounts.bahn.de/auth/login?redirect=x"), False),
+    (FakePage(element=None, formular=1), False),
+])
+def test_session_gueltig(page, gueltig):
+    assert asyncio.run(session.session_gueltig(page, BASE_URL)) is gueltig
+
+
+def test_konto_ohne_reisen_wartet_nur_kurz():
+    page = FakePage(element=None)
+    assert asyncio.run(session.session_gueltig(page, BASE_URL, timeout=15000))
+    assert page.wartezeiten == [session.SESSION_PROBE_MS]
+
+
+def test_navigationsfehler_gilt_als_ungueltig():
+    class Kaputt(FakePage):
+        async def goto(self, url, **kwargs):
+            raise RuntimeError("net::ERR_NAME_NOT_RESOLVED")
+
+    assert asyncio.run(session.session_gueltig(Kaputt(), BASE_URL)) is False
@@ -0,0 +1,60 @@
+import asyncio
+import os
+
+import pytest
+
+import DBahnRechnungsexport as export
+import traces
+
+
+class FakeTracing:
+    async def start(self, **kwargs):
+        pass
+
+    async def start_chunk(self, **kwargs):
+        pass
+
+    async def stop_chunk(self, path):
+        with open(path, "wb") as f:
+            f.write(b"PK trace")
+
+    async def stop(self):
+        pass
+
+
+class FakeContext:
+    def __init__(self):
+        self.tracing = FakeTracing()
+
+
+@pytest.fixture
+def ring(monkeypatch, tmp_path):
+    monkeypatch.setattr(traces, "REISEN", 2)
+    monkeypatch.setattr(traces, "ORDNER", str(tmp_path / "traces"))
+    monkeypatch.setattr(traces, "statistik", traces.Counter())
+    return tmp_path / "traces"
+
+
+@pytest.mark.parametrize("url, name", [
+    ("https://www.bahn.de/buchung/reise?auftragsnummer=706855677982", "706855677982"),
+    ("https://www.bahn.de/buchung/reise?id=abc", "reise0007"),
+    ("https://www.bahn.de/buchung/reise?auftragsnummer=", "reise0007"),
+])
+def test_reise_name(url, name):
+    assert export.reise_name(url, 6) == name
+
+
+def test_gesicherter_trace_heisst_nach_der_reise(ring):
+    context = FakeContext()
+
+    async def lauf():
+        await traces.starten(context)
+        await traces.nach_reise(context, "111", 1.0)
+        await traces.nach_reise(context, export.reise_name("https://x/reise?id=abc", 1), 2.0, "ELEMENT_FEHLT")
+        await traces.beenden(context)
+
+    asyncio.run(lauf())
+
+    namen = sorted(os.listdir(ring))
+    assert namen and all(n.startswith("reise0002_") for n in namen)
+    assert not any(n.startswith("None") for n in namen)